@@ -37,6 +37,10 @@ from . import training as train
 from . import features
 from . import expectations
 from . import probability_distributions
+from . import covariance_factors
+from . import profiler
+from . import export
+from . import predictor
 
 from .decors import autoflow
 from .decors import defer_build
@@ -159,6 +159,11 @@ class Loop(Action):
     These signals must be raised as a standard exception. Depending on which signal
     was raised the loop either stops execution or continues from beginning.
 
+    Optimization actions made with `steps_per_run=K` perform K optimizer steps
+    inside a single `session.run` call. Set the loop `step` to K, so that iteration
+    numbers count optimizer steps, whilst other actions of the body run only at
+    chunk boundaries. Use `Loop.multistep` to build such loop.
+
         :param action: Action or list of actions, which will be run within loop.
         :param stop: Maximum loop iteration.
         :param start: Starting point for loop iterations.
@@ -183,6 +188,28 @@ class Loop(Action):
         self.stop = stop
         self.step = step
     
+    @classmethod
+    def multistep(cls,
+            action: Action,
+            steps_per_run: int,
+            stop: Optional[int] = None,
+            start: int = 0) -> 'Loop':
+        """
+        Create loop over chunks of optimizer steps. The number of steps performed by
+        optimization actions in the body is set to `steps_per_run`, and the last chunk
+        is shortened when `stop` is not a multiple of it.
+
+            :param action: Action or list of actions, which will be run within loop.
+                Optimization actions must be made with multi-step optimizer tensors.
+            :param steps_per_run: Number of optimizer steps per loop iteration.
+            :param stop: Maximum number of optimizer steps.
+            :param start: Starting point for loop iterations.
+            :return: Loop instance.
+        """
+        loop = cls(action, stop=stop, start=start, step=steps_per_run)
+        loop._steps_per_run = steps_per_run
+        return loop
+
     @property
     def iteration(self) -> int:
         """Active iteration number."""
@@ -233,10 +260,14 @@ class Loop(Action):
             :param context: Action context.
         """
         iterator = itertools.count(start=self.start, step=self.step)
+        steps_per_run = _get_attr(self, _steps_per_run=None)
         for i in iterator:
             self.with_iteration(i)
             if self.stop is not None and i >= self.stop:
                 break
+            if steps_per_run is not None:
+                steps = steps_per_run if self.stop is None else min(steps_per_run, self.stop - i)
+                _set_steps_per_run(self._action, steps)
             try:
                 self._action(context)
             except Loop.Continue:
@@ -344,6 +375,28 @@ class Optimization(Action):
         self._run_kwargs = kwargs
         return self
 
+    def with_steps_tensor(self, tensor: tf.Tensor) -> 'Optimization':
+        """
+        Replace tensor which controls the number of steps performed by multi-step
+        optimizer tensor per single run.
+
+            :param tensor: Tensorflow integer scalar tensor.
+            :return: Optimization instance self reference.
+        """
+        self._steps_tensor = tensor
+        return self
+
+    def with_steps_per_run(self, steps: int) -> 'Optimization':
+        """
+        Replace the number of optimization steps performed per single run. It has an
+        effect only for multi-step optimizer tensors, see `with_steps_tensor`.
+
+            :param steps: Number of steps.
+            :return: Optimization instance self reference.
+        """
+        self._steps_per_run = steps
+        return self
+
     @property
     def model(self) -> Model:
         """The `model` is an attribute for getting optimization's model."""
@@ -361,9 +414,30 @@ class Optimization(Action):
     def run_kwargs(self):
         """The `run_kwargs` is an attribute for getting session run's kwargs."""
         return _get_attr(self, _run_kwargs=None)
+
+    @property
+    def steps_tensor(self) -> Optional[tf.Tensor]:
+        """
+        The `steps_tensor` is an attribute for getting tensor which controls
+        the number of steps of multi-step optimizer tensor.
+        """
+        return _get_attr(self, _steps_tensor=None)
+
+    @property
+    def steps_per_run(self) -> Optional[int]:
+        """
+        The `steps_per_run` is an attribute for getting the number of steps
+        performed by single run. None value means that optimizer tensor's default is used.
+        """
+        return _get_attr(self, _steps_per_run=None)
     
     def run(self, context: ActionContext) -> None:
-        context.session.run(self.optimizer_tensor, **self.run_kwargs)
+        run_kwargs = self.run_kwargs
+        if self.steps_tensor is not None and self.steps_per_run is not None:
+            feed_dict = dict(run_kwargs.get('feed_dict') or {})
+            feed_dict[self.steps_tensor] = self.steps_per_run
+            run_kwargs = dict(run_kwargs, feed_dict=feed_dict)
+        context.session.run(self.optimizer_tensor, **run_kwargs)
 
 
 def _get_attr(obj, **attr):
@@ -371,6 +445,14 @@ def _get_attr(obj, **attr):
     return getattr(obj, list(attr.keys())[0], list(attr.values())[0])
 
 
+def _set_steps_per_run(action, steps):
+    if isinstance(action, Optimization):
+        action.with_steps_per_run(steps)
+    elif isinstance(action, Group):
+        for a in action._actions:
+            _set_steps_per_run(a, steps)
+
+
 def _is_action(a):
     return isinstance(a, Action) or (callable(a) and len(inspect.signature(a).parameters) == 1)
 
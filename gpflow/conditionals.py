@@ -16,9 +16,10 @@
 import tensorflow as tf
 
 from . import features, mean_functions, settings
+from .covariance_factors import LowRankPlusDiagonal, SharedFactor
 from .decors import name_scope
 from .dispatch import conditional, sample_conditional
-from .expectations import expectation
+from .expectations import expectation, map_over_chunks
 from .features import InducingFeature, InducingPoints, Kuf, Kuu
 from .kernels import Kernel
 from .probability_distributions import Gaussian
@@ -204,7 +205,8 @@ def base_conditional(Kmn, Kmm, Knn, f, *, full_cov=False, q_sqrt=None, white=Fal
     :param Knn: N x N  or  N
     :param f: M x R
     :param full_cov: bool
-    :param q_sqrt: None or R x M x M (lower triangular)
+    :param q_sqrt: None or R x M x M (lower triangular), M x R (diagonal) or
+        `covariance_factors.CovarianceFactor`
     :param white: bool
     :return: N x R  or R x N x N
     """
@@ -232,19 +234,26 @@ def base_conditional(Kmn, Kmm, Knn, f, *, full_cov=False, q_sqrt=None, white=Fal
     fmean = tf.matmul(A, f, transpose_a=True)
 
     if q_sqrt is not None:
-        if q_sqrt.get_shape().ndims == 2:
-            LTA = A * tf.expand_dims(tf.transpose(q_sqrt), 2)  # R x M x N
+        if isinstance(q_sqrt, LowRankPlusDiagonal):
+            A_tiled = tf.tile(tf.expand_dims(A, 0), tf.stack([num_func, 1, 1]))
+            LTAs = [A * tf.expand_dims(tf.transpose(q_sqrt.diag), 2),  # R x M x N
+                    tf.matmul(q_sqrt.factor, A_tiled, transpose_a=True)]  # R x k x N
+        elif isinstance(q_sqrt, SharedFactor):
+            LTAs = [tf.matmul(q_sqrt.sqrt, A, transpose_a=True)]  # M x N, same for all R
+        elif q_sqrt.get_shape().ndims == 2:
+            LTAs = [A * tf.expand_dims(tf.transpose(q_sqrt), 2)]  # R x M x N
         elif q_sqrt.get_shape().ndims == 3:
             L = q_sqrt
             A_tiled = tf.tile(tf.expand_dims(A, 0), tf.stack([num_func, 1, 1]))
-            LTA = tf.matmul(L, A_tiled, transpose_a=True)  # R x M x N
+            LTAs = [tf.matmul(L, A_tiled, transpose_a=True)]  # R x M x N
         else:  # pragma: no cover
             raise ValueError("Bad dimension for q_sqrt: %s" %
                              str(q_sqrt.get_shape().ndims))
-        if full_cov:
-            fvar = fvar + tf.matmul(LTA, LTA, transpose_a=True)  # R x N x N
-        else:
-            fvar = fvar + tf.reduce_sum(tf.square(LTA), 1)  # R x N
+        for LTA in LTAs:
+            if full_cov:
+                fvar = fvar + tf.matmul(LTA, LTA, transpose_a=True)  # R x N x N
+            else:
+                fvar = fvar + tf.reduce_sum(tf.square(LTA), -2)  # R x N
 
     if not full_cov:
         fvar = tf.transpose(fvar)  # N x R
@@ -314,11 +323,25 @@ def uncertain_conditional(Xnew_mu, Xnew_var, feat, kern, q_mu, q_sqrt, *,
     fmean = tf.matmul(Li_eKuf, q_mu, transpose_a=True)
 
     eKff = expectation(pXnew, kern)  # N (psi0)
-    eKuffu = expectation(pXnew, (kern, feat), (kern, feat))  # N x M x M (psi2)
-    Luu_tiled = tf.tile(Luu[None, :, :], [num_data, 1, 1])  # remove this line, once issue 216 is fixed
-    Li_eKuffu = tf.matrix_triangular_solve(Luu_tiled, eKuffu, lower=True)
-    Li_eKuffu_Lit = tf.matrix_triangular_solve(Luu_tiled, tf.matrix_transpose(Li_eKuffu), lower=True)  # N x M x M
-    cov = tf.matmul(q_sqrt_r, q_sqrt_r, transpose_b=True)  # D x M x M
+    Kuu_inv = tf.cholesky_solve(Luu, tf.eye(num_ind, dtype=settings.float_type))  # M x M
+    Lit_q_mu = tf.matrix_triangular_solve(Luu, q_mu, adjoint=True)  # M x D
+    Luu_tiled = tf.tile(Luu[None, :, :], [num_func, 1, 1])  # remove this line, once issue 216 is fixed
+    Lit_q_sqrt = tf.matrix_triangular_solve(Luu_tiled, q_sqrt_r, adjoint=True)  # D x M x M
+    Lit_cov_Li = tf.matmul(Lit_q_sqrt, Lit_q_sqrt, transpose_b=True)  # D x M x M
+
+    def psi2_terms(pXchunk):
+        # Psi2 enters the variance only through inner products with M x M
+        # matrices, which are taken chunk by chunk instead of keeping N x M x M.
+        eKuffu = expectation(pXchunk, (kern, feat), (kern, feat))  # n x M x M (psi2)
+        trace = tf.einsum("nij,ij->n", eKuffu, Kuu_inv)
+        e_cov = tf.einsum("nij,dij->nd", eKuffu, Lit_cov_Li)
+        if full_output_cov:
+            e_q_mu = tf.einsum("ig,nij,jh->ngh", Lit_q_mu, eKuffu, Lit_q_mu)
+        else:
+            e_q_mu = tf.einsum("ig,nij,jg->ng", Lit_q_mu, eKuffu, Lit_q_mu)
+        return trace, e_cov, e_q_mu
+
+    trace, e_cov, e_q_mu = map_over_chunks(pXnew, psi2_terms)
 
     if mean_function is None or isinstance(mean_function, mean_functions.Zero):
         e_related_to_mean = tf.zeros((num_data, num_func, num_func), dtype=settings.float_type)
@@ -329,7 +352,6 @@ def uncertain_conditional(Xnew_mu, Xnew_var, feat, kern, q_mu, q_sqrt, *,
         # Calculate: m(x) m(x)^T + m(x) \mu(x)^T + \mu(x) m(x)^T,
         # where m(x) is the mean_function and \mu(x) is fmean
         e_mean_mean = expectation(pXnew, mean_function, mean_function)  # N x D x D
-        Lit_q_mu = tf.matrix_triangular_solve(Luu, q_mu, adjoint=True)
         e_mean_Kuf = expectation(pXnew, mean_function, (kern, feat))  # N x D x M
         # einsum isn't able to infer the rank of e_mean_Kuf, hence we explicitly set the rank of the tensor:
         e_mean_Kuf = tf.reshape(e_mean_Kuf, [num_data, num_func, num_ind])
@@ -338,19 +360,17 @@ def uncertain_conditional(Xnew_mu, Xnew_var, feat, kern, q_mu, q_sqrt, *,
 
     if full_output_cov:
         fvar = (
-                tf.matrix_diag(tf.tile((eKff - tf.trace(Li_eKuffu_Lit))[:, None], [1, num_func])) +
-                tf.matrix_diag(tf.einsum("nij,dji->nd", Li_eKuffu_Lit, cov)) +
-                # tf.matrix_diag(tf.trace(tf.matmul(Li_eKuffu_Lit, cov))) +
-                tf.einsum("ig,nij,jh->ngh", q_mu, Li_eKuffu_Lit, q_mu) -
-                # tf.matmul(q_mu, tf.matmul(Li_eKuffu_Lit, q_mu), transpose_a=True) -
+                tf.matrix_diag(tf.tile((eKff - trace)[:, None], [1, num_func])) +
+                tf.matrix_diag(e_cov) +
+                e_q_mu -
                 fmean[:, :, None] * fmean[:, None, :] +
                 e_related_to_mean
         )
     else:
         fvar = (
-                (eKff - tf.trace(Li_eKuffu_Lit))[:, None] +
-                tf.einsum("nij,dji->nd", Li_eKuffu_Lit, cov) +
-                tf.einsum("ig,nij,jg->ng", q_mu, Li_eKuffu_Lit, q_mu) -
+                (eKff - trace)[:, None] +
+                e_cov +
+                e_q_mu -
                 fmean ** 2 +
                 tf.matrix_diag_part(e_related_to_mean)
         )
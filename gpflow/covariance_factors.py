@@ -0,0 +1,43 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Structured square roots of covariances of variational distributions q(u).
+# They can be passed as `q_sqrt` to `conditionals.conditional` and
+# `kullback_leiblers.gauss_kl` in place of M x L or L x M x M tensors.
+
+
+class CovarianceFactor:
+    """
+    Base class of structured square roots of L covariance matrices of size M x M.
+    """
+
+
+class LowRankPlusDiagonal(CovarianceFactor):
+    """
+    Covariances S_l = diag(d_l)² + W_l W_lᵀ, which take O(M k) memory per latent.
+    """
+
+    def __init__(self, diag, factor):
+        self.diag = diag  # M x L
+        self.factor = factor  # L x M x k
+
+
+class SharedFactor(CovarianceFactor):
+    """
+    Covariance S = L Lᵀ shared by all latent functions, which takes O(M²) memory
+    in total.
+    """
+
+    def __init__(self, sqrt):
+        self.sqrt = sqrt  # M x M, lower triangular
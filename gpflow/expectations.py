@@ -42,6 +42,7 @@ logger = settings.logger()
 #   - RBF-Linear Cross Kernel Expectations
 #   - Product Kernel
 #   - Conversion to Gaussian from Diagonal or Markov
+# - Expectations Reduced over Data Points
 
 
 # ========================== QUADRATURE EXPECTATIONS ==========================
@@ -168,7 +169,7 @@ def _quadrature_expectation(p, obj1, feature1, obj2, feature2, num_gauss_hermite
 
 # =========================== ANALYTIC EXPECTATIONS ===========================
 
-def expectation(p, obj1, obj2=None, nghp=None):
+def expectation(p, obj1, obj2=None, nghp=None, reduce_n=False):
     """
     Compute the expectation <obj1(x) obj2(x)>_p(x)
     Uses multiple-dispatch to select an analytical implementation,
@@ -179,7 +180,11 @@ def expectation(p, obj1, obj2=None, nghp=None):
     :type obj2: kernel, mean function, (kernel, features), or None
     :param int nghp: passed to `_quadrature_expectation` to set the number
                      of Gauss-Hermite points used: `num_gauss_hermite_points`
-    :return: a 1-D, 2-D, or 3-D tensor containing the expectation
+    :param bool reduce_n: if True, the expectation is summed over the N points
+                          of p. Sums of Psi2 statistics are computed in closed form
+                          or chunk by chunk, without the NxMxM tensor.
+    :return: a 1-D, 2-D, or 3-D tensor containing the expectation,
+             with the leading N dimension removed if reduce_n is True
 
     Allowed combinations
 
@@ -200,6 +205,9 @@ def expectation(p, obj1, obj2=None, nghp=None):
 
     - different kernels. This occurs, for instance, when we are calculating Psi2 for Sum kernels:
         >>> eK1zxK2xz = expectation(p, (kern1, feat), (kern2, feat))  (NxMxM)
+
+    - sums over data points:
+        >>> sum_eKzxKxz = expectation(p, (kern, feat), (kern, feat), reduce_n=True)  (MxM)
     """
     if isinstance(p, tuple):
         assert len(p) == 2
@@ -221,6 +229,9 @@ def expectation(p, obj1, obj2=None, nghp=None):
     else:
         feat2 = None
 
+    if reduce_n:
+        return _reduced_expectation(p, obj1, feat1, obj2, feat2, nghp=nghp)
+
     try:
         return _expectation(p, obj1, feat1, obj2, feat2, nghp=nghp)
     except NotImplementedError as e:  # pragma: no cover
@@ -1058,3 +1069,154 @@ def _expectation(p, obj1, feat1, obj2, feat2, nghp=None):
         return expectation(gaussian, (obj2, feat2), nghp=nghp)
     else:
         return expectation(p, (obj1, feat1), (obj2, feat2), nghp=nghp)
+
+
+# ================== EXPECTATIONS REDUCED OVER DATA POINTS ===================
+
+def map_over_chunks(p, fn, reduce_n=False, chunk_size=None):
+    """
+    Evaluates `fn` on consecutive chunks of points of the distribution p in a
+    `tf.while_loop`, so that intermediate tensors of one chunk only are kept in
+    memory at a time. The results are concatenated along the first axis or,
+    if `reduce_n` is True, summed over chunks.
+
+    :param p: `Gaussian` or `DiagonalGaussian` distribution
+    :param fn: function of a distribution of the same type as p, returning
+               a tensor or a tuple of tensors
+    :param int chunk_size: number of points per chunk, defaults to
+                           `settings.numerics.psi_chunk_size`
+    :return: a tensor or a tuple of tensors, as returned by `fn`
+    """
+    if chunk_size is None:
+        chunk_size = settings.numerics.psi_chunk_size
+    if chunk_size <= 0:
+        raise ValueError('The chunk_size parameter must be greater zero.')
+
+    num_data = tf.shape(p.mu)[0]
+    num_chunks = tf.maximum((num_data + chunk_size - 1) // chunk_size, 1)
+
+    def chunk(i):
+        start = i * chunk_size
+        return type(p)(p.mu[start:start + chunk_size], p.cov[start:start + chunk_size])
+
+    first = fn(chunk(0))
+    single = not isinstance(first, (tuple, list))
+    first = (first,) if single else tuple(first)
+
+    def evaluate(i):
+        results = fn(chunk(i))
+        return (results,) if single else tuple(results)
+
+    if reduce_n:
+        initial = first
+        accumulate = lambda total, _i, result: total + result
+    else:
+        initial = tuple(tf.TensorArray(result.dtype, size=num_chunks, infer_shape=False).write(0, result)
+                        for result in first)
+        accumulate = lambda array, i, result: array.write(i, result)
+
+    def cond(i, *_accumulators):
+        return i < num_chunks
+
+    def body(i, *accumulators):
+        results = evaluate(i)
+        return (i + 1,) + tuple(accumulate(a, i, r) for a, r in zip(accumulators, results))
+
+    # Forward values of finished chunks are swapped to the host memory when
+    # they are kept for back-propagation.
+    outputs = tf.while_loop(cond, body, (tf.constant(1),) + initial, swap_memory=True)[1:]
+    if not reduce_n:
+        outputs = tuple(array.concat() for array in outputs)
+    return outputs[0] if single else outputs
+
+
+def _chunked_eKzxKxz(p, kern1, feat1, kern2, feat2, nghp=None):
+    def eKzxKxz(chunk):
+        return tf.reduce_sum(expectation(chunk, (kern1, feat1), (kern2, feat2), nghp=nghp), 0)
+
+    return map_over_chunks(p, eKzxKxz, reduce_n=True)
+
+
+@dispatch(object, object, (InducingFeature, type(None)), object, (InducingFeature, type(None)))
+def _reduced_expectation(p, obj1, feat1, obj2, feat2, nghp=None):
+    """
+    Compute the expectation summed over the points of p from the full
+    expectation, which is materialised.
+    """
+    return tf.reduce_sum(expectation(p, (obj1, feat1), (obj2, feat2), nghp=nghp), 0)
+
+
+@dispatch((Gaussian, DiagonalGaussian), kernels.Kernel, InducingPoints, kernels.Kernel, InducingPoints)
+def _reduced_expectation(p, kern1, feat1, kern2, feat2, nghp=None):
+    r"""
+    Compute the expectation:
+    \Sum_n <K1_{Z1, x_n} K2_{x_n, Z2}>_p(x_n)
+    chunk by chunk, so that only chunk_size x M1 x M2 slices of Psi2 are kept
+    in memory. This covers RBF, Product and cross kernel expectations.
+
+    :return: M1xM2
+    """
+    if kern1.on_separate_dims(kern2) and isinstance(p, DiagonalGaussian):
+        # no joint expectations required
+        eKxz1 = expectation(p, (kern1, feat1))
+        eKxz2 = expectation(p, (kern2, feat2))
+        return tf.matmul(eKxz1, eKxz2, transpose_a=True)
+
+    return _chunked_eKzxKxz(p, kern1, feat1, kern2, feat2, nghp=nghp)
+
+
+@dispatch((Gaussian, DiagonalGaussian), kernels.Linear, InducingPoints, kernels.Linear, InducingPoints)
+def _reduced_expectation(p, kern1, feat1, kern2, feat2, nghp=None):
+    r"""
+    Compute the expectation:
+    \Sum_n <K_{Z, x_n} K_{x_n, Z}>_p(x_n)
+        - K_{.,.} :: Linear kernel
+    in closed form, Z diag(v) (\Sum_n Σ_n + μ_n μ_nᵀ) diag(v) Zᵀ.
+
+    :return: MxM
+    """
+    if kern1.on_separate_dims(kern2) and isinstance(p, DiagonalGaussian):
+        eKxz1 = expectation(p, (kern1, feat1))
+        eKxz2 = expectation(p, (kern2, feat2))
+        return tf.matmul(eKxz1, eKxz2, transpose_a=True)
+
+    if kern1 != kern2 or feat1 != feat2:
+        return _chunked_eKzxKxz(p, kern1, feat1, kern2, feat2, nghp=nghp)
+
+    kern = kern1
+    feat = feat1
+
+    with params_as_tensors_for(kern, feat):
+        # use only active dimensions
+        Xcov = kern._slice_cov(tf.reduce_sum(p.cov, 0, keepdims=True))[0]  # DxD
+        Z, Xmu = kern._slice(feat.Z, p.mu)
+
+        XX = Xcov + tf.matmul(Xmu, Xmu, transpose_a=True)  # DxD
+        var_Z = kern.variance * Z  # MxD
+        return tf.matmul(tf.matmul(var_Z, XX), var_Z, transpose_b=True)
+
+
+@dispatch((Gaussian, DiagonalGaussian), kernels.Sum, InducingPoints, kernels.Sum, InducingPoints)
+def _reduced_expectation(p, kern1, feat1, kern2, feat2, nghp=None):
+    r"""
+    Compute the expectation:
+    \Sum_n <(\Sum_i K1_i_{Z1, x_n}) (\Sum_j K2_j_{x_n, Z2})>_p(x_n)
+        - \Sum_i K1_i_{.,.}, \Sum_j K2_j_{.,.} :: Sum kernels
+
+    :return: M1xM2
+    """
+    crossexps = []
+
+    if kern1 == kern2 and feat1 == feat2:  # avoid duplicate computation by using transposes
+        for i, k1 in enumerate(kern1.kernels):
+            crossexps.append(expectation(p, (k1, feat1), (k1, feat1), nghp=nghp, reduce_n=True))
+
+            for k2 in kern1.kernels[:i]:
+                eKK = expectation(p, (k1, feat1), (k2, feat2), nghp=nghp, reduce_n=True)
+                eKK += tf.transpose(eKK)
+                crossexps.append(eKK)
+    else:
+        for k1, k2 in it.product(kern1.kernels, kern2.kernels):
+            crossexps.append(expectation(p, (k1, feat1), (k2, feat2), nghp=nghp, reduce_n=True))
+
+    return functools.reduce(tf.add, crossexps)
@@ -0,0 +1,231 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Export of the posteriors of GPR, SGPR and SVGP models for serving predictions without
+TensorFlow, see `gpflow.predictor.NumpyPredictor`. All three models predict at new
+points x* as
+
+    mean = Kuxᵀ a + m(x*),    var = k(x*, x*) - Kuxᵀ C Kux,
+
+where Kux = k(U, x*) for the training inputs (GPR) or the inducing inputs (SGPR, SVGP)
+U. The export stores U, the M x L weights a, the M x M or L x M x M matrices C and the
+hyperparameters of the kernel, mean function and likelihood in an `.npz` file.
+
+>>> gpflow.export.export_predictor(model, 'model.npz')
+"""
+
+import json
+
+import numpy as np
+import tensorflow as tf
+
+from . import features
+from . import kernels
+from . import likelihoods
+from . import mean_functions
+from . import settings
+from .core.compilable import Build
+from .core.errors import GPflowError
+from .covariance_factors import LowRankPlusDiagonal, SharedFactor
+from .decors import params_as_tensors_for
+from .models import GPR, SGPR, SVGP
+
+
+def export_predictor(model, pathname, session=None):
+    """
+    Exports the posterior of a GPR, SGPR or SVGP model to an `.npz` file loadable by
+    `gpflow.predictor.NumpyPredictor`.
+
+    :param model: compiled GPR, SGPR or SVGP model.
+    :param pathname: file name, `.npz` is appended when missing.
+    :param session: session holding the values of the model, the default session
+        if None.
+    :raises NotImplementedError: models, kernels, features or mean functions which
+        the NumPy predictor does not implement.
+    """
+    build_summary = _summaries.get(type(model))
+    if build_summary is None:
+        raise NotImplementedError('Export of {} models is not supported.'
+                                  .format(type(model).__name__))
+    session = model.enquire_session(session)
+    if model.is_built_coherence(session.graph) is not Build.YES:
+        raise GPflowError('Model must be compiled before the export.')
+
+    spec = dict(model=type(model).__name__,
+                kernel=_kernel_spec(model.kern, session),
+                mean_function=_mean_function_spec(model.mean_function, session),
+                likelihood=_likelihood_spec(model.likelihood, session))
+    with session.graph.as_default(), tf.name_scope('export_predictor'):
+        with params_as_tensors_for(model):
+            tensors = build_summary(model)
+        inducing, weights, covariance = session.run(tensors)
+    np.savez(pathname, spec=np.array(json.dumps(spec)), inducing=inducing,
+             weights=weights, covariance=covariance)
+
+
+def _gpr_summary(model):
+    X = model.X
+    eye = tf.eye(tf.shape(X)[0], dtype=settings.float_type)
+    L = tf.cholesky(model.kern.K(X) + eye * model.likelihood.variance)
+    err = model.Y - model.mean_function(X)
+    return X, tf.cholesky_solve(L, err), tf.cholesky_solve(L, eye)
+
+
+def _sgpr_summary(model):
+    _check_feature(model.feature)
+    num_inducing = len(model.feature)
+    eye = tf.eye(num_inducing, dtype=settings.float_type)
+    err = model.Y - model.mean_function(model.X)
+    Kuf = features.Kuf(model.feature, model.kern, model.X)
+    Kuu = features.Kuu(model.feature, model.kern, jitter=settings.numerics.jitter_level)
+    sigma = tf.sqrt(model.likelihood.variance)
+    L = tf.cholesky(Kuu)
+    A = tf.matrix_triangular_solve(L, Kuf, lower=True) / sigma
+    B = tf.matmul(A, A, transpose_b=True) + eye
+    LB = tf.cholesky(B)
+    c = tf.matrix_triangular_solve(LB, tf.matmul(A, err), lower=True) / sigma
+    Linv = tf.matrix_triangular_solve(L, eye, lower=True)
+    # a = L⁻ᵀ LB⁻ᵀ c, C = L⁻ᵀ (I - B⁻¹) L⁻¹
+    weights = tf.matmul(Linv, tf.matrix_triangular_solve(LB, c, lower=True, adjoint=True),
+                        transpose_a=True)
+    covariance = tf.matmul(Linv, tf.matmul(eye - tf.cholesky_solve(LB, eye), Linv),
+                           transpose_a=True)
+    return model.feature.Z, weights, covariance
+
+
+def _svgp_summary(model):
+    _check_feature(model.feature)
+    num_inducing = len(model.feature)
+    num_latent = tf.shape(model.q_mu)[1]
+    eye = tf.eye(num_inducing, dtype=settings.float_type)
+    Kuu = features.Kuu(model.feature, model.kern, jitter=settings.numerics.jitter_level)
+    Lm = tf.cholesky(Kuu)
+    Kuu_inv = tf.cholesky_solve(Lm, eye)
+    if model.whiten:
+        # a = Lm⁻ᵀ q_mu, C = Kuu⁻¹ - Lm⁻ᵀ S Lm⁻¹
+        R = tf.matrix_triangular_solve(Lm, eye, lower=True)
+        weights = tf.matmul(R, model.q_mu, transpose_a=True)
+    else:
+        # a = Kuu⁻¹ q_mu, C = Kuu⁻¹ - Kuu⁻¹ S Kuu⁻¹
+        R = Kuu_inv
+        weights = tf.matmul(R, model.q_mu)
+    R = tf.tile(R[None, :, :], [num_latent, 1, 1])
+    S = _q_covariance(model.build_q_sqrt(), num_latent)
+    covariance = Kuu_inv[None, :, :] - tf.matmul(R, tf.matmul(S, R), transpose_a=True)
+    return model.feature.Z, weights, covariance
+
+
+_summaries = {GPR: _gpr_summary, SGPR: _sgpr_summary, SVGP: _svgp_summary}
+
+
+def _q_covariance(q_sqrt, num_latent):
+    """
+    Covariances of q(u), L x M x M, from any square root accepted by `conditional`.
+    """
+    if isinstance(q_sqrt, LowRankPlusDiagonal):
+        diag = tf.matrix_diag(tf.matrix_transpose(tf.square(q_sqrt.diag)))
+        return diag + tf.matmul(q_sqrt.factor, q_sqrt.factor, transpose_b=True)
+    if isinstance(q_sqrt, SharedFactor):
+        S = tf.matmul(q_sqrt.sqrt, q_sqrt.sqrt, transpose_b=True)
+        return tf.tile(S[None, :, :], [num_latent, 1, 1])
+    if q_sqrt.shape.ndims == 2:
+        return tf.matrix_diag(tf.matrix_transpose(tf.square(q_sqrt)))
+    return tf.matmul(q_sqrt, q_sqrt, transpose_b=True)
+
+
+def _check_feature(feature):
+    if type(feature) is not features.InducingPoints:
+        raise NotImplementedError('Export of {} features is not supported.'
+                                  .format(type(feature).__name__))
+
+
+def _values(obj, session, *names):
+    return {name: np.asarray(getattr(obj, name).read_value(session)).tolist() for name in names}
+
+
+_stationary_kernels = {
+    kernels.SquaredExponential: 'SquaredExponential',
+    kernels.RationalQuadratic: 'RationalQuadratic',
+    kernels.Exponential: 'Exponential',
+    kernels.Matern12: 'Matern12',
+    kernels.Matern32: 'Matern32',
+    kernels.Matern52: 'Matern52',
+    kernels.Cosine: 'Cosine',
+}
+
+
+def _kernel_spec(kern, session):
+    kind = type(kern)
+    if kind in (kernels.Sum, kernels.Product):
+        return dict(type=kind.__name__, kernels=[_kernel_spec(k, session) for k in kern.kernels])
+    if kind is kernels.White:
+        return dict(type='White', **_values(kern, session, 'variance'))
+    if kind in (kernels.Constant, kernels.Bias):
+        return dict(type='Constant', **_values(kern, session, 'variance'))
+
+    if isinstance(kern.active_dims, slice):
+        dims = kern.active_dims
+        active_dims = dict(slice=[dims.start, dims.stop, dims.step])
+    else:
+        active_dims = [int(d) for d in kern.active_dims]
+    if kind in _stationary_kernels:
+        names = ('variance', 'lengthscales', 'alpha') if kind is kernels.RationalQuadratic \
+            else ('variance', 'lengthscales')
+        spec = dict(type=_stationary_kernels[kind], **_values(kern, session, *names))
+    elif kind is kernels.Periodic:
+        spec = dict(type='Periodic', **_values(kern, session, 'variance', 'lengthscales', 'period'))
+    elif kind is kernels.Linear:
+        spec = dict(type='Linear', **_values(kern, session, 'variance'))
+    elif kind is kernels.Polynomial:
+        spec = dict(type='Polynomial', degree=float(kern.degree),
+                    **_values(kern, session, 'variance', 'offset'))
+    else:
+        raise NotImplementedError('Export of {} kernels is not supported.'.format(kind.__name__))
+    spec['active_dims'] = active_dims
+    return spec
+
+
+def _mean_function_spec(mean_function, session):
+    kind = type(mean_function)
+    if kind is mean_functions.Zero:
+        return dict(type='Zero', output_dim=int(mean_function.output_dim))
+    if kind is mean_functions.Identity:
+        return dict(type='Identity')
+    if kind is mean_functions.Linear:
+        return dict(type='Linear', **_values(mean_function, session, 'A', 'b'))
+    if kind is mean_functions.Constant:
+        return dict(type='Constant', **_values(mean_function, session, 'c'))
+    if kind is mean_functions.Additive:
+        return dict(type='Additive', parts=[_mean_function_spec(mean_function.add_1, session),
+                                            _mean_function_spec(mean_function.add_2, session)])
+    if kind is mean_functions.Product:
+        return dict(type='Product', parts=[_mean_function_spec(mean_function.prod_1, session),
+                                           _mean_function_spec(mean_function.prod_2, session)])
+    raise NotImplementedError('Export of {} mean functions is not supported.'.format(kind.__name__))
+
+
+def _likelihood_spec(likelihood, session):
+    """
+    Likelihoods without closed form predictive moments are exported as unsupported,
+    predict_f of the NumPy predictor is still available for them.
+    """
+    kind = type(likelihood)
+    if kind is likelihoods.Gaussian:
+        return dict(type='Gaussian', **_values(likelihood, session, 'variance'))
+    if kind is likelihoods.Bernoulli and likelihood.invlink is likelihoods.inv_probit:
+        return dict(type='Bernoulli')
+    if kind is likelihoods.Poisson and likelihood.invlink is tf.exp:
+        return dict(type='Poisson', binsize=float(likelihood.binsize))
+    return dict(type='unsupported', name=kind.__name__)
@@ -19,7 +19,7 @@ import numpy as np
 import tensorflow as tf
 
 from . import transforms, kernels, settings
-from .decors import params_as_tensors, params_as_tensors_for
+from .decors import params_as_tensors, params_as_tensors_for, name_scope
 from .params import Parameter, Parameterized
 from .dispatch import dispatch
 
@@ -61,6 +61,7 @@ class InducingPoints(InducingPointsBase):
     pass
 
 @dispatch(InducingPoints, kernels.Kernel)
+@name_scope('Kuu')
 def Kuu(feat, kern, *, jitter=0.0):
     with params_as_tensors_for(feat):
         Kzz = kern.K(feat.Z)
@@ -68,6 +69,7 @@ def Kuu(feat, kern, *, jitter=0.0):
     return Kzz
 
 @dispatch(InducingPoints, kernels.Kernel, object)
+@name_scope('Kuf')
 def Kuf(feat, kern, Xnew):
     with params_as_tensors_for(feat):
         Kzx = kern.K(feat.Z, Xnew)
@@ -107,6 +109,7 @@ class Multiscale(InducingPointsBase):
 
 
 @dispatch(Multiscale, kernels.RBF, object)
+@name_scope('Kuf')
 def Kuf(feat, kern, Xnew):
     with params_as_tensors_for(feat, kern):
         Xnew, _ = kern._slice(Xnew, None)
@@ -119,6 +122,7 @@ def Kuf(feat, kern, Xnew):
     return Kuf
 
 @dispatch(Multiscale, kernels.RBF)
+@name_scope('Kuu')
 def Kuu(feat, kern, *, jitter=0.0):
     with params_as_tensors_for(feat, kern):
         Zmu, Zlen = kern._slice(feat.Z, feat.scales)
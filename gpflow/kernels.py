@@ -24,7 +24,7 @@ from . import transforms
 from . import settings
 
 from .params import Parameter, Parameterized, ParamList
-from .decors import params_as_tensors, autoflow
+from .decors import params_as_tensors, autoflow, name_scope
 
 
 class Kernel(Parameterized):
@@ -177,6 +177,7 @@ class Static(Kernel):
         self.variance = Parameter(variance, transform=transforms.positive,
                                   dtype=settings.float_type)
 
+    @name_scope('Kdiag')
     @params_as_tensors
     def Kdiag(self, X):
         return tf.fill(tf.shape(X)[:-1], tf.squeeze(self.variance))
@@ -187,6 +188,7 @@ class White(Static):
     The White kernel
     """
 
+    @name_scope('K')
     @params_as_tensors
     def K(self, X, X2=None, presliced=False):
         if X2 is None:
@@ -204,6 +206,7 @@ class Constant(Static):
     The Constant (aka Bias) kernel
     """
 
+    @name_scope('K')
     @params_as_tensors
     def K(self, X, X2=None, presliced=False):
         if X2 is None:
@@ -297,10 +300,12 @@ class Stationary(Kernel):
         return self._clipped_sqrt(r2)
 
 
+    @name_scope('Kdiag')
     @params_as_tensors
     def Kdiag(self, X, presliced=False):
         return tf.fill(tf.shape(X)[:-1], tf.squeeze(self.variance))
 
+    @name_scope('K')
     @params_as_tensors
     def K(self, X, X2=None, presliced=False):
         """
@@ -389,6 +394,7 @@ class Linear(Kernel):
         self.variance = Parameter(variance, transform=transforms.positive,
                                   dtype=settings.float_type)
 
+    @name_scope('K')
     @params_as_tensors
     def K(self, X, X2=None, presliced=False):
         if not presliced:
@@ -398,6 +404,7 @@ class Linear(Kernel):
         else:
             return tf.matmul(X * self.variance, X2, transpose_b=True)
 
+    @name_scope('Kdiag')
     @params_as_tensors
     def Kdiag(self, X, presliced=False):
         if not presliced:
@@ -431,10 +438,12 @@ class Polynomial(Linear):
         self.offset = Parameter(offset, transform=transforms.positive,
                                 dtype=settings.float_type)
 
+    @name_scope('K')
     @params_as_tensors
     def K(self, X, X2=None, presliced=False):
         return (Linear.K(self, X, X2, presliced=presliced) + self.offset) ** self.degree
 
+    @name_scope('Kdiag')
     @params_as_tensors
     def Kdiag(self, X, presliced=False):
         return (Linear.Kdiag(self, X, presliced=presliced) + self.offset) ** self.degree
@@ -492,6 +501,44 @@ class Cosine(Stationary):
         return self.variance * tf.cos(r)
 
 
+class Wendland(Stationary):
+    """
+    The compactly supported piecewise polynomial kernels of Wendland, as given
+    by Rasmussen and Williams (2006), eq. (4.21),
+
+    k(r) = σ² (1 - r)₊^(j + q) p_q(r),  j = ⌊D / 2⌋ + q + 1,
+
+    σ² : variance
+    ℓ  : lengthscales, the kernel vanishes for |x - x'| / ℓ ≥ 1
+    q  : smoothness, the sample paths are 2q times differentiable
+
+    The kernel is positive definite for inputs of dimension at most `input_dim`
+    and its Gram matrices are sparse when lengthscales are small compared with
+    the spread of the data.
+    """
+
+    def __init__(self, input_dim, variance=1.0, lengthscales=1.0, q=1,
+                 active_dims=None, ARD=None, name=None):
+        if q not in (0, 1, 2, 3):
+            raise ValueError('The q parameter must be 0, 1, 2 or 3.')
+        super().__init__(input_dim, variance, lengthscales, active_dims, ARD, name)
+        self.q = q
+
+    @params_as_tensors
+    def K_r(self, r):
+        j = self.input_dim // 2 + self.q + 1
+        if self.q == 0:
+            poly = 1.
+        elif self.q == 1:
+            poly = (j + 1) * r + 1
+        elif self.q == 2:
+            poly = ((j ** 2 + 4 * j + 3) * r ** 2 + (3 * j + 6) * r + 3) / 3.
+        else:
+            poly = ((j ** 3 + 9 * j ** 2 + 23 * j + 15) * r ** 3 +
+                    (6 * j ** 2 + 36 * j + 45) * r ** 2 + (15 * j + 45) * r + 15) / 15.
+        return self.variance * tf.maximum(1. - r, 0.) ** (j + self.q) * poly
+
+
 class ArcCosine(Kernel):
     """
     The Arc-cosine family of kernels which mimics the computation in neural
@@ -562,6 +609,7 @@ class ArcCosine(Kernel):
             return 3. * tf.sin(theta) * tf.cos(theta) + \
                    (np.pi - theta) * (1. + 2. * tf.cos(theta) ** 2)
 
+    @name_scope('K')
     @params_as_tensors
     def K(self, X, X2=None, presliced=False):
         if not presliced:
@@ -585,6 +633,7 @@ class ArcCosine(Kernel):
                X_denominator ** self.order * \
                X2_denominator ** self.order
 
+    @name_scope('Kdiag')
     @params_as_tensors
     def Kdiag(self, X, presliced=False):
         if not presliced:
@@ -623,10 +672,12 @@ class Periodic(Kernel):
         self.period = Parameter(period, transform=transforms.positive,
                                 dtype=settings.float_type)
 
+    @name_scope('Kdiag')
     @params_as_tensors
     def Kdiag(self, X, presliced=False):
         return tf.fill(tf.shape(X)[:-1], tf.squeeze(self.variance))
 
+    @name_scope('K')
     @params_as_tensors
     def K(self, X, X2=None, presliced=False):
         if not presliced:
@@ -677,6 +728,7 @@ class Coregion(Kernel):
         self.W = Parameter(np.zeros((self.output_dim, self.rank), dtype=settings.float_type))
         self.kappa = Parameter(np.ones(self.output_dim, dtype=settings.float_type), transform=transforms.positive)
 
+    @name_scope('K')
     @params_as_tensors
     def K(self, X, X2=None):
         X, X2 = self._slice(X, X2)
@@ -688,6 +740,7 @@ class Coregion(Kernel):
         B = tf.matmul(self.W, self.W, transpose_b=True) + tf.matrix_diag(self.kappa)
         return tf.gather(tf.transpose(tf.gather(B, X2)), X)
 
+    @name_scope('Kdiag')
     @params_as_tensors
     def Kdiag(self, X):
         X, _ = self._slice(X, None)
@@ -746,17 +799,21 @@ class Combination(Kernel):
 
 
 class Sum(Combination):
+    @name_scope('K')
     def K(self, X, X2=None, presliced=False):
         return reduce(tf.add, [k.K(X, X2) for k in self.kernels])
 
+    @name_scope('Kdiag')
     def Kdiag(self, X, presliced=False):
         return reduce(tf.add, [k.Kdiag(X) for k in self.kernels])
 
 
 class Product(Combination):
+    @name_scope('K')
     def K(self, X, X2=None, presliced=False):
         return reduce(tf.multiply, [k.K(X, X2) for k in self.kernels])
 
+    @name_scope('Kdiag')
     def Kdiag(self, X, presliced=False):
         return reduce(tf.multiply, [k.Kdiag(X) for k in self.kernels])
 
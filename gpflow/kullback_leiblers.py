@@ -18,6 +18,7 @@
 import tensorflow as tf
 
 from . import settings
+from .covariance_factors import LowRankPlusDiagonal, SharedFactor
 from .decors import name_scope
 
 
@@ -39,6 +40,8 @@ def gauss_kl(q_mu, q_sqrt, K=None):
         triangular square-root matrix of the covariance of q.
     q_sqrt can be a matrix (M x L), each column represents the diagonal of a
         square-root matrix of the covariance of q.
+    q_sqrt can be a `covariance_factors.LowRankPlusDiagonal` or
+        `covariance_factors.SharedFactor` structured square root.
 
     K is the covariance of p.
     It is a positive definite matrix (M x M) or a tensor of stacked such matrices (L x M x M)
@@ -46,7 +49,8 @@ def gauss_kl(q_mu, q_sqrt, K=None):
     """
 
     white = K is None
-    diag = q_sqrt.get_shape().ndims == 2
+    structured = isinstance(q_sqrt, (LowRankPlusDiagonal, SharedFactor))
+    diag = not structured and q_sqrt.get_shape().ndims == 2
 
     M, B = tf.shape(q_mu)[0], tf.shape(q_mu)[1]
 
@@ -59,6 +63,37 @@ def gauss_kl(q_mu, q_sqrt, K=None):
         q_mu = tf.transpose(q_mu)[:, :, None] if batch else q_mu  # B x M x 1 or M x B
         alpha = tf.matrix_triangular_solve(Lp, q_mu, lower=True)  # B x M x 1 or M x B
 
+    # Mahalanobis term: μqᵀ Σp⁻¹ μq
+    mahalanobis = tf.reduce_sum(tf.square(alpha))
+
+    # Constant term: - B * M
+    constant = - tf.cast(tf.size(q_mu, out_type=tf.int64), dtype=settings.float_type)
+
+    if structured:
+        Lp_full = None if white else Lp if batch else tf.tile(tf.expand_dims(Lp, 0), [B, 1, 1])
+        logdet_qcov, trace = _structured_logdet_and_trace(q_sqrt, Lp_full, B)
+    else:
+        logdet_qcov, trace = _logdet_and_trace(q_sqrt, None if white else Lp, diag, B)
+
+    twoKL = mahalanobis + constant - logdet_qcov + trace
+
+    # Log-determinant of the covariance of p(x):
+    if not white:
+        log_sqdiag_Lp = tf.log(tf.square(tf.matrix_diag_part(Lp)))
+        sum_log_sqdiag_Lp = tf.reduce_sum(log_sqdiag_Lp)
+        # If K is B x M x M, num_latent is no longer implicit, no need to multiply the single kernel logdet
+        scale = 1.0 if batch else tf.cast(B, settings.float_type)
+        twoKL += scale * sum_log_sqdiag_Lp
+
+    return 0.5 * twoKL
+
+
+def _logdet_and_trace(q_sqrt, Lp, diag, B):
+    """
+    Log-determinant of covariances of q and trace term tr(Σp⁻¹ Σq) summed over
+    B latent functions, for diagonal and lower triangular square roots. `Lp` is
+    M x M or B x M x M Cholesky factor of Σp or None for Σp = I.
+    """
     if diag:
         Lq = Lq_diag = q_sqrt
         Lq_full = tf.matrix_diag(tf.transpose(q_sqrt))  # B x M x M
@@ -66,21 +101,17 @@ def gauss_kl(q_mu, q_sqrt, K=None):
         Lq = Lq_full = tf.matrix_band_part(q_sqrt, -1, 0)  # force lower triangle # B x M x M
         Lq_diag = tf.matrix_diag_part(Lq)  # M x B
 
-    # Mahalanobis term: μqᵀ Σp⁻¹ μq
-    mahalanobis = tf.reduce_sum(tf.square(alpha))
-
-    # Constant term: - B * M
-    constant = - tf.cast(tf.size(q_mu, out_type=tf.int64), dtype=settings.float_type)
-
     # Log-determinant of the covariance of q(x):
     logdet_qcov = tf.reduce_sum(tf.log(tf.square(Lq_diag)))
 
     # Trace term: tr(Σp⁻¹ Σq)
-    if white:
+    if Lp is None:
         trace = tf.reduce_sum(tf.square(Lq))
     else:
+        batch = Lp.get_shape().ndims == 3
         if diag and not batch:
             # K is M x M and q_sqrt is M x B: fast specialisation
+            M = tf.shape(Lp)[0]
             LpT = tf.transpose(Lp)  # M x M
             Lp_inv = tf.matrix_triangular_solve(Lp, tf.eye(M, dtype=settings.float_type),lower=True)  # M x M
             K_inv = tf.matrix_diag_part(tf.matrix_triangular_solve(LpT, Lp_inv, lower=False))[:, None]  # M x M -> M x 1
@@ -90,15 +121,41 @@ def gauss_kl(q_mu, q_sqrt, K=None):
             Lp_full = Lp if batch else tf.tile(tf.expand_dims(Lp, 0), [B, 1, 1])
             LpiLq = tf.matrix_triangular_solve(Lp_full, Lq_full, lower=True)
             trace = tf.reduce_sum(tf.square(LpiLq))
+    return logdet_qcov, trace
 
-    twoKL = mahalanobis + constant - logdet_qcov + trace
-
-    # Log-determinant of the covariance of p(x):
-    if not white:
-        log_sqdiag_Lp = tf.log(tf.square(tf.matrix_diag_part(Lp)))
-        sum_log_sqdiag_Lp = tf.reduce_sum(log_sqdiag_Lp)
-        # If K is B x M x M, num_latent is no longer implicit, no need to multiply the single kernel logdet
-        scale = 1.0 if batch else tf.cast(B, settings.float_type)
-        twoKL += scale * sum_log_sqdiag_Lp
 
-    return 0.5 * twoKL
+def _structured_logdet_and_trace(q_sqrt, Lp, B):
+    """
+    Log-determinant of covariances of q and trace term tr(Σp⁻¹ Σq) summed over
+    B latent functions, for structured square roots. `Lp` is B x M x M Cholesky
+    factor of Σp or None for Σp = I.
+    """
+    if isinstance(q_sqrt, SharedFactor):
+        L = tf.matrix_band_part(q_sqrt.sqrt, -1, 0)  # M x M
+        num_latent = tf.cast(B, settings.float_type)
+        logdet_qcov = num_latent * tf.reduce_sum(tf.log(tf.square(tf.matrix_diag_part(L))))
+        if Lp is None:
+            trace = num_latent * tf.reduce_sum(tf.square(L))
+        else:
+            L_tiled = tf.tile(tf.expand_dims(L, 0), [B, 1, 1])
+            trace = tf.reduce_sum(tf.square(tf.matrix_triangular_solve(Lp, L_tiled, lower=True)))
+        return logdet_qcov, trace
+
+    # Σq = D² + W Wᵀ, the matrix determinant lemma gives
+    # log|Σq| = log|D²| + log|I + Wᵀ D⁻² W|.
+    d, W = q_sqrt.diag, q_sqrt.factor  # M x B, B x M x k
+    W_scaled = W / tf.expand_dims(tf.transpose(d), 2)
+    k = tf.shape(W)[2]
+    C = tf.eye(k, dtype=settings.float_type) + tf.matmul(W_scaled, W_scaled, transpose_a=True)
+    logdet_qcov = tf.reduce_sum(tf.log(tf.square(d))) + \
+        2. * tf.reduce_sum(tf.log(tf.matrix_diag_part(tf.cholesky(C))))
+    if Lp is None:
+        trace = tf.reduce_sum(tf.square(d)) + tf.reduce_sum(tf.square(W))
+    else:
+        M = tf.shape(d)[0]
+        eye = tf.tile(tf.expand_dims(tf.eye(M, dtype=settings.float_type), 0), [B, 1, 1])
+        Lp_inv = tf.matrix_triangular_solve(Lp, eye, lower=True)  # B x M x M
+        Kinv_diag = tf.reduce_sum(tf.square(Lp_inv), 1)  # B x M
+        trace = tf.reduce_sum(Kinv_diag * tf.square(tf.transpose(d))) + \
+            tf.reduce_sum(tf.square(tf.matrix_triangular_solve(Lp, W, lower=True)))
+    return logdet_qcov, trace
@@ -23,6 +23,7 @@ from . import settings
 from . import transforms
 from .decors import params_as_tensors
 from .decors import params_as_tensors_for
+from .decors import name_scope
 from .params import ParamList
 from .params import Parameter
 from .params import Parameterized
@@ -88,6 +89,7 @@ class Likelihood(Parameterized):
                          self.num_gauss_hermite_points,
                          Fmu, Fvar, logspace=True, Y=Y)
 
+    @name_scope('variational_expectations')
     def variational_expectations(self, Fmu, Fvar, Y):
         r"""
         Compute the expected log density of the data, given a Gaussian
@@ -139,6 +141,7 @@ class Gaussian(Likelihood):
     def predict_density(self, Fmu, Fvar, Y):
         return logdensities.gaussian(Y, Fmu, Fvar + self.variance)
 
+    @name_scope('variational_expectations')
     @params_as_tensors
     def variational_expectations(self, Fmu, Fvar, Y):
         return -0.5 * np.log(2 * np.pi) - 0.5 * tf.log(self.variance) \
@@ -174,6 +177,7 @@ class Poisson(Likelihood):
     def conditional_mean(self, F):
         return self.invlink(F) * self.binsize
 
+    @name_scope('variational_expectations')
     def variational_expectations(self, Fmu, Fvar, Y):
         if self.invlink is tf.exp:
             return Y * Fmu - tf.exp(Fmu + Fvar / 2) * self.binsize \
@@ -195,6 +199,7 @@ class Exponential(Likelihood):
     def conditional_variance(self, F):
         return tf.square(self.invlink(F))
 
+    @name_scope('variational_expectations')
     def variational_expectations(self, Fmu, Fvar, Y):
         if self.invlink is tf.exp:
             return - tf.exp(-Fmu + Fvar / 2) * Y - Fmu
@@ -282,6 +287,7 @@ class Gamma(Likelihood):
         scale = self.invlink(F)
         return self.shape * tf.square(scale)
 
+    @name_scope('variational_expectations')
     @params_as_tensors
     def variational_expectations(self, Fmu, Fvar, Y):
         if self.invlink is tf.exp:
@@ -411,6 +417,7 @@ class MultiClass(Likelihood):
         else:
             raise NotImplementedError
 
+    @name_scope('variational_expectations')
     def variational_expectations(self, Fmu, Fvar, Y):
         if isinstance(self.invlink, RobustMax):
             with params_as_tensors_for(self.invlink):
@@ -501,6 +508,7 @@ class SwitchedLikelihood(Likelihood):
     def predict_density(self, Fmu, Fvar, Y):
         return self._partition_and_stitch([Fmu, Fvar, Y], 'predict_density')
 
+    @name_scope('variational_expectations')
     def variational_expectations(self, Fmu, Fvar, Y):
         return self._partition_and_stitch([Fmu, Fvar, Y], 'variational_expectations')
 
@@ -646,6 +654,7 @@ class MonteCarloLikelihood(Likelihood):
         """
         return self._mc_quadrature(self.logp, Fmu, Fvar, Y=Y, logspace=True, epsilon=epsilon)
 
+    @name_scope('variational_expectations')
     def variational_expectations(self, Fmu, Fvar, Y, epsilon=None):
         r"""
         Compute the expected log density of the data, given a Gaussian
@@ -16,10 +16,13 @@
 
 from .model import Model
 from .model import GPModel
+from .cache import SummaryCache
 from .gpr import GPR
 from .gpmc import GPMC
 from .gplvm import GPLVM
 from .gplvm import BayesianGPLVM
+from .gplvm import StochasticBayesianGPLVM
+from .gplvm import GaussianEncoder
 from .gplvm import PCA_reduce
 from .sgpmc import SGPMC
 from .sgpr import SGPRUpperMixin
@@ -28,3 +31,8 @@ from .sgpr import GPRFITC
 from .svgp import SVGP
 from .vgp import VGP
 from .vgp import VGP_opper_archambeau
+from .vgp import VGP_CVI
+from .laplace import GPLaplace
+from .vecchia import VecchiaGPR
+from .experts import DistributedGPR
+from .compact import CompactGPR
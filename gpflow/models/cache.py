@@ -0,0 +1,96 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import tensorflow as tf
+
+from .. import settings
+from ..core.errors import GPflowError
+
+
+class SummaryCache:
+    """
+    In-graph cache of tensors derived from the parameters and data of a model,
+    such as posterior summaries used for predictions.
+
+    Cached values are stored in TensorFlow variables together with the values
+    of the watched tensors they were computed from. They are recomputed and
+    stored only when the watched values change, e.g. after optimisation or
+    assignment, otherwise reading the cache costs a comparison of the watched
+    values. Cached values are not differentiated.
+
+    The variables are not GPflow parameters, so they are not part of the values
+    read, assigned or saved with the model. They are created on the first
+    `build_cached` call in a graph, and created again in a new graph.
+    """
+
+    def __init__(self, shapes, num_watched):
+        """
+        :param shapes: list of shapes of cached tensors
+        :param num_watched: total number of elements of watched tensors
+        """
+        self.shapes = [[int(d) for d in shape] for shape in shapes]
+        self.num_watched = int(num_watched)
+        self._variables = None
+        self._fingerprint = None
+        self._is_initialized = None
+
+    @property
+    def fingerprint(self):
+        """Variable with the watched values of the last refresh, None before building."""
+        return self._fingerprint
+
+    @property
+    def initializables(self):
+        """Cache variables with their initialization status, see `Node.initialize`."""
+        if self._fingerprint is None:
+            return []
+        return list(zip(self._variables + [self._fingerprint], self._is_initialized))
+
+    def build_cached(self, build_values, watched):
+        """
+        :param build_values: function building the list of cached tensors
+        :param watched: list of tensors the cached tensors depend on
+        :return: list of cached tensors
+        """
+        current = tf.concat([tf.reshape(tf.cast(w, settings.float_type), [-1]) for w in watched], 0)
+        if current.shape[0].value not in (None, self.num_watched):
+            raise GPflowError('Cache watches {} values, got {}.'
+                              .format(self.num_watched, current.shape[0].value))
+        if self._fingerprint is None or self._fingerprint.graph is not current.graph:
+            self._build_variables()
+        variables, stored = self._variables, self._fingerprint
+
+        def read():
+            return [tf.identity(v) for v in variables]
+
+        def refresh():
+            values = [tf.stop_gradient(v) for v in build_values()]
+            assigns = [tf.assign(var, v) for var, v in zip(variables, values)]
+            assigns.append(tf.assign(stored, current))
+            with tf.control_dependencies(assigns):
+                return [tf.identity(v) for v in values]
+
+        valid = tf.reduce_all(tf.equal(current, stored))
+        return tf.cond(valid, read, refresh)
+
+    def _build_variables(self):
+        with tf.name_scope('summary_cache'):
+            self._variables = [tf.Variable(np.zeros(shape, dtype=settings.float_type), trainable=False)
+                               for shape in self.shapes]
+            # NaN never compares equal, so that the first read computes the values.
+            self._fingerprint = tf.Variable(np.full(self.num_watched, np.nan, dtype=settings.float_type),
+                                            trainable=False)
+            self._is_initialized = [tf.is_variable_initialized(v)
+                                    for v in self._variables + [self._fingerprint]]
@@ -0,0 +1,245 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import tensorflow as tf
+from scipy.spatial import cKDTree
+
+from .. import likelihoods
+from .. import settings
+
+from ..params import DataHolder
+from ..decors import params_as_tensors
+from ..decors import name_scope
+
+from .model import GPModel
+
+
+class CompactGPR(GPModel):
+    r"""
+    Gaussian process regression with compactly supported kernels, such as
+    `kernels.Wendland`, where the Gram matrix is kept as a sparse tensor.
+
+    Pairs of data points closer than `radius` are found with a KD-tree at
+    construction time and the kernel is evaluated only for them, so the memory
+    grows with the number of neighbouring pairs rather than N². The kernel must
+    vanish beyond `radius`; for Wendland kernels it means that lengthscales must
+    not exceed it, e.g. with `transforms.Logistic(0, radius)`.
+
+    Linear systems with K + σ²I are solved by conjugate gradients with sparse
+    matrix products. The log determinant is estimated by stochastic Lanczos
+    quadrature,
+
+    ::
+
+      @inproceedings{ubaru2017fast,
+        title={Fast Estimation of tr(f(A)) via Stochastic Lanczos Quadrature},
+        author={Ubaru, Shashanka and Chen, Jie and Saad, Yousef},
+        journal={SIAM Journal on Matrix Analysis and Applications},
+        year={2017}
+      }
+
+    and its gradient by Hutchinson's estimator of tr((K + σ²I)⁻¹ dK), using the
+    same Rademacher probes. The data fit term and predictions are exact up to
+    the tolerance of conjugate gradients, the marginal likelihood and its
+    gradients are unbiased stochastic estimates, so it is best optimised with
+    stochastic optimizers such as `train.AdamOptimizer`.
+
+    With fresh probes at every evaluation the objective is noisy, and
+    `train.ScipyOptimizer` fails or stalls in its line search. For deterministic
+    optimizers pass `probe_seed`: the probes are then drawn once and reused, so
+    the objective is a smooth, though biased, approximation of the marginal
+    likelihood.
+    """
+    def __init__(self, X, Y, kern, radius, mean_function=None,
+                 num_probes=10, num_lanczos=30, cg_max_iter=1000, cg_tolerance=1e-6,
+                 probe_seed=None, **kwargs):
+        """
+        X is a data matrix, size N x D
+        Y is a data matrix, size N x R
+        kern, mean_function are appropriate GPflow objects
+        radius is the distance beyond which the kernel vanishes
+        num_probes is the number of random probe vectors of stochastic estimators
+        num_lanczos is the number of Lanczos iterations per probe
+        cg_max_iter, cg_tolerance control conjugate gradient solves, the
+            tolerance is relative to the norm of the right-hand side
+        probe_seed, if not None, fixes the probes of stochastic estimators,
+            they are drawn at every evaluation otherwise
+        """
+        if radius <= 0:
+            raise ValueError('The radius parameter must be greater zero.')
+        if num_probes <= 0 or num_lanczos <= 0:
+            raise ValueError('The num_probes and num_lanczos parameters must be greater zero.')
+        X = np.asarray(X)
+        pairs = cKDTree(X).query_pairs(radius, output_type='ndarray')
+        diagonal = np.tile(np.arange(X.shape[0])[:, None], [1, 2])
+        indices = np.concatenate([diagonal, pairs, pairs[:, ::-1]], 0)
+        indices = indices[np.lexsort((indices[:, 1], indices[:, 0]))]
+
+        likelihood = likelihoods.Gaussian()
+        X = DataHolder(X)
+        Y = DataHolder(Y)
+        GPModel.__init__(self, X, Y, kern, likelihood, mean_function, **kwargs)
+        self.num_data = X.shape[0]
+        self.radius = radius
+        self.num_probes = num_probes
+        self.num_lanczos = num_lanczos
+        self.cg_max_iter = cg_max_iter
+        self.cg_tolerance = cg_tolerance
+        self.indices = DataHolder(indices)
+        self.probe_seed = probe_seed
+        if probe_seed is not None:
+            rng = np.random.RandomState(probe_seed)
+            self.probes = DataHolder(rng.choice([-1., 1.], size=(self.num_data, num_probes)))
+
+    @property
+    def nnz(self):
+        """Number of stored entries of the sparse Gram matrix."""
+        return self.indices.shape[0]
+
+    @name_scope('likelihood')
+    @params_as_tensors
+    def _build_likelihood(self):
+        r"""
+        Construct a tensorflow function to compute the stochastic estimate of
+
+            \log p(Y | theta).
+
+        """
+        matmul = self._build_matmul()
+        err = self.Y - self.mean_function(self.X)
+        alpha = tf.stop_gradient(self._build_solve(matmul, err))
+        # The value equals -½ errᵀ α at the solution, the gradient is exact.
+        fit = -tf.reduce_sum(err * alpha) + 0.5 * tf.reduce_sum(alpha * matmul(alpha))
+
+        if self.probe_seed is None:
+            probes = tf.sign(tf.random_uniform([self.num_data, self.num_probes], -1., 1.,
+                                               dtype=settings.float_type))
+        else:
+            probes = self.probes
+        logdet = tf.stop_gradient(self._build_logdet(matmul, probes))
+        u = tf.stop_gradient(self._build_solve(matmul, probes))
+        trace = tf.reduce_sum(u * matmul(probes)) / self.num_probes
+        logdet += trace - tf.stop_gradient(trace)
+
+        num_latent = tf.cast(tf.shape(self.Y)[1], settings.float_type)
+        num_data = tf.cast(self.num_data, settings.float_type)
+        return fit - 0.5 * num_latent * (logdet + num_data * np.log(2 * np.pi))
+
+    @name_scope('predict')
+    @params_as_tensors
+    def _build_predict(self, Xnew, full_cov=False):
+        """
+        Xnew is a data matrix, the points at which we want to predict.
+
+        This method computes
+
+            p(F* | Y)
+
+        where F* are points on the GP at Xnew, Y are noisy observations at X.
+        Cross-covariances of Xnew and X are dense, predict large test sets in chunks.
+        """
+        matmul = self._build_matmul()
+        err = self.Y - self.mean_function(self.X)
+        alpha = self._build_solve(matmul, err)
+        Kx = self.kern.K(self.X, Xnew)
+        A = self._build_solve(matmul, Kx)
+        f_mean = tf.matmul(Kx, alpha, transpose_a=True) + self.mean_function(Xnew)
+        if full_cov:
+            f_var = self.kern.K(Xnew) - tf.matmul(Kx, A, transpose_a=True)
+            shape = tf.stack([1, 1, tf.shape(self.Y)[1]])
+            f_var = tf.tile(tf.expand_dims(f_var, 2), shape)
+        else:
+            f_var = self.kern.Kdiag(Xnew) - tf.reduce_sum(Kx * A, 0)
+            f_var = tf.tile(tf.reshape(f_var, (-1, 1)), [1, tf.shape(self.Y)[1]])
+        return f_mean, f_var
+
+    @params_as_tensors
+    def _build_matmul(self):
+        """
+        Returns function computing (K + σ²I) V for dense N x P matrices V, where
+        K is the sparse Gram matrix.
+        """
+        X1 = tf.expand_dims(tf.gather(self.X, self.indices[:, 0]), 1)
+        X2 = tf.expand_dims(tf.gather(self.X, self.indices[:, 1]), 1)
+        values = tf.reshape(self.kern.K(X1, X2), [-1])
+        indices = tf.cast(self.indices, tf.int64)
+        K = tf.SparseTensor(indices, values, [self.num_data, self.num_data])
+        variance = self.likelihood.variance
+
+        def matmul(V):
+            return tf.sparse_tensor_dense_matmul(K, V) + variance * V
+
+        return matmul
+
+    @name_scope('conjugate_gradients')
+    def _build_solve(self, matmul, B):
+        """
+        Solves (K + σ²I) X = B column-wise by conjugate gradients. The solution is
+        not differentiated.
+        """
+        B = tf.stop_gradient(B)
+        tiny = tf.constant(np.finfo(settings.float_type).tiny, dtype=settings.float_type)
+        tolerance = self.cg_tolerance ** 2 * tf.reduce_sum(tf.square(B), 0)
+
+        def cond(i, _X, _R, _P, rs):
+            return tf.logical_and(i < self.cg_max_iter, tf.reduce_any(rs > tolerance))
+
+        def body(i, X, R, P, rs):
+            AP = matmul(P)
+            step = rs / tf.maximum(tf.reduce_sum(P * AP, 0), tiny)
+            X = X + step * P
+            R = R - step * AP
+            rs_new = tf.reduce_sum(tf.square(R), 0)
+            P = R + rs_new / tf.maximum(rs, tiny) * P
+            return i + 1, X, R, P, rs_new
+
+        loop_vars = [0, tf.zeros_like(B), B, B, tf.reduce_sum(tf.square(B), 0)]
+        _i, X, _R, _P, _rs = tf.while_loop(cond, body, loop_vars, back_prop=False)
+        return X
+
+    @name_scope('lanczos_logdet')
+    def _build_logdet(self, matmul, probes):
+        """
+        Stochastic Lanczos quadrature estimate of log|K + σ²I| with Rademacher probes.
+        """
+        tiny = tf.constant(np.finfo(settings.float_type).tiny, dtype=settings.float_type)
+        num_steps = min(self.num_lanczos, self.num_data)
+        norms = tf.sqrt(tf.reduce_sum(tf.square(probes), 0))
+
+        def cond(i, *_args):
+            return i < num_steps
+
+        def body(i, alphas, betas, q_prev, q, beta_prev):
+            v = matmul(q) - beta_prev * q_prev
+            alpha = tf.reduce_sum(q * v, 0)
+            v = v - alpha * q
+            beta = tf.sqrt(tf.reduce_sum(tf.square(v), 0))
+            q_next = v / tf.maximum(beta, tiny)
+            return i + 1, alphas.write(i, alpha), betas.write(i, beta), q, q_next, beta
+
+        loop_vars = [0,
+                     tf.TensorArray(settings.float_type, size=num_steps),
+                     tf.TensorArray(settings.float_type, size=num_steps),
+                     tf.zeros_like(probes), probes / norms, tf.zeros_like(norms)]
+        result = tf.while_loop(cond, body, loop_vars, back_prop=False)
+        alphas = tf.transpose(result[1].stack())  # P x m
+        betas = tf.transpose(result[2].stack())[:, :-1]  # P x (m - 1)
+
+        off_diagonal = tf.pad(tf.matrix_diag(betas), [[0, 0], [1, 0], [0, 1]])
+        T = tf.matrix_diag(alphas) + off_diagonal + tf.matrix_transpose(off_diagonal)
+        eigenvalues, eigenvectors = tf.self_adjoint_eig(T)
+        weights = tf.square(eigenvectors[:, 0, :])
+        quadrature = tf.reduce_sum(weights * tf.log(tf.maximum(eigenvalues, tiny)), 1)
+        return tf.reduce_mean(tf.square(norms) * quadrature)
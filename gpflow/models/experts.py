@@ -0,0 +1,202 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import tensorflow as tf
+
+from .. import likelihoods
+from .. import settings
+
+from ..params import DataHolder
+from ..decors import params_as_tensors
+from ..decors import name_scope
+
+from .model import GPModel
+
+
+class DistributedGPR(GPModel):
+    r"""
+    Distributed Gaussian process regression with product-of-experts predictions,
+
+    ::
+
+      @inproceedings{deisenroth2015distributed,
+        title={Distributed Gaussian Processes},
+        author={Deisenroth, Marc Peter and Ng, Jun Wei},
+        booktitle={Proceedings of ICML},
+        year={2015}
+      }
+
+    Data are partitioned into K shards and every shard is modelled by a GPR
+    expert. All experts share the kernel, mean function and likelihood. The
+    objective is the sum of the experts' marginal likelihoods,
+
+    .. math::
+
+       \log p(\mathbf y) \approx \sum_k \log \mathcal N(\mathbf y_k | \mathbf m_k, \mathbf K_k + \sigma_n \mathbf I),
+
+    which costs O(N (N/K)²). Experts are evaluated in a single batched graph,
+    so that their Cholesky factorisations run in parallel over all cores and
+    gradients are aggregated for a shared optimizer step. Shards of unequal
+    sizes are padded with masked points.
+
+    Predictive marginals of the experts are combined by one of
+
+    - 'poe': product of experts,
+    - 'gpoe': generalised product of experts with weights 1/K,
+    - 'bcm': Bayesian committee machine,
+    - 'rbcm': robust Bayesian committee machine with differential entropy weights.
+    """
+    combinations = ('poe', 'gpoe', 'bcm', 'rbcm')
+
+    def __init__(self, X, Y, kern, num_experts, mean_function=None,
+                 combination='rbcm', partition='random', **kwargs):
+        """
+        X is a data matrix, size N x D
+        Y is a data matrix, size N x R
+        kern, mean_function are appropriate GPflow objects
+        num_experts is the number of shards K
+        combination is the rule for combining predictions, one of `combinations`
+        partition is 'random', 'sequential' (contiguous blocks of rows) or
+            an array of N expert indices in [0, K)
+        """
+        if combination not in self.combinations:
+            raise ValueError('Unknown combination "{}".'.format(combination))
+        X, Y = np.asarray(X), np.asarray(Y)
+        labels = _partition(X.shape[0], num_experts, partition)
+        X_shards, mask = _shards(X, labels, num_experts)
+        Y_shards, _ = _shards(Y, labels, num_experts)
+
+        likelihood = likelihoods.Gaussian()
+        X = DataHolder(X_shards)
+        Y = DataHolder(Y_shards)
+        GPModel.__init__(self, X, Y, kern, likelihood, mean_function,
+                         num_latent=Y_shards.shape[2], **kwargs)
+        self.num_experts = num_experts
+        self.combination = combination
+        self.partition = labels
+        self.mask = DataHolder(mask)
+
+    @name_scope('likelihood')
+    @params_as_tensors
+    def _build_likelihood(self):
+        r"""
+        Construct a tensorflow function to compute the sum of experts' marginal
+        likelihoods
+
+            \sum_k \log p(Y_k | theta).
+
+        """
+        L = tf.cholesky(self._build_expert_covariance())
+        err = (self.Y - self._build_expert_mean(self.X)) * tf.expand_dims(self.mask, 2)
+        alpha = tf.matrix_triangular_solve(L, err)
+        num_points = tf.reduce_sum(self.mask) * tf.cast(tf.shape(self.Y)[2], settings.float_type)
+        logpdf = -0.5 * tf.reduce_sum(tf.square(alpha))
+        logpdf -= 0.5 * num_points * np.log(2 * np.pi)
+        logpdf -= tf.cast(tf.shape(self.Y)[2], settings.float_type) * \
+            tf.reduce_sum(tf.log(tf.matrix_diag_part(L)))
+        return logpdf
+
+    @name_scope('predict')
+    @params_as_tensors
+    def _build_predict(self, Xnew, full_cov=False):
+        """
+        Xnew is a data matrix, the points at which we want to predict.
+
+        This method computes marginals of p(F* | Y) combined from the experts'
+        predictions by the rule given by `combination`. Joint predictive
+        covariances are not available.
+        """
+        if full_cov:
+            raise NotImplementedError('DistributedGPR predicts marginal variances only.')
+        means, variances = self._build_expert_predictions(Xnew)  # K x M x R, K x M
+        prior_var = self.kern.Kdiag(Xnew)  # M
+        num_experts = tf.cast(self.num_experts, settings.float_type)
+
+        if self.combination in ('poe', 'bcm'):
+            beta = tf.ones_like(variances)
+        elif self.combination == 'gpoe':
+            beta = tf.ones_like(variances) / num_experts
+        else:
+            beta = 0.5 * (tf.log(prior_var) - tf.log(variances))
+
+        precision = tf.reduce_sum(beta / variances, 0)
+        if self.combination in ('bcm', 'rbcm'):
+            precision += (1. - tf.reduce_sum(beta, 0)) / prior_var
+        var = 1. / precision
+        mean = tf.expand_dims(var, 1) * tf.reduce_sum(tf.expand_dims(beta / variances, 2) * means, 0)
+        var = tf.tile(tf.expand_dims(var, 1), [1, tf.shape(self.Y)[2]])
+        return mean, var
+
+    @params_as_tensors
+    def _build_expert_predictions(self, Xnew):
+        """
+        Predictive means K x M x R and variances K x M of all experts at Xnew.
+        """
+        L = tf.cholesky(self._build_expert_covariance())
+        Xnew_tiled = tf.tile(tf.expand_dims(Xnew, 0), [self.num_experts, 1, 1])
+        Kmn = self.kern.K(self.X, Xnew_tiled) * tf.expand_dims(self.mask, 2)
+        A = tf.matrix_triangular_solve(L, Kmn)
+        err = (self.Y - self._build_expert_mean(self.X)) * tf.expand_dims(self.mask, 2)
+        alpha = tf.matrix_triangular_solve(L, err)
+        means = tf.matmul(A, alpha, transpose_a=True) + self.mean_function(Xnew)
+        variances = self.kern.Kdiag(Xnew) - tf.reduce_sum(tf.square(A), 1)
+        return means, variances
+
+    @params_as_tensors
+    def _build_expert_covariance(self):
+        """
+        K x n x n covariances of the experts' observations, where padded points
+        are independent with unit variance.
+        """
+        mask = self.mask
+        K = self.kern.K(self.X) * tf.expand_dims(mask, 2) * tf.expand_dims(mask, 1)
+        return K + tf.matrix_diag(mask * self.likelihood.variance + (1. - mask))
+
+    @params_as_tensors
+    def _build_expert_mean(self, X):
+        mean = self.mean_function(tf.reshape(X, [-1, tf.shape(X)[2]]))
+        return tf.reshape(mean, tf.concat([tf.shape(X)[:2], [-1]], 0))
+
+
+def _partition(num_data, num_experts, partition):
+    if num_experts <= 0 or num_experts > num_data:
+        raise ValueError('The num_experts parameter must be in [1, N] interval.')
+    if isinstance(partition, str):
+        if partition == 'random':
+            return np.random.permutation(num_data) % num_experts
+        if partition == 'sequential':
+            return np.arange(num_data) * num_experts // num_data
+        raise ValueError('Unknown partition "{}".'.format(partition))
+    labels = np.asarray(partition, dtype=int)
+    if labels.shape != (num_data,) or labels.min() < 0 or labels.max() >= num_experts:
+        raise ValueError('The partition must be an array of N expert indices.')
+    return labels
+
+
+def _shards(A, labels, num_experts):
+    """
+    Splits rows of A into K x n x ... array of shards padded with zeros, and
+    K x n mask of valid rows.
+    """
+    counts = np.bincount(labels, minlength=num_experts)
+    if np.any(counts == 0):
+        raise ValueError('Every expert must be assigned at least one data point.')
+    shards = np.zeros((num_experts, counts.max()) + A.shape[1:], dtype=A.dtype)
+    mask = np.zeros((num_experts, counts.max()), dtype=settings.float_type)
+    for k in range(num_experts):
+        rows = A[labels == k]
+        shards[k, :len(rows)] = rows
+        mask[k, :len(rows)] = 1.
+    return shards, mask
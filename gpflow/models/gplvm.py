@@ -20,15 +20,20 @@ from .. import likelihoods
 from .. import transforms
 from .. import kernels
 from .. import features
+from .. import kullback_leiblers
 
-from ..params import Parameter
-from ..decors import params_as_tensors
+from ..core.errors import GPflowError
+from ..params import Parameter, Parameterized, ParamList
+from ..params import DataHolder, Minibatch
+from ..decors import params_as_tensors, params_as_tensors_for, autoflow
+from ..conditionals import conditional
 from ..mean_functions import Zero
 from ..expectations import expectation
 from ..probability_distributions import DiagonalGaussian
 
 from .model import GPModel
 from .gpr import GPR
+from .cache import SummaryCache
 
 
 class GPLVM(GPR):
@@ -64,7 +69,8 @@ class GPLVM(GPR):
 
 
 class BayesianGPLVM(GPModel):
-    def __init__(self, X_mean, X_var, Y, kern, M, Z=None, X_prior_mean=None, X_prior_var=None):
+    def __init__(self, X_mean, X_var, Y, kern, M, Z=None, X_prior_mean=None, X_prior_var=None,
+                 cache_predictions=False):
         """
         Initialise Bayesian GPLVM object. This method only works with a Gaussian likelihood.
         :param X_mean: initial latent positions, size N (number of points) x Q (latent dimensions).
@@ -76,6 +82,9 @@ class BayesianGPLVM(GPModel):
         random permutation of X_mean.
         :param X_prior_mean: prior mean used in KL term of bound. By default 0. Same size as X_mean.
         :param X_prior_var: pripor variance used in KL term of bound. By default 1.
+        :param cache_predictions: boolean whether to keep posterior summaries of the training
+        latent points for predictions in a `SummaryCache`, recomputed only when parameters change.
+        Cached predictions are not differentiable w.r.t. parameters.
         """
         GPModel.__init__(self, X_mean, Y, kern,
                          likelihood=likelihoods.Gaussian(),
@@ -119,6 +128,36 @@ class BayesianGPLVM(GPModel):
         assert self.X_prior_var.shape[0] == self.num_data
         assert self.X_prior_var.shape[1] == self.num_latent
 
+        self.prediction_cache = None
+        if cache_predictions:
+            self.prediction_cache = self._make_prediction_cache()
+
+    def compile(self, session=None):
+        """
+        Before calling the standard compile function, check whether the
+        parameters have been replaced and reset the prediction cache appropriately.
+        """
+        if self.prediction_cache is not None and \
+                self.prediction_cache.num_watched != self._num_watched():
+            self.prediction_cache = self._make_prediction_cache()
+        return super(BayesianGPLVM, self).compile(session=session)
+
+    @property
+    def initializables(self):
+        inits = super(BayesianGPLVM, self).initializables
+        if self.prediction_cache is not None:
+            inits += self.prediction_cache.initializables
+        return inits
+
+    def _make_prediction_cache(self):
+        num_inducing = len(self.feature)
+        shapes = [(num_inducing, num_inducing), (num_inducing, num_inducing), (num_inducing, self.output_dim)]
+        return SummaryCache(shapes, self._num_watched())
+
+    def _num_watched(self):
+        return sum(int(np.prod(p.shape)) for p in self.parameters) + \
+            int(np.prod(self.Y.shape))
+
     @params_as_tensors
     def _build_likelihood(self):
         """
@@ -130,7 +169,7 @@ class BayesianGPLVM(GPModel):
         num_inducing = len(self.feature)
         psi0 = tf.reduce_sum(expectation(pX, self.kern))
         psi1 = expectation(pX, (self.kern, self.feature))
-        psi2 = tf.reduce_sum(expectation(pX, (self.kern, self.feature), (self.kern, self.feature)), axis=0)
+        psi2 = expectation(pX, (self.kern, self.feature), (self.kern, self.feature), reduce_n=True)
         Kuu = features.Kuu(self.feature, self.kern, jitter=settings.jitter)
         L = tf.cholesky(Kuu)
         sigma2 = self.likelihood.variance
@@ -166,20 +205,18 @@ class BayesianGPLVM(GPModel):
         return bound
 
     @params_as_tensors
-    def _build_predict(self, Xnew, full_cov=False):
+    def _build_posterior_summary(self):
         """
-        Compute the mean and variance of the latent function at some new points.
-        Note that this is very similar to the SGPR prediction, for which
-        there are notes in the SGPR notebook.
-        :param Xnew: Point to predict at.
+        Summaries of the posterior of inducing outputs, which depend on the
+        training latent points only: Cholesky factors L of Kuu and LB of
+        B = I + L⁻¹ Ψ₂ L⁻ᵀ / σ², and c = LB⁻¹ L⁻¹ Ψ₁ᵀ Y / σ².
         """
         pX = DiagonalGaussian(self.X_mean, self.X_var)
 
         num_inducing = len(self.feature)
         psi1 = expectation(pX, (self.kern, self.feature))
-        psi2 = tf.reduce_sum(expectation(pX, (self.kern, self.feature), (self.kern, self.feature)), axis=0)
+        psi2 = expectation(pX, (self.kern, self.feature), (self.kern, self.feature), reduce_n=True)
         Kuu = features.Kuu(self.feature, self.kern, jitter=settings.numerics.jitter_level)
-        Kus = features.Kuf(self.feature, self.kern, Xnew)
         sigma2 = self.likelihood.variance
         sigma = tf.sqrt(sigma2)
         L = tf.cholesky(Kuu)
@@ -190,6 +227,28 @@ class BayesianGPLVM(GPModel):
         B = AAT + tf.eye(num_inducing, dtype=settings.float_type)
         LB = tf.cholesky(B)
         c = tf.matrix_triangular_solve(LB, tf.matmul(A, self.Y), lower=True) / sigma
+        return L, LB, c
+
+    @params_as_tensors
+    def _build_predict(self, Xnew, full_cov=False):
+        """
+        Compute the mean and variance of the latent function at some new points.
+        Note that this is very similar to the SGPR prediction, for which
+        there are notes in the SGPR notebook. With the prediction cache the
+        posterior summaries are recomputed only after parameters change, so the
+        cost is O(N* M²) for N* new points, but predictions are not differentiable
+        w.r.t. parameters.
+        :param Xnew: Point to predict at.
+        """
+        if self.prediction_cache is None:
+            L, LB, c = self._build_posterior_summary()
+        else:
+            with params_as_tensors_for(self, convert=False):
+                watched = [p.unconstrained_tensor for p in self.parameters]
+            watched.append(self.Y)
+            L, LB, c = self.prediction_cache.build_cached(self._build_posterior_summary, watched)
+
+        Kus = features.Kuf(self.feature, self.kern, Xnew)
         tmp1 = tf.matrix_triangular_solve(L, Kus, lower=True)
         tmp2 = tf.matrix_triangular_solve(LB, tmp1, lower=True)
         mean = tf.matmul(tmp2, c, transpose_a=True)
@@ -206,6 +265,201 @@ class BayesianGPLVM(GPModel):
         return mean + self.mean_function(Xnew), var
 
 
+class StochasticBayesianGPLVM(GPModel):
+    r"""
+    Bayesian GPLVM with an uncollapsed variational distribution of inducing
+    outputs q(u) = N(q_mu, q_sqrt q_sqrtᵀ), so that the bound decomposes over
+    data points and is estimated from minibatches of rows,
+
+    ::
+
+      @inproceedings{hensman2013gaussian,
+        title={Gaussian Processes for Big Data},
+        author={Hensman, James and Fusi, Nicolo and Lawrence, Neil D},
+        booktitle={Proceedings of UAI},
+        year={2013}
+      }
+
+    The expected log likelihood of a batch is computed in closed form from the
+    Psi statistics, where Psi2 is summed over the batch without the n x M x M
+    tensor, so the cost of a step is O(n M² Q + M³ D) for batches of n rows.
+
+    The distributions of latent points q(x_n) = N(X_mean[n], diag(X_var[n]))
+    are either free parameters, of which only the rows of the current batch
+    are read, or given by an amortised `encoder` of observations, such as
+    `GaussianEncoder`, which has a fixed number of parameters and infers latent
+    points of new observations. The prior of latent points is N(0, I).
+    """
+
+    def __init__(self, Y, kern, Z, X_mean=None, X_var=None, encoder=None,
+                 minibatch_size=None, whiten=True, **kwargs):
+        """
+        Initialise stochastic Bayesian GPLVM object. This method only works with a Gaussian likelihood.
+        :param Y: data matrix, size N (number of points) x D (dimensions)
+        :param kern: kernel specification of Q latent dimensions
+        :param Z: matrix of inducing points, size M (inducing points) x Q (latent dimensions)
+        :param X_mean: initial latent positions, size N x Q. By default PCA projection of Y.
+        Not used with an encoder.
+        :param X_var: initial variance of latent positions, size N x Q. By default 0.1.
+        Not used with an encoder.
+        :param encoder: callable Parameterized object mapping a batch of observations to
+        means and variances of latent points, by default latent points are free parameters.
+        :param minibatch_size: if not None, turns on mini-batching of rows with that size.
+        :param whiten: boolean whether to use the whitened representation of q(u).
+        """
+        Z = np.asarray(Z)
+        num_data, latent_dim = Y.shape[0], Z.shape[1]
+        if encoder is not None and (X_mean is not None or X_var is not None):
+            raise ValueError('Latent positions cannot be initialised when an encoder is used.')
+        if encoder is None:
+            X_mean = PCA_reduce(Y, latent_dim) if X_mean is None else X_mean
+            X_var = 0.1 * np.ones((num_data, latent_dim)) if X_var is None else X_var
+            assert X_mean.shape == (num_data, latent_dim)
+            assert X_var.shape == (num_data, latent_dim)
+        if minibatch_size is None:
+            Y = DataHolder(Y)
+            index = DataHolder(np.arange(num_data))
+        else:
+            Y = Minibatch(Y, batch_size=minibatch_size, seed=0)
+            index = Minibatch(np.arange(num_data), batch_size=minibatch_size, seed=0)
+
+        GPModel.__init__(self, None, Y, kern,
+                         likelihood=likelihoods.Gaussian(),
+                         mean_function=Zero(), **kwargs)
+        self.num_data = num_data
+        self.latent_dim = latent_dim
+        self.whiten = whiten
+        self.index = index
+        self.feature = features.InducingPoints(Z)
+
+        num_inducing = len(self.feature)
+        num_output = self.num_latent
+        self.q_mu = Parameter(np.zeros((num_inducing, num_output), dtype=settings.float_type))  # M x D
+        q_sqrt = np.tile(np.eye(num_inducing, dtype=settings.float_type)[None, :, :], [num_output, 1, 1])
+        self.q_sqrt = Parameter(q_sqrt, transform=transforms.LowerTriangular(num_inducing, num_output))  # D x M x M
+
+        self.encoder = encoder
+        if encoder is None:
+            self.X_mean = Parameter(X_mean)
+            self.X_var = Parameter(X_var, transform=transforms.positive)
+
+    @params_as_tensors
+    def _build_latent(self):
+        """
+        Means and variances of latent points of the current batch of rows, n x Q.
+        """
+        if self.encoder is not None:
+            return self.encoder(self.Y)
+        # Rows are gathered before the transform, so that the cost does not depend on N.
+        index = self.index
+        with params_as_tensors_for(self, convert=False):
+            params = self.X_mean, self.X_var
+        return tuple(p.transform.forward_tensor(tf.gather(p.unconstrained_tensor, index)) for p in params)
+
+    @params_as_tensors
+    def _build_likelihood(self):
+        """
+        Construct a tensorflow function to compute the stochastic estimate of
+        the bound on the marginal likelihood.
+        """
+        X_mean, X_var = self._build_latent()
+        pX = DiagonalGaussian(X_mean, X_var)
+
+        psi0 = tf.reduce_sum(expectation(pX, self.kern))
+        psi1 = expectation(pX, (self.kern, self.feature))  # n x M
+        psi2 = expectation(pX, (self.kern, self.feature), (self.kern, self.feature), reduce_n=True)  # M x M
+        Kuu = features.Kuu(self.feature, self.kern, jitter=settings.jitter)
+        L = tf.cholesky(Kuu)
+        sigma2 = self.likelihood.variance
+
+        # moments of u mapped by Kuu⁻¹, so that E[f_n] = ψ1_n Kuu⁻¹ E[u]
+        q_mu = self.q_mu
+        q_sqrt = tf.matrix_band_part(self.q_sqrt, -1, 0)
+        L_tiled = tf.tile(tf.expand_dims(L, 0), [tf.shape(q_sqrt)[0], 1, 1])
+        if not self.whiten:
+            q_mu = tf.matrix_triangular_solve(L, q_mu, lower=True)
+            q_sqrt = tf.matrix_triangular_solve(L_tiled, q_sqrt, lower=True)
+        Lit_q_mu = tf.matrix_triangular_solve(L, q_mu, adjoint=True)  # M x D
+        Lit_q_sqrt = tf.matrix_triangular_solve(L_tiled, q_sqrt, adjoint=True)  # D x M x M
+        second_moment = tf.matmul(Lit_q_mu, Lit_q_mu, transpose_b=True) + \
+            tf.reduce_sum(tf.matmul(Lit_q_sqrt, Lit_q_sqrt, transpose_b=True), 0)  # M x M
+
+        tmp = tf.matrix_triangular_solve(L, psi2, lower=True)
+        Li_psi2_Lit = tf.matrix_triangular_solve(L, tf.transpose(tmp), lower=True)
+
+        # expected squared error Σₙ E||yₙ - fₙ||², summed over the batch
+        D = tf.cast(tf.shape(self.Y)[1], settings.float_type)
+        fmean = tf.matmul(psi1, Lit_q_mu)  # n x D
+        square_error = tf.reduce_sum(tf.square(self.Y)) - 2. * tf.reduce_sum(self.Y * fmean) + \
+            D * (psi0 - tf.trace(Li_psi2_Lit)) + tf.reduce_sum(psi2 * second_moment)
+
+        # KL[q(x) || p(x)] of the batch
+        KL_X = 0.5 * tf.reduce_sum(tf.square(X_mean) + X_var - 1. - tf.log(X_var))
+
+        nD = tf.cast(tf.size(self.Y), settings.float_type)
+        batch_bound = -0.5 * nD * tf.log(2 * np.pi * sigma2) - 0.5 * square_error / sigma2 - KL_X
+
+        K = None if self.whiten else Kuu
+        KL_U = kullback_leiblers.gauss_kl(self.q_mu, self.q_sqrt, K)
+        scale = tf.cast(self.num_data, settings.float_type) / tf.cast(tf.shape(self.Y)[0], settings.float_type)
+        return scale * batch_bound - KL_U
+
+    @params_as_tensors
+    def _build_predict(self, Xnew, full_cov=False):
+        """
+        Compute the mean and variance of the latent function at some new points.
+        :param Xnew: Point to predict at.
+        """
+        mu, var = conditional(Xnew, self.feature, self.kern, self.q_mu, q_sqrt=self.q_sqrt,
+                              full_cov=full_cov, white=self.whiten)
+        return mu + self.mean_function(Xnew), var
+
+    @autoflow((settings.float_type, [None, None]))
+    def predict_x(self, Ynew):
+        """
+        Compute the means and variances of latent points of new observations
+        Ynew given by the encoder.
+        """
+        if self.encoder is None:
+            raise GPflowError('Latent points of new observations require an encoder.')
+        return self.encoder(Ynew)
+
+
+class GaussianEncoder(Parameterized):
+    """
+    Amortised distribution of latent points of a GPLVM,
+    q(x_n) = N(mean(y_n), diag(var(y_n))), given by a multilayer perceptron
+    with tanh hidden layers.
+    """
+
+    def __init__(self, input_dim, latent_dim, hidden_sizes=(), name=None):
+        """
+        :param input_dim: dimension of observations D
+        :param latent_dim: dimension of latent points Q
+        :param hidden_sizes: sizes of hidden layers, by default the encoder is linear
+        """
+        super().__init__(name=name)
+        self.latent_dim = latent_dim
+        sizes = [input_dim] + list(hidden_sizes) + [2 * latent_dim]
+        self.weights = ParamList([Parameter(np.random.randn(n_in, n_out) / np.sqrt(n_in))
+                                  for n_in, n_out in zip(sizes[:-1], sizes[1:])])
+        self.biases = ParamList([Parameter(np.zeros(n_out)) for n_out in sizes[1:]])
+
+    def __call__(self, Y):
+        """
+        :param Y: observations, size N x D
+        :return: means and variances of latent points, both N x Q
+        """
+        with params_as_tensors_for(self.weights, self.biases):
+            H = Y
+            for layer in range(len(self.weights)):
+                if layer > 0:
+                    H = tf.tanh(H)
+                H = tf.matmul(H, self.weights[layer]) + self.biases[layer]
+        mean, var = H[:, :self.latent_dim], H[:, self.latent_dim:]
+        return mean, transforms.positive.forward_tensor(var)
+
+
 def PCA_reduce(X, Q):
     """
     A helpful function for linearly reducing the dimensionality of the data X
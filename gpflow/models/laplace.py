@@ -0,0 +1,205 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import tensorflow as tf
+
+from .. import settings
+from ..decors import name_scope, params_as_tensors, params_as_tensors_for
+from ..params import Parameter, DataHolder
+from .model import GPModel
+
+
+class GPLaplace(GPModel):
+    r"""
+    Gaussian process with non-Gaussian likelihood and the Laplace approximation
+    of the posterior, following algorithms 3.1 and 3.2 of
+
+    ::
+
+      @book{rasmussen2006gaussian,
+        title={Gaussian Processes for Machine Learning},
+        author={Rasmussen, Carl Edward and Williams, Christopher K. I.},
+        year={2006},
+        publisher={MIT Press}
+      }
+
+    The posterior mode of the latent function values is found by Newton
+    iterations inside a `tf.while_loop`, using gradients and Hessians of
+    `likelihood.logp`. The likelihood must factorise over data points and
+    latent functions, so that the Hessian is diagonal. Negative curvatures
+    of likelihoods which are not log-concave are clipped at zero.
+
+    The mode found at the last evaluation is kept in the non-trainable `F_mode`
+    parameter and Newton iterations start from it, so that after a small change
+    of hyperparameters only a few iterations are needed. The approximate marginal
+    likelihood
+
+        \log q(Y | theta) = -\frac{1}{2} a^T (f - m) + \log p(Y | f) - \log |B| / 2
+
+    is evaluated after one extra Newton step outside of the loop. At the mode the
+    step leaves values unchanged, and its derivatives are those of the mode w.r.t.
+    hyperparameters. B is then evaluated at the stepped values, so that gradients
+    of log |B| include the dependence of W on the mode, the implicit term of
+    algorithm 5.1 of Rasmussen and Williams. Gradients are therefore exact for
+    log-concave likelihoods, up to the convergence of Newton iterations. Where W
+    is clipped, its dependence on the mode is lost and gradients are approximate.
+    """
+
+    def __init__(self, X, Y, kern, likelihood,
+                 mean_function=None,
+                 num_latent=None,
+                 newton_iterations=20,
+                 newton_tolerance=1e-6,
+                 **kwargs):
+        """
+        X is a data matrix, size N x D
+        Y is a data matrix, size N x R
+        kern, likelihood, mean_function are appropriate GPflow objects
+        newton_iterations is the maximum number of Newton iterations per evaluation
+        newton_tolerance is the tolerance of the maximal change of the mode
+        """
+        X = DataHolder(X)
+        Y = DataHolder(Y)
+        GPModel.__init__(self, X, Y, kern, likelihood, mean_function, num_latent, **kwargs)
+        self.num_data = X.shape[0]
+        self.newton_iterations = newton_iterations
+        self.newton_tolerance = newton_tolerance
+        self.F_mode = Parameter(np.zeros((self.num_data, self.num_latent)), trainable=False)
+
+    def compile(self, session=None):
+        """
+        Before calling the standard compile function, check to see if the size
+        of the data has changed and reset the mode appropriately.
+        """
+        if not self.num_data == self.X.shape[0]:
+            self.num_data = self.X.shape[0]
+            self.F_mode = Parameter(np.zeros((self.num_data, self.num_latent)), trainable=False)
+        return super(GPLaplace, self).compile(session=session)
+
+    def anchor(self, session):
+        super(GPLaplace, self).anchor(session)
+        self.F_mode.assign(self.F_mode.read_value(session=session), session=session)
+
+    @params_as_tensors
+    def _build_likelihood(self):
+        K, mean = self._build_prior_moments()
+        F_tilde, _a, _LB, _sW = self._build_mode(K, mean)
+        # One differentiable step, which carries the sensitivity of the mode to
+        # hyperparameters. At the mode it leaves the values unchanged.
+        F_tilde, a, _LB, _sW = self._build_newton_step(K, mean, F_tilde)
+        # W at the stepped values differentiates log |B| through the mode as well.
+        _grad, W = self._build_logp_derivatives(F_tilde + mean)
+        LB, _sW = self._build_B_cholesky(K, W)
+        logp = tf.reduce_sum(self.likelihood.logp(F_tilde + mean, self.Y))
+        return (-0.5 * tf.reduce_sum(a * F_tilde) + logp -
+                tf.reduce_sum(tf.log(tf.matrix_diag_part(LB))))
+
+    @params_as_tensors
+    def _build_predict(self, Xnew, full_cov=False):
+        """
+        Predictive distribution of the Laplace approximation,
+
+            q(F*) = N(F* | m(X*) + K_{*f} a, K_{**} - K_{*f} (K + W^{-1})^{-1} K_{f*}),
+
+        where W is the negative Hessian of log-likelihood at the mode.
+        """
+        K, mean = self._build_prior_moments()
+        _F_tilde, a, LB, sW = self._build_mode(K, mean)
+        Kx = self.kern.K(self.X, Xnew)
+        f_mean = tf.matmul(Kx, a, transpose_a=True) + self.mean_function(Xnew)
+        V = tf.matrix_triangular_solve(LB, tf.expand_dims(tf.transpose(sW), 2) * Kx)
+        if full_cov:
+            f_var = self.kern.K(Xnew) - tf.matmul(V, V, transpose_a=True)
+        else:
+            f_var = tf.transpose(self.kern.Kdiag(Xnew) - tf.reduce_sum(tf.square(V), 1))
+        return f_mean, f_var
+
+    @params_as_tensors
+    def _build_prior_moments(self):
+        K = self.kern.K(self.X) + tf.eye(self.num_data, dtype=settings.float_type) * \
+            settings.numerics.jitter_level
+        mean = self.mean_function(self.X) + tf.zeros_like(self.F_mode)
+        return K, mean
+
+    @name_scope('laplace_mode')
+    def _build_mode(self, K, mean):
+        """
+        Newton iterations for the mode, warm started from `F_mode`. The mode is
+        not differentiated. Returns the centered mode F - m(X), the vector `a`,
+        the Cholesky factor of B and the square root of W at the mode.
+        """
+        with params_as_tensors_for(self, convert=False):
+            mode_param = self.F_mode
+        K = tf.stop_gradient(K)
+        mean = tf.stop_gradient(mean)
+        F_init = mode_param.constrained_tensor - mean
+
+        def cond(i, _F_tilde, delta):
+            return tf.logical_and(i < self.newton_iterations, delta > self.newton_tolerance)
+
+        def body(i, F_tilde, _delta):
+            F_new = self._build_newton_step(K, mean, F_tilde)[0]
+            delta = tf.reduce_max(tf.abs(F_new - F_tilde))
+            return i + 1, F_new, delta
+
+        inf = tf.constant(np.inf, dtype=settings.float_type)
+        _i, F_tilde, _delta = tf.while_loop(cond, body, [0, F_init, inf], back_prop=False)
+        F_tilde = tf.stop_gradient(F_tilde)
+        assign = tf.assign(mode_param.unconstrained_tensor,
+                           mode_param.transform.backward_tensor(F_tilde + mean))
+        with tf.control_dependencies([assign]):
+            F_tilde = tf.identity(F_tilde)
+        _F, a, LB, sW = self._build_newton_step(K, mean, F_tilde)
+        return F_tilde, a, LB, sW
+
+    @params_as_tensors
+    def _build_newton_step(self, K, mean, F_tilde):
+        """
+        Single Newton step of algorithm 3.1 from Rasmussen and Williams, batched over
+        latent functions. Returns the new centered values K a, vector `a`, Cholesky
+        factor of B = I + W^½ K W^½ (R x N x N) and W^½ (N x R) at the input values.
+        """
+        grad, W = self._build_logp_derivatives(F_tilde + mean)
+        LB, sW = self._build_B_cholesky(K, W)
+        b = W * F_tilde + grad
+        c = tf.matrix_triangular_solve(LB, tf.expand_dims(tf.transpose(sW * tf.matmul(K, b)), 2))
+        d = tf.matrix_triangular_solve(LB, c, adjoint=True)[:, :, 0]
+        a = b - sW * tf.transpose(d)
+        return tf.matmul(K, a), a, LB, sW
+
+    def _build_B_cholesky(self, K, W):
+        """
+        Cholesky factor of B = I + W^½ K W^½ (R x N x N) and W^½ (N x R). The square
+        root is bounded away from zero, so that its gradient is finite where the
+        curvature is clipped.
+        """
+        tiny = tf.constant(np.finfo(settings.float_type).tiny, dtype=settings.float_type)
+        sW = tf.sqrt(tf.maximum(W, tiny))
+        sW_rn = tf.transpose(sW)
+        I = tf.tile(tf.expand_dims(tf.eye(self.num_data, dtype=settings.float_type), 0),
+                    [self.num_latent, 1, 1])
+        B = I + tf.expand_dims(sW_rn, 2) * K * tf.expand_dims(sW_rn, 1)
+        return tf.cholesky(B), sW
+
+    @params_as_tensors
+    def _build_logp_derivatives(self, F):
+        """
+        Gradient and negative diagonal Hessian of the log-likelihood w.r.t. F.
+        """
+        logp = tf.reduce_sum(self.likelihood.logp(F, self.Y))
+        grad = tf.gradients(logp, F)[0]
+        hess = tf.gradients(tf.reduce_sum(grad), F)[0]
+        W = tf.maximum(-hess, tf.zeros_like(hess))
+        return grad, W
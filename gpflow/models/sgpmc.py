@@ -16,10 +16,11 @@
 import numpy as np
 import tensorflow as tf
 
+from .. import settings
 from ..models.model import GPModel
 from ..conditionals import conditional
 from ..features import inducingpoint_wrapper
-from ..params import Parameter, DataHolder
+from ..params import Parameter, DataHolder, Minibatch
 from ..priors import Gaussian
 from ..decors import params_as_tensors
 
@@ -60,18 +61,29 @@ class SGPMC(GPModel):
                  mean_function=None,
                  num_latent=None,
                  Z=None,
+                 minibatch_size=None,
+                 num_data=None,
                  **kwargs):
         """
         X is a data matrix, size N x D
         Y is a data matrix, size N x R
         Z is a data matrix, of inducing inputs, size M x D
         kern, likelihood, mean_function are appropriate GPflow objects
+        minibatch_size, if not None, turns on mini-batching with that size,
+        the likelihood term is then an unbiased estimate of the full-data one
+        and is meant for stochastic gradient samplers, e.g. `SGLD` or `SGHMC`.
+        num_data is the total number of observations, default to X.shape[0]
+        (relevant when feeding in external minibatches)
 
         """
-        X = DataHolder(X)
-        Y = DataHolder(Y)
+        if minibatch_size is None:
+            X = DataHolder(X)
+            Y = DataHolder(Y)
+        else:
+            X = Minibatch(X, batch_size=minibatch_size, seed=0)
+            Y = Minibatch(Y, batch_size=minibatch_size, seed=0)
         GPModel.__init__(self, X, Y, kern, likelihood, mean_function, num_latent=num_latent, **kwargs)
-        self.num_data = X.shape[0]
+        self.num_data = num_data or X.shape[0]
         self.feature = inducingpoint_wrapper(feat, Z)
         self.V = Parameter(np.zeros((len(self.feature), self.num_latent)))
         self.V.prior = Gaussian(0., 1.)
@@ -83,7 +95,10 @@ class SGPMC(GPModel):
         """
         # get the (marginals of) q(f): exactly predicting!
         fmean, fvar = self._build_predict(self.X, full_cov=False)
-        return tf.reduce_sum(self.likelihood.variational_expectations(fmean, fvar, self.Y))
+        var_exp = self.likelihood.variational_expectations(fmean, fvar, self.Y)
+        # re-scale for minibatch size
+        scale = tf.cast(self.num_data, settings.float_type) / tf.cast(tf.shape(self.X)[0], settings.float_type)
+        return tf.reduce_sum(var_exp) * scale
 
     @params_as_tensors
     def _build_predict(self, Xnew, full_cov=False, full_output_cov=False):
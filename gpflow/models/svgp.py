@@ -20,8 +20,11 @@ from .. import kullback_leiblers, features
 from .. import settings
 from .. import transforms
 from ..conditionals import conditional, Kuu
+from ..covariance_factors import LowRankPlusDiagonal, SharedFactor
 from ..decors import params_as_tensors
 from ..models.model import GPModel
+from ..multioutput.features import Mof
+from ..multioutput.kernels import Mok
 from ..params import DataHolder
 from ..params import Minibatch
 from ..params import Parameter
@@ -53,6 +56,8 @@ class SVGP(GPModel):
                  num_data=None,
                  q_mu=None,
                  q_sqrt=None,
+                 q_rank=None,
+                 q_shared=False,
                  **kwargs):
         """
         - X is a data matrix, size N x D
@@ -68,7 +73,20 @@ class SVGP(GPModel):
         - minibatch_size, if not None, turns on mini-batching with that size.
         - num_data is the total number of observations, default to X.shape[0]
           (relevant when feeding in external minibatches)
+        - q_rank, if not None, turns on low-rank-plus-diagonal covariances
+          S = diag(q_sqrt_diag)² + q_sqrt q_sqrtᵀ, where q_sqrt is L x M x q_rank.
+        - q_shared is a boolean. If True, a single lower triangular q_sqrt
+          (1 x M x M) is shared by all latent functions.
         """
+        if q_rank is not None and (q_diag or q_shared):
+            raise ValueError('The q_rank parameter cannot be combined with q_diag or q_shared.')
+        if q_rank is not None and q_rank <= 0:
+            raise ValueError('The q_rank parameter must be greater zero.')
+        if q_shared and q_diag:
+            raise ValueError('The q_shared and q_diag parameters cannot be combined.')
+        if (q_rank is not None or q_shared) and (isinstance(kern, Mok) or isinstance(feat, Mof)):
+            raise ValueError('The q_rank and q_shared parameters are not supported by '
+                             'multi-output kernels and features.')
         # sort out the X, Y into MiniBatch objects if required.
         if minibatch_size is None:
             X = DataHolder(X)
@@ -81,6 +99,7 @@ class SVGP(GPModel):
         GPModel.__init__(self, X, Y, kern, likelihood, mean_function, num_latent, **kwargs)
         self.num_data = num_data or X.shape[0]
         self.q_diag, self.whiten = q_diag, whiten
+        self.q_rank, self.q_shared = q_rank, q_shared
         self.feature = features.inducingpoint_wrapper(feat, Z)
 
         # init variational parameters
@@ -109,6 +128,8 @@ class SVGP(GPModel):
             Cholesky of the covariance of the variational Gaussian posterior.
             If None the function will initialise `q_sqrt` with identity matrix.
             If not None, the shape of `q_sqrt` is checked, depending on `q_diag`.
+            With `q_rank` it is the L x M x k low-rank factor, with `q_shared`
+            the 1 x M x M or M x M shared Cholesky factor.
         :param q_diag: bool
             Used to check if `q_mu` and `q_sqrt` have the correct shape or to
             construct them with the correct shape. If `q_diag` is true,
@@ -118,7 +139,23 @@ class SVGP(GPModel):
         q_mu = np.zeros((num_inducing, self.num_latent)) if q_mu is None else q_mu
         self.q_mu = Parameter(q_mu, dtype=settings.float_type)  # M x P
 
-        if q_sqrt is None:
+        if self.q_rank is not None:
+            num_latent = q_mu.shape[1]
+            if q_sqrt is None:
+                # Small non-zero factor, W = 0 is a stationary point of the bound.
+                factor = 1e-3 * np.eye(num_inducing, self.q_rank, dtype=settings.float_type)
+                q_sqrt = np.tile(factor[None, :, :], [num_latent, 1, 1])
+            assert q_sqrt.ndim == 3 and q_sqrt.shape[2] == self.q_rank
+            self.q_sqrt_diag = Parameter(np.ones((num_inducing, num_latent), dtype=settings.float_type),
+                                         transform=transforms.positive)  # M x L
+            self.q_sqrt = Parameter(q_sqrt, dtype=settings.float_type)  # L x M x k
+        elif self.q_shared:
+            if q_sqrt is None:
+                q_sqrt = np.eye(num_inducing, dtype=settings.float_type)[None, :, :]
+            q_sqrt = q_sqrt[None, :, :] if q_sqrt.ndim == 2 else q_sqrt
+            assert q_sqrt.ndim == 3 and q_sqrt.shape[0] == 1
+            self.q_sqrt = Parameter(q_sqrt, transform=transforms.LowerTriangular(q_sqrt.shape[1], 1))  # 1 x M x M
+        elif q_sqrt is None:
             if self.q_diag:
                 self.q_sqrt = Parameter(np.ones((num_inducing, self.num_latent), dtype=settings.float_type),
                                         transform=transforms.positive)  # M x P
@@ -143,7 +180,19 @@ class SVGP(GPModel):
         else:
             K = Kuu(self.feature, self.kern, jitter=settings.numerics.jitter_level)  # (P x) x M x M
 
-        return kullback_leiblers.gauss_kl(self.q_mu, self.q_sqrt, K)
+        return kullback_leiblers.gauss_kl(self.q_mu, self.build_q_sqrt(), K)
+
+    @params_as_tensors
+    def build_q_sqrt(self):
+        """
+        Square root of the covariance of q(u) in the form accepted by `conditional`
+        and `gauss_kl`, a tensor or `covariance_factors.CovarianceFactor`.
+        """
+        if self.q_rank is not None:
+            return LowRankPlusDiagonal(self.q_sqrt_diag, self.q_sqrt)
+        if self.q_shared:
+            return SharedFactor(self.q_sqrt[0])
+        return self.q_sqrt
 
     @params_as_tensors
     def _build_likelihood(self):
@@ -167,6 +216,6 @@ class SVGP(GPModel):
 
     @params_as_tensors
     def _build_predict(self, Xnew, full_cov=False, full_output_cov=False):
-        mu, var = conditional(Xnew, self.feature, self.kern, self.q_mu, q_sqrt=self.q_sqrt, full_cov=full_cov,
+        mu, var = conditional(Xnew, self.feature, self.kern, self.q_mu, q_sqrt=self.build_q_sqrt(), full_cov=full_cov,
                               white=self.whiten, full_output_cov=full_output_cov)
         return mu + self.mean_function(Xnew), var
@@ -0,0 +1,222 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import tensorflow as tf
+from scipy.spatial import cKDTree
+
+from .. import likelihoods
+from .. import settings
+
+from ..params import DataHolder, Minibatch
+from ..decors import params_as_tensors
+from ..decors import name_scope
+from ..logdensities import gaussian
+
+from .model import GPModel
+
+
+class VecchiaGPR(GPModel):
+    r"""
+    Gaussian process regression with the Vecchia approximation of the marginal
+    likelihood,
+
+    ::
+
+      @article{vecchia1988estimation,
+        title={Estimation and model identification for continuous spatial processes},
+        author={Vecchia, Aldo V.},
+        journal={Journal of the Royal Statistical Society: Series B},
+        year={1988}
+      }
+
+    Data points are ordered and every observation is conditioned on its `m`
+    nearest neighbours among the previously ordered points,
+
+    .. math::
+
+       \log p(\mathbf y) \approx \sum_i \log p(y_i | \mathbf y_{n(i)}),
+
+    so that the likelihood is a sum of N independent m x m conditionals and costs
+    O(N m³). Neighbours are found with a KD-tree at construction time, in the
+    original input space. Predictions at new points condition on their `m`
+    nearest training points, found by brute force in the graph, which costs
+    O(M N) for M new points - predict large test sets in chunks.
+
+    The kernel must support inputs with a leading batch dimension, as all
+    stationary kernels do. The data are stored in the Vecchia order, the
+    permutation of the original rows is kept in `ordering`.
+    """
+    def __init__(self, X, Y, kern, mean_function=None, num_neighbours=10,
+                 ordering='random', minibatch_size=None, **kwargs):
+        """
+        X is a data matrix, size N x D
+        Y is a data matrix, size N x R
+        kern, mean_function are appropriate GPflow objects
+        num_neighbours is the number of conditioning points m
+        ordering is 'random', 'coordinate' (sorted by the first input),
+            'none' (as given) or an array with a permutation of rows
+        minibatch_size, if not None, turns on mini-batching of the conditionals
+        """
+        if num_neighbours <= 0:
+            raise ValueError('The num_neighbours parameter must be greater zero.')
+        X, Y = np.asarray(X), np.asarray(Y)
+        ordering = _vecchia_ordering(X, ordering)
+        X, Y = X[ordering], Y[ordering]
+        neighbours = _ordered_neighbours(X, num_neighbours)
+        num_data = X.shape[0]
+
+        likelihood = likelihoods.Gaussian()
+        X = DataHolder(X)
+        Y = DataHolder(Y)
+        GPModel.__init__(self, X, Y, kern, likelihood, mean_function, **kwargs)
+        self.num_data = num_data
+        self.num_neighbours = num_neighbours
+        self.ordering = ordering
+        self.neighbours = DataHolder(neighbours)
+        index = np.arange(num_data)
+        if minibatch_size is None:
+            self.index = DataHolder(index)
+        else:
+            self.index = Minibatch(index, batch_size=minibatch_size, seed=0)
+
+    @name_scope('likelihood')
+    @params_as_tensors
+    def _build_likelihood(self):
+        r"""
+        Construct a tensorflow function to compute the Vecchia approximation of
+
+            \log p(Y | theta).
+
+        With mini-batching the sum of conditionals is rescaled to the full dataset.
+        """
+        neighbours = tf.gather(self.neighbours, self.index)
+        mask = neighbours >= 0
+        neighbours = tf.maximum(neighbours, 0)
+        Xp = tf.gather(self.X, self.index)
+        Yp = tf.gather(self.Y, self.index)
+        mean, var = self._build_conditionals(tf.gather(self.X, neighbours),
+                                             tf.gather(self.Y, neighbours), mask, Xp)
+        var = tf.expand_dims(var + self.likelihood.variance, 1)
+        logpdf = tf.reduce_sum(gaussian(Yp, mean, var))
+        scale = tf.cast(self.num_data, settings.float_type) / \
+            tf.cast(tf.shape(self.index)[0], settings.float_type)
+        return logpdf * scale
+
+    @name_scope('predict')
+    @params_as_tensors
+    def _build_predict(self, Xnew, full_cov=False):
+        """
+        Xnew is a data matrix, the points at which we want to predict.
+
+        This method computes marginals of
+
+            p(F* | Y_{n(*)})
+
+        where Y_{n(*)} are noisy observations at the nearest neighbours of each
+        point of Xnew. Joint predictive covariances are not available.
+        """
+        if full_cov:
+            raise NotImplementedError('VecchiaGPR predicts marginal variances only.')
+        num_neighbours = min(self.num_neighbours, self.num_data)
+        square_dist = tf.reduce_sum(tf.square(Xnew), 1, keepdims=True) - \
+            2 * tf.matmul(Xnew, self.X, transpose_b=True) + \
+            tf.reduce_sum(tf.square(self.X), 1)
+        _, neighbours = tf.nn.top_k(-square_dist, k=num_neighbours)
+        mask = tf.ones_like(neighbours, dtype=tf.bool)
+        mean, var = self._build_conditionals(tf.gather(self.X, neighbours),
+                                             tf.gather(self.Y, neighbours), mask, Xnew)
+        var = tf.tile(tf.expand_dims(var, 1), [1, tf.shape(self.Y)[1]])
+        return mean, var
+
+    @params_as_tensors
+    def _build_conditionals(self, Xn, Yn, mask, Xp):
+        """
+        Batched conditionals of f(Xp) given noisy observations at the neighbours.
+
+        :param Xn: B x m x D inputs of neighbours.
+        :param Yn: B x m x R observations of neighbours.
+        :param mask: B x m boolean mask of valid neighbours. Invalid neighbours are
+            replaced by independent unit variance points without effect on
+            the result.
+        :param Xp: B x D conditioned points.
+        :return: B x R means and B variances.
+        """
+        mask = tf.cast(mask, settings.float_type)
+        Knn = self.kern.K(Xn) * tf.expand_dims(mask, 2) * tf.expand_dims(mask, 1)
+        Knn += tf.matrix_diag(mask * self.likelihood.variance + (1. - mask))
+        Kpn = self.kern.K(Xn, tf.expand_dims(Xp, 1))[:, :, 0] * mask
+        L = tf.cholesky(Knn)
+        A = tf.matrix_triangular_solve(L, tf.expand_dims(Kpn, 2))
+
+        mean_shape = tf.concat([tf.shape(Xn)[:2], [-1]], 0)
+        mean_n = tf.reshape(self.mean_function(tf.reshape(Xn, [-1, tf.shape(Xn)[2]])), mean_shape)
+        err = (Yn - mean_n) * tf.expand_dims(mask, 2)
+        c = tf.matrix_triangular_solve(L, err)
+        mean = self.mean_function(Xp) + tf.reduce_sum(A * c, 1)
+        var = self.kern.Kdiag(Xp) - tf.reduce_sum(tf.square(A), [1, 2])
+        return mean, var
+
+
+def _vecchia_ordering(X, ordering):
+    num_data = X.shape[0]
+    if isinstance(ordering, str):
+        if ordering == 'random':
+            return np.random.permutation(num_data)
+        if ordering == 'coordinate':
+            return np.argsort(X[:, 0], kind='mergesort')
+        if ordering == 'none':
+            return np.arange(num_data)
+        raise ValueError('Unknown ordering "{}".'.format(ordering))
+    ordering = np.asarray(ordering)
+    if not np.array_equal(np.sort(ordering), np.arange(num_data)):
+        raise ValueError('The ordering must be a permutation of data rows.')
+    return ordering
+
+
+def _ordered_neighbours(X, num_neighbours):
+    """
+    Finds for every row `i` of X up to `num_neighbours` nearest rows among rows
+    `0, ..., i - 1`, sorted by distance. Missing neighbours are marked by -1.
+
+    Rows are processed in blocks `[start, 2 * start)` with a KD-tree of the rows
+    `[0, 2 * start)`, so that at least half of the tree points precede every
+    queried row. Rows which do not get enough preceding points among the `k`
+    nearest ones are queried again with doubled `k`.
+    """
+    num_data = X.shape[0]
+    neighbours = -np.ones((num_data, num_neighbours), dtype=np.int32)
+    start = 1
+    while start < num_data:
+        stop = min(2 * start, num_data)
+        tree = cKDTree(X[:stop])
+        pending = np.arange(start, stop)
+        k = min(2 * num_neighbours + 1, stop)
+        while pending.size > 0:
+            _, index = tree.query(X[pending], k=k)
+            index = index.reshape(pending.size, k)
+            valid = index < pending[:, None]
+            enough = valid.sum(1) >= np.minimum(num_neighbours, pending)
+            if k == stop:
+                enough[:] = True
+            order = np.argsort(~valid[enough], axis=1, kind='mergesort')
+            width = min(num_neighbours, k)
+            rows = np.arange(order.shape[0])[:, None]
+            found = index[enough][rows, order][:, :width]
+            found_valid = valid[enough][rows, order][:, :width]
+            neighbours[pending[enough], :width] = np.where(found_valid, found, -1)
+            pending = pending[~enough]
+            k = min(2 * k, stop)
+        start = stop
+    return neighbours
@@ -255,3 +255,152 @@ class VGP_opper_archambeau(GPModel):
         else:
             f_var = self.kern.Kdiag(Xnew) - tf.reduce_sum(tf.square(LiKx), 1)
         return f_mean, tf.transpose(f_var)
+
+
+class VGP_CVI(GPModel):
+    r"""
+    Variational GP with the posterior parameterised by Gaussian likelihood sites,
+    trained with conjugate-computation variational inference. The key reference is:
+    ::
+      @inproceedings{khan2017conjugate,
+          title = {Conjugate-Computation Variational Inference: Converting
+                   Variational Inference in Non-Conjugate Models to Inferences
+                   in Conjugate Models},
+          author = {Khan, Mohammad Emtiyaz and Lin, Wu},
+          booktitle = {AISTATS},
+          year = {2017}
+      }
+    The posterior approximation is the exact posterior of a GP regression with
+    pseudo-observations and heteroscedastic noise given by the sites,
+    .. math::
+       q(\\mathbf f) \\propto p(\\mathbf f) \\prod_n
+            \\exp(\\lambda_{1n} f_n - \\frac{1}{2} \\lambda_{2n} f_n^2) ,
+    where `site_nat1` holds :math:`\\lambda_1` and `site_precision` holds
+    :math:`\\lambda_2`. Site parameters are not trainable, they are updated by
+    `gpflow.train.CVIOptimizer` with natural gradient steps computed from the
+    gradients of `likelihood.variational_expectations`. Kernel, likelihood and
+    mean function parameters are trained on the evidence lower bound with any
+    other optimizer, alternating with the site updates.
+    """
+
+    def __init__(self, X, Y, kern, likelihood,
+                 mean_function=None,
+                 num_latent=None,
+                 **kwargs):
+        """
+        X is a data matrix, size N x D
+        Y is a data matrix, size N x R
+        kern, likelihood, mean_function are appropriate GPflow objects
+        """
+
+        X = DataHolder(X)
+        Y = DataHolder(Y)
+        GPModel.__init__(self, X, Y, kern, likelihood, mean_function, num_latent, **kwargs)
+        self.num_data = X.shape[0]
+        self._init_sites()
+
+    def _init_sites(self):
+        shape = (self.num_data, self.num_latent)
+        self.site_nat1 = Parameter(np.zeros(shape), trainable=False)
+        # Small precisions, but off the lower bound of the transform.
+        self.site_precision = Parameter(np.full(shape, 1e-4), transforms.positive,
+                                        trainable=False)
+
+    def compile(self, session=None):
+        """
+        Before calling the standard compile function, check to see if the size
+        of the data has changed and add site parameters appropriately.
+
+        This is necessary because the shape of the parameters depends on the
+        shape of the data.
+        """
+        if not self.num_data == self.X.shape[0]:
+            self.num_data = self.X.shape[0]
+            self._init_sites()
+        return super(VGP_CVI, self).compile(session=session)
+
+    def anchor(self, session):
+        """
+        Anchors trainable parameters and the sites, which are not trainable,
+        but are updated in the session by `CVIOptimizer`.
+        """
+        super(VGP_CVI, self).anchor(session)
+        for site in [self.site_nat1, self.site_precision]:
+            site.assign(site.read_value(session=session), session=session)
+
+    @params_as_tensors
+    def build_site_posterior(self):
+        """
+        Solves the GP regression with pseudo-observations given by the sites.
+
+        :return: tuple (K, LB, sqrt_precision, alpha), where K is the prior covariance
+            N x N, LB is the Cholesky factor of I + Λ^½ K Λ^½ of shape R x N x N,
+            sqrt_precision is Λ^½ of shape R x N and alpha = (K + Λ⁻¹)⁻¹ (ỹ - m(X))
+            of shape N x R with ỹ = λ₁ / Λ.
+        """
+        K = self.kern.K(self.X)
+        pseudo_y = self.site_nat1 / self.site_precision
+        err = pseudo_y - self.mean_function(self.X)
+        sqrt_precision = tf.transpose(tf.sqrt(self.site_precision))  # R x N
+
+        I = tf.tile(tf.expand_dims(tf.eye(self.num_data, dtype=settings.float_type), 0),
+                    [self.num_latent, 1, 1])
+        B = I + tf.expand_dims(sqrt_precision, 1) * tf.expand_dims(sqrt_precision, 2) * K
+        LB = tf.cholesky(B)
+        c = tf.matrix_triangular_solve(LB, tf.expand_dims(sqrt_precision * tf.transpose(err), 2))
+        alpha = sqrt_precision * tf.matrix_triangular_solve(LB, c, adjoint=True)[:, :, 0]
+        return K, LB, sqrt_precision, tf.transpose(alpha)
+
+    @params_as_tensors
+    def build_marginals(self):
+        """
+        Marginal means and variances of q(f) at training inputs, both N x R.
+        """
+        return self._build_marginals(*self.build_site_posterior())
+
+    @params_as_tensors
+    def _build_marginals(self, K, LB, sqrt_precision, alpha):
+        f_mean = tf.matmul(K, alpha) + self.mean_function(self.X)
+        A = tf.matrix_triangular_solve(LB, tf.expand_dims(sqrt_precision, 2) * K)
+        f_var = tf.expand_dims(tf.matrix_diag_part(K), 0) - tf.reduce_sum(tf.square(A), 1)
+        return f_mean, tf.transpose(f_var)
+
+    @params_as_tensors
+    def _build_likelihood(self):
+        r"""
+        This method computes the variational lower bound on the likelihood,
+        which is:
+            E_{q(F)} [ \log p(Y|F) ] - KL[ q(F) || p(F)]
+        with q(F) defined by the sites. With B = I + Λ^½ K Λ^½ the KL divergence is
+            KL = ½ (tr(B⁻¹) + αᵀ K α - N + log|B|) .
+        """
+        K, LB, sqrt_precision, alpha = self.build_site_posterior()
+        f_mean, f_var = self._build_marginals(K, LB, sqrt_precision, alpha)
+
+        I = tf.tile(tf.expand_dims(tf.eye(self.num_data, dtype=settings.float_type), 0),
+                    [self.num_latent, 1, 1])
+        LBi = tf.matrix_triangular_solve(LB, I)
+        B_logdet = 2.0 * tf.reduce_sum(tf.log(tf.matrix_diag_part(LB)))
+        trBi = tf.reduce_sum(tf.square(LBi))
+        KL = 0.5 * (B_logdet + trBi - self.num_data * self.num_latent +
+                    tf.reduce_sum(alpha * tf.matmul(K, alpha)))
+
+        v_exp = self.likelihood.variational_expectations(f_mean, f_var, self.Y)
+        return tf.reduce_sum(v_exp) - KL
+
+    @params_as_tensors
+    def _build_predict(self, Xnew, full_cov=False):
+        """
+        The posterior at Xnew is the GP regression posterior with the pseudo-observations,
+           q(F*) = N ( F* | K_{*f} alpha + mean, K_{**} - K_{*f}[K_{ff} + Λ⁻¹]^-1 K_{f*} ) .
+        """
+        _K, LB, sqrt_precision, alpha = self.build_site_posterior()
+        Kx = self.kern.K(self.X, Xnew)
+        f_mean = tf.matmul(Kx, alpha, transpose_a=True) + self.mean_function(Xnew)
+
+        A = tf.matrix_triangular_solve(LB, tf.expand_dims(sqrt_precision, 2) * Kx)
+        if full_cov:
+            f_var = self.kern.K(Xnew) - tf.matmul(A, A, transpose_a=True)
+        else:
+            f_var = tf.transpose(self.kern.Kdiag(Xnew) - tf.reduce_sum(tf.square(A), 1))
+        return f_mean, f_var
@@ -397,7 +397,8 @@ class Parameter(Node):
     def _build_constrained(self, parameter_tensor):
         if not misc.is_tensor(parameter_tensor):  # pragma: no cover
             raise GPflowError("Input must be a tensor.")
-        return self.transform.forward_tensor(parameter_tensor)
+        with tf.name_scope('transform'):
+            return self.transform.forward_tensor(parameter_tensor)
 
     def _build_prior(self, unconstrained_tensor, constrained_tensor):
         """
@@ -415,9 +416,10 @@ class Parameter(Node):
         if self.prior is None:
             return tf.constant(0.0, settings.float_type, name=prior_name)
 
-        log_jacobian = self.transform.log_jacobian_tensor(unconstrained_tensor)
-        logp_var = self.prior.logp(constrained_tensor)
-        return tf.squeeze(tf.add(logp_var, log_jacobian, name=prior_name))
+        with tf.name_scope(prior_name):
+            log_jacobian = self.transform.log_jacobian_tensor(unconstrained_tensor)
+            logp_var = self.prior.logp(constrained_tensor)
+            return tf.squeeze(tf.add(logp_var, log_jacobian, name=prior_name))
 
     def _check_tensor_trainable(self, tensor):
         is_trainable = misc.is_tensor_trainable(tensor)
@@ -0,0 +1,214 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Predictions of GPR, SGPR and SVGP models exported by `gpflow.export.export_predictor`,
+implemented with NumPy only.
+
+This module imports nothing but NumPy and the standard library. Importing it as
+`gpflow.predictor` still imports TensorFlow with the `gpflow` package, so serving
+processes which must start fast can load this file on its own, e.g. with
+`importlib.util.spec_from_file_location`, or ship a copy of it.
+
+>>> predictor = NumpyPredictor('model.npz')
+>>> mean, var = predictor.predict_y(Xnew)
+"""
+
+import functools
+import json
+import math
+
+import numpy as np
+
+
+class NumpyPredictor:
+    """
+    Predictive distribution of an exported model,
+
+        mean = Kuxᵀ a + m(x*),    var = k(x*, x*) - Kuxᵀ C Kux,
+
+    where Kux = k(U, x*) are covariances of new points and the training inputs (GPR)
+    or inducing inputs (SGPR, SVGP) U.
+    """
+
+    def __init__(self, pathname):
+        """
+        :param pathname: `.npz` file saved by `export_predictor`.
+        """
+        with np.load(pathname, allow_pickle=False) as data:
+            self.spec = json.loads(str(data['spec']))
+            self.inducing = data['inducing']  # M x D
+            self.weights = data['weights']  # M x L
+            self.covariance = data['covariance']  # M x M or L x M x M
+
+    @property
+    def num_latent(self):
+        return self.weights.shape[1]
+
+    def predict_f(self, Xnew, full_cov=False):
+        """
+        Computes the mean and variance of the latent functions at Xnew, N x D.
+
+        :return: N x L means and N x L variances, or L x N x N covariances if
+            `full_cov` is True.
+        """
+        Xnew = np.asarray(Xnew, dtype=self.weights.dtype)
+        kern = self.spec['kernel']
+        Kux = _kernel(kern, self.inducing, Xnew)  # M x N
+        mean = Kux.T @ self.weights + _mean_function(self.spec['mean_function'], Xnew)
+        C = self.covariance
+        if full_cov:
+            Kxx = _kernel(kern, Xnew)
+            if C.ndim == 2:
+                var = np.tile((Kxx - Kux.T @ C @ Kux)[None, :, :], [self.num_latent, 1, 1])
+            else:
+                var = Kxx[None, :, :] - np.matmul(Kux.T[None, :, :], np.matmul(C, Kux[None, :, :]))
+        else:
+            Kdiag = _kernel_diag(kern, Xnew)
+            if C.ndim == 2:
+                var = np.tile((Kdiag - np.sum(Kux * (C @ Kux), 0))[:, None], [1, self.num_latent])
+            else:
+                var = Kdiag[:, None] - np.sum(Kux[None, :, :] * np.matmul(C, Kux[None, :, :]), 1).T
+        return mean, var
+
+    def predict_y(self, Xnew):
+        """
+        Computes the mean and variance of held-out data at Xnew, N x D.
+
+        :return: N x L means and variances.
+        """
+        mean, var = self.predict_f(Xnew)
+        likelihood = self.spec['likelihood']
+        kind = likelihood['type']
+        if kind == 'Gaussian':
+            return mean, var + likelihood['variance']
+        if kind == 'Bernoulli':
+            p = _inv_probit(mean / np.sqrt(1 + var))
+            return p, p - np.square(p)
+        if kind == 'Poisson':
+            rate = np.exp(mean + var / 2) * likelihood['binsize']
+            return rate, rate + np.expm1(var) * np.square(rate)
+        raise NotImplementedError('Predictions of {} likelihoods are not supported.'
+                                  .format(likelihood['name']))
+
+
+_erf = np.vectorize(math.erf, otypes=[np.float64])
+
+
+def _inv_probit(x):
+    jitter = 1e-3  # as in `likelihoods.inv_probit`
+    return 0.5 * (1.0 + _erf(x / np.sqrt(2.0))) * (1 - 2 * jitter) + jitter
+
+
+def _slice(spec, X):
+    dims = spec['active_dims']
+    if isinstance(dims, dict):
+        return X[..., slice(*dims['slice'])]
+    return X[..., dims]
+
+
+def _scaled_square_dist(X, X2, lengthscales):
+    X = X / lengthscales
+    X2 = X2 / lengthscales
+    Xs = np.sum(np.square(X), -1)
+    X2s = np.sum(np.square(X2), -1)
+    return -2 * X @ X2.T + Xs[:, None] + X2s[None, :]
+
+
+def _clipped_sqrt(r2):
+    return np.sqrt(np.maximum(r2, 1e-40))
+
+
+_stationary_kernels = {
+    'SquaredExponential': lambda r2, spec: np.exp(-r2 / 2.),
+    'RationalQuadratic': lambda r2, spec: (1 + r2 / (2 * spec['alpha'])) ** (-spec['alpha']),
+    'Exponential': lambda r2, spec: np.exp(-0.5 * _clipped_sqrt(r2)),
+    'Matern12': lambda r2, spec: np.exp(-_clipped_sqrt(r2)),
+    'Matern32': lambda r2, spec: _matern32(_clipped_sqrt(r2)),
+    'Matern52': lambda r2, spec: _matern52(_clipped_sqrt(r2)),
+    'Cosine': lambda r2, spec: np.cos(_clipped_sqrt(r2)),
+}
+
+
+def _matern32(r):
+    sqrt3 = np.sqrt(3.)
+    return (1. + sqrt3 * r) * np.exp(-sqrt3 * r)
+
+
+def _matern52(r):
+    sqrt5 = np.sqrt(5.)
+    return (1.0 + sqrt5 * r + 5. / 3. * np.square(r)) * np.exp(-sqrt5 * r)
+
+
+def _kernel(spec, X, X2=None):
+    """
+    K(X, X2), or K(X, X) if X2 is None, following the conventions of `gpflow.kernels`.
+    """
+    kind = spec['type']
+    if kind == 'Sum':
+        return functools.reduce(np.add, [_kernel(k, X, X2) for k in spec['kernels']])
+    if kind == 'Product':
+        return functools.reduce(np.multiply, [_kernel(k, X, X2) for k in spec['kernels']])
+    if kind == 'White':
+        if X2 is None:
+            return spec['variance'] * np.eye(X.shape[0], dtype=X.dtype)
+        return np.zeros((X.shape[0], X2.shape[0]), dtype=X.dtype)
+    if kind == 'Constant':
+        num_columns = X.shape[0] if X2 is None else X2.shape[0]
+        return np.full((X.shape[0], num_columns), spec['variance'], dtype=X.dtype)
+
+    X = _slice(spec, X)
+    X2 = X if X2 is None else _slice(spec, X2)
+    if kind in ('Linear', 'Polynomial'):
+        K = (X * spec['variance']) @ X2.T
+        return (K + spec['offset']) ** spec['degree'] if kind == 'Polynomial' else K
+    if kind == 'Periodic':
+        r = np.pi * (X[:, None, :] - X2[None, :, :]) / spec['period']
+        r = np.sum(np.square(np.sin(r) / spec['lengthscales']), -1)
+        return spec['variance'] * np.exp(-0.5 * r)
+    if kind in _stationary_kernels:
+        r2 = _scaled_square_dist(X, X2, np.asarray(spec['lengthscales']))
+        return spec['variance'] * _stationary_kernels[kind](r2, spec)
+    raise NotImplementedError('Kernel {} is not supported.'.format(kind))
+
+
+def _kernel_diag(spec, X):
+    kind = spec['type']
+    if kind == 'Sum':
+        return functools.reduce(np.add, [_kernel_diag(k, X) for k in spec['kernels']])
+    if kind == 'Product':
+        return functools.reduce(np.multiply, [_kernel_diag(k, X) for k in spec['kernels']])
+    if kind in ('Linear', 'Polynomial'):
+        Kdiag = np.sum(np.square(_slice(spec, X)) * spec['variance'], -1)
+        return (Kdiag + spec['offset']) ** spec['degree'] if kind == 'Polynomial' else Kdiag
+    if kind in ('White', 'Constant', 'Periodic') or kind in _stationary_kernels:
+        return np.full(X.shape[0], spec['variance'], dtype=X.dtype)
+    raise NotImplementedError('Kernel {} is not supported.'.format(kind))
+
+
+def _mean_function(spec, X):
+    kind = spec['type']
+    if kind == 'Zero':
+        return np.zeros((X.shape[0], spec['output_dim']), dtype=X.dtype)
+    if kind == 'Identity':
+        return X
+    if kind == 'Linear':
+        return X @ np.asarray(spec['A']) + np.asarray(spec['b'])
+    if kind == 'Constant':
+        return np.tile(np.asarray(spec['c']), [X.shape[0], 1])
+    if kind == 'Additive':
+        return _mean_function(spec['parts'][0], X) + _mean_function(spec['parts'][1], X)
+    if kind == 'Product':
+        return _mean_function(spec['parts'][0], X) * _mean_function(spec['parts'][1], X)
+    raise NotImplementedError('Mean function {} is not supported.'.format(kind))
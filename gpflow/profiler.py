@@ -0,0 +1,163 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import re
+import sys
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+
+class CostProfiler:
+    """
+    Attributes compute time and memory of TensorFlow ops to components of GPflow
+    models, recognised by the name scopes of ops, and aggregates them over many
+    traced runs.
+
+    Every op is attributed to the innermost enclosing name scope listed in
+    `components`, ops outside of them to 'other'. For instance the Cholesky
+    factorisation of `Kuu` in an SVGP model is attributed to 'conditional' and
+    the kernel evaluation inside `Kuu` to 'K'. Statistics can also be grouped
+    by op types, which separates e.g. Cholesky factorisations from matrix
+    products of the same component. Statistics can be added from one thread
+    and read from another, e.g. by `TracerSession` with asynchronous writing.
+
+    >>> profiler = gpflow.profiler.CostProfiler()
+    >>> for _ in range(10):
+    >>>     profiler.run(session, objective)
+    >>> profiler.print_table()
+    """
+
+    components = ('K', 'Kdiag', 'Kuu', 'Kuf', 'conditional', 'sample_conditional',
+                  'gauss_kl', 'variational_expectations', 'quadrature', 'transform', 'prior')
+
+    def __init__(self, components=None):
+        """
+        :param components: name scopes to attribute costs to, `CostProfiler.components`
+            by default.
+        """
+        if components is not None:
+            self.components = tuple(components)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Discards aggregated statistics.
+        """
+        with self._lock:
+            self.num_runs = 0
+            # micro seconds, allocated bytes and number of executed ops for every
+            # pair of component and op type
+            self._stats = collections.defaultdict(lambda: np.zeros(3))
+
+    def run(self, session, fetches, feed_dict=None):
+        """
+        Runs fetches with full tracing and adds the statistics of the run.
+
+        :return: fetched values.
+        """
+        options = tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE)
+        run_metadata = tf.RunMetadata()
+        output = session.run(fetches, feed_dict=feed_dict, options=options,
+                             run_metadata=run_metadata)
+        self.add_step_stats(run_metadata.step_stats)
+        return output
+
+    def add_step_stats(self, step_stats):
+        """
+        Adds statistics of one traced run, e.g. `tf.RunMetadata().step_stats`.
+        """
+        run_stats = collections.defaultdict(lambda: np.zeros(3))
+        for device_stats in step_stats.dev_stats:
+            if device_stats.device.endswith('/stream:all'):
+                continue  # duplicates of ops traced on separate GPU streams
+            for node_stats in device_stats.node_stats:
+                node_name = node_stats.node_name.split(':')[0]
+                if node_name == '_SOURCE':
+                    continue
+                allocated = sum(output.tensor_description.allocation_description.allocated_bytes
+                                for output in node_stats.output)
+                key = self.component(node_name), _op_type(node_stats)
+                run_stats[key] += [node_stats.all_end_rel_micros, allocated, 1]
+        with self._lock:
+            for key, stats in run_stats.items():
+                self._stats[key] += stats
+            self.num_runs += 1
+
+    def component(self, node_name):
+        """
+        Component of an op given by its full name.
+        """
+        for scope in reversed(node_name.split('/')[:-1]):
+            # TensorFlow makes repeated scopes unique with suffixes, e.g. K_1
+            scope = re.sub(r'_\d+$', '', scope)
+            if scope in self.components:
+                return scope
+        return 'other'
+
+    def summary(self, by='component'):
+        """
+        Aggregated statistics ranked by time.
+
+        :param by: 'component' or 'op' to group by op types.
+        :return: list of tuples of a name, milliseconds per run, share of the total
+            time, megabytes allocated per run and number of ops per run.
+        """
+        if by not in ('component', 'op'):
+            raise ValueError('Unknown grouping "{}".'.format(by))
+        with self._lock:
+            items = [(key, stats.copy()) for key, stats in self._stats.items()]
+            num_runs = max(self.num_runs, 1)
+        groups = collections.defaultdict(lambda: np.zeros(3))
+        for (component, op_type), stats in items:
+            groups[component if by == 'component' else op_type] += stats
+        total_micros = sum(stats[0] for stats in groups.values())
+        rows = [(name,
+                 stats[0] / 1e3 / num_runs,
+                 stats[0] / total_micros if total_micros > 0 else np.nan,
+                 stats[1] / 2 ** 20 / num_runs,
+                 stats[2] / num_runs)
+                for name, stats in groups.items()]
+        return sorted(rows, key=lambda row: row[1], reverse=True)
+
+    def table(self, by='component', top=None):
+        """
+        Ranked table of aggregated statistics as a string.
+
+        :param by: 'component' or 'op' to group by op types.
+        :param top: number of rows to show, all by default.
+        """
+        header = '{:<28}{:>12}{:>9}{:>12}{:>10}'.format(
+            by, 'ms/run', 'share', 'MB/run', 'ops/run')
+        lines = [header, '-' * len(header)]
+        for name, millis, share, megabytes, num_ops in self.summary(by)[:top]:
+            lines.append('{:<28}{:>12.3f}{:>8.1%} {:>12.3f}{:>10.1f}'.format(
+                name, millis, share, megabytes, num_ops))
+        lines.append('{} traced runs'.format(self.num_runs))
+        return '\n'.join(lines)
+
+    def print_table(self, by='component', top=None, file=None):
+        """
+        Prints the ranked table to a file, or to sys.stdout by default.
+        """
+        print(self.table(by=by, top=top), file=file or sys.stdout)
+
+
+def _op_type(node_stats):
+    # Timeline labels have the form "name = OpType(inputs)".
+    match = re.match(r'.* = (\w+)\(', node_stats.timeline_label)
+    return match.group(1) if match else 'unknown'
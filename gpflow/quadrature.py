@@ -20,6 +20,7 @@ import tensorflow as tf
 
 from . import settings
 from .core.errors import GPflowError
+from .decors import name_scope
 
 
 def hermgauss(n: int):
@@ -46,6 +47,7 @@ def mvhermgauss(H: int, D: int):
     return x, w
 
 
+@name_scope('quadrature')
 def mvnquad(func, means, covs, H: int, Din: int=None, Dout=None):
     """
     Computes N Gaussian expectation integrals of a single function 'f'
@@ -92,6 +94,7 @@ def mvnquad(func, means, covs, H: int, Din: int=None, Dout=None):
     return tf.reduce_sum(fX * wr, 0)
 
 
+@name_scope('quadrature')
 def ndiagquad(funcs, H: int, Fmu, Fvar, logspace: bool=False, **Ys):
     """
     Computes N Gaussian expectation integrals of one or more functions
@@ -198,6 +201,7 @@ def ndiagquad(funcs, H: int, Fmu, Fvar, logspace: bool=False, **Ys):
         return eval_func(funcs)
 
 
+@name_scope('quadrature')
 def ndiag_mc(funcs, S: int, Fmu, Fvar, logspace: bool=False, epsilon=None, **Ys):
     """
     Computes N Gaussian expectation integrals of one or more functions
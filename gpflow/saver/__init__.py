@@ -16,4 +16,10 @@
 from .saver import Saver
 from .saver import SaverContext
 from .coders import CoderDispatcher
-from .serializers import HDF5Serializer
\ No newline at end of file
+from .serializers import HDF5Serializer
+from .snapshots import SnapshotBank
+from .snapshots import fingerprint
+from .snapshots import read_snapshot
+from .snapshots import assign_snapshot
+from .snapshots import save_snapshot
+from .snapshots import load_snapshot
\ No newline at end of file
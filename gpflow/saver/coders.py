@@ -28,6 +28,10 @@ Standard coders can encode/decode:
 * Numpy array and scalar.
 * Function, except lambda and class methods.
 
+Values of parameters and data holders larger than `external_array_size` of the context
+are encoded as references to arrays kept outside of the encoded structure, which
+serializers store separately, see `ExternalArray`.
+
 """
 
 import abc
@@ -42,7 +46,7 @@ import numpy as np
 import tensorflow as tf
 
 from ..core import AutoFlow, Node
-from ..params import Parameter, Parameterized, ParamList
+from ..params import Parameter, Parameterized, ParamList, DataHolder
 from ..priors import Prior
 from ..transforms import Transform
 from .context import BaseContext, Contexture
@@ -62,7 +66,7 @@ class StructField(Enum):
 
 class StructType(Enum):
     """Custom np.dtype values for '__type__' field."""
-    OBJECT, DICT, LIST, FUNCTION, SLICE = range(0, 5)
+    OBJECT, DICT, LIST, FUNCTION, SLICE, EXTERNAL = range(0, 6)
 
 
 NoneType = type(None)
@@ -82,6 +86,17 @@ DictBasicType = Dict[str, BasicType]
 ListBasicType = List[BasicType]
 
 
+class ExternalArray:
+    """Array stored outside of the encoded structure. The encoded structure keeps only its
+    index in the list of external arrays of the context's shared data, which the serializer
+    writes separately. Arrays of data holders are marked, so that they can be skipped when
+    loading."""
+
+    def __init__(self, value: np.ndarray, is_data: bool = False):
+        self.value = value
+        self.is_data = is_data
+
+
 class BaseCoder(Contexture, metaclass=abc.ABCMeta):
     """Abstract class for coders."""
     @classmethod
@@ -334,6 +349,46 @@ class SliceCoder(StructCoder):
         return slice(*map(try_decode, data))
 
 
+class ExternalArrayCoder(StructCoder):
+    """External array coder appends the array to the context's shared data list
+    'external_arrays' and encodes its index:
+    {
+        '__type__': StructType.EXTERNAL.value,
+        '__data__': <index>,
+        '__extra__': <is_data>
+    }.
+    Decoding uses the reader registered by the serializer in the context's shared data
+    under 'external_array_reader', or the list of arrays if they were encoded with the
+    same context."""
+
+    @classmethod
+    def decoding_type(cls):
+        return StructType.EXTERNAL.value
+
+    @classmethod
+    def encoding_type(cls):
+        return ExternalArray
+
+    def encode(self, item: ExternalArray):
+        arrays = self.context.shared_data.setdefault(EXTERNAL_ARRAYS, [])
+        arrays.append(item.value)
+        dtype = np.dtype([type_pattern(),
+                          (StructField.DATA.value, np.int64),
+                          (StructField.EXTRA.value, np.bool_)])
+        return np.array((self.decoding_type(), len(arrays) - 1, item.is_data), dtype=dtype)
+
+    def decode(self, item: np.ndarray):
+        index = int(item[StructField.DATA.value])
+        is_data = bool(item[StructField.EXTRA.value])
+        reader = self.context.shared_data.get(EXTERNAL_ARRAY_READER)
+        if reader is not None:
+            return reader(index, is_data)
+        arrays = self.context.shared_data.get(EXTERNAL_ARRAYS)
+        if arrays is None:
+            raise ValueError('External array {} is not available for decoding.'.format(index))
+        return arrays[index]
+
+
 class FunctionCoder(StructCoder):
     """Function coder is able to encode only importable functions.
     Lambdas, class methods and static methods as well can not be encoded.
@@ -505,6 +560,8 @@ class ParameterCoder(NodeCoder):
         session = self.context.session
         values = super()._take_values(item)
         cached_value = np.array(item.read_value(session=session))
+        if _is_external(self.context, cached_value):
+            cached_value = ExternalArray(cached_value, is_data=isinstance(item, DataHolder))
         values['_value'] = cached_value
         return values
 
@@ -593,6 +650,7 @@ class CoderDispatcher(BaseCoder):
                 ListCoder,
                 DictCoder,
                 SliceCoder,
+                ExternalArrayCoder,
                 ParameterCoder,
                 ParamListCoder,
                 ParameterizedCoder,
@@ -620,6 +678,10 @@ class CoderDispatcher(BaseCoder):
 # Auxillary functions.
 # ====================
 
+EXTERNAL_ARRAYS = 'external_arrays'
+EXTERNAL_ARRAY_READER = 'external_array_reader'
+
+
 
 def type_pattern():
     return (StructField.TYPE.value, np.uint8)
@@ -633,6 +695,16 @@ def numpy_none():
     return np.array(np.nan)
 
 
+def _is_external(context: BaseContext, value: np.ndarray) -> bool:
+    """Decide whether an array is stored outside of the encoded structure. It requires the
+    context's serializer to support external arrays."""
+    size = getattr(context, 'external_array_size', None)
+    serializer = getattr(context, 'serializer', None)
+    if size is None or not getattr(serializer, 'supports_external_arrays', False):
+        return False
+    return value.size >= size and value.dtype.kind in 'biuf'
+
+
 def _add_index_to_compilations(context, index):
     compilations = 'compilations'
     if compilations not in context.shared_data:
@@ -19,27 +19,52 @@ import h5py
 import numpy as np
 import tensorflow as tf
 
-from .coders import CoderDispatcher
+from .coders import CoderDispatcher, EXTERNAL_ARRAYS
 from .context import BaseContext
 from .serializers import HDF5Serializer
 
 
 class SaverContext(BaseContext):
-    def __init__(self, version=None, serializer=None, **kwargs):
+    """Saver's context. Besides the base context options it has options for storing
+    large arrays of parameters and data holders, which serializers supporting external
+    arrays, e.g. `HDF5Serializer`, write separately from the encoded structure.
+
+    :param external_array_size: arrays with at least this number of elements are stored
+        separately, None disables it.
+    :param compression: compression filter of separately stored arrays, e.g. 'lzf' or
+        'gzip', None stores them uncompressed.
+    :param compression_opts: options of the compression filter, e.g. gzip level.
+    :param load_data_holders: when False, values of data holders stored separately are not
+        read on loading, they are restored as empty arrays to be assigned by the user.
+    :param mmap: memory-map uncompressed arrays on loading instead of reading them.
+    """
+    def __init__(self, version=None, serializer=None, external_array_size=1024,
+                 compression='lzf', compression_opts=None, load_data_holders=True,
+                 mmap=False, **kwargs):
         super().__init__(**kwargs)
         self.serializer = HDF5Serializer if serializer is None else serializer
+        self.external_array_size = external_array_size
+        self.compression = compression
+        self.compression_opts = compression_opts
+        self.load_data_holders = load_data_holders
+        self.mmap = mmap
 
 
 class Saver:
     def save(self, pathname, target, context=None):
         context = Saver.__get_context(context)
+        context.shared_data.pop(EXTERNAL_ARRAYS, None)
         encoded_target = CoderDispatcher(context).encode(target)
         context.serializer(context).dump(pathname, encoded_target)
 
     def load(self, pathname, context=None):
         context = Saver.__get_context(context)
-        encoded_target = context.serializer(context).load(pathname)
-        return CoderDispatcher(context).decode(encoded_target)
+        serializer = context.serializer(context)
+        encoded_target = serializer.load(pathname)
+        try:
+            return CoderDispatcher(context).decode(encoded_target)
+        finally:
+            serializer.close()
 
     @staticmethod
     def __get_context(context):
@@ -20,10 +20,13 @@ import h5py
 import numpy as np
 
 from .. import misc
+from .coders import EXTERNAL_ARRAYS, EXTERNAL_ARRAY_READER
 from .context import Contexture
 
 
 class BaseSerializer(Contexture, metaclass=abc.ABCMeta):
+    supports_external_arrays = False
+
     @abc.abstractmethod
     def dump(self, pathname, data):
         pass
@@ -32,8 +35,26 @@ class BaseSerializer(Contexture, metaclass=abc.ABCMeta):
     def load(self, pathname):
         pass
 
+    def close(self):
+        """Releases resources used for decoding loaded data."""
+        pass
+
 
 class HDF5Serializer(BaseSerializer):
+    """
+    Writes the encoded structure to the `data` dataset. Large arrays of parameters and
+    data holders are stored separately, each in its own dataset of the `arrays` group,
+    chunked and compressed as set by the context. On loading they are read only when the
+    structure is decoded, values of data holders can be skipped and uncompressed arrays
+    memory-mapped.
+    """
+    supports_external_arrays = True
+
+    def __init__(self, context):
+        super().__init__(context)
+        self._file = None
+        self._pathname = None
+
     def dump(self, pathname, data):
         with h5py.File(pathname) as h5file:
             meta = h5file.create_group('meta')
@@ -42,7 +63,37 @@ class HDF5Serializer(BaseSerializer):
             meta.create_dataset(name='date', data=date)
             meta.create_dataset(name='version', data=version)
             h5file.create_dataset(name='data', data=data)
+            arrays = self.context.shared_data.get(EXTERNAL_ARRAYS, [])
+            if arrays:
+                group = h5file.create_group('arrays')
+            compression = getattr(self.context, 'compression', None)
+            options = {}
+            if compression is not None:
+                options = dict(chunks=True, compression=compression,
+                               compression_opts=getattr(self.context, 'compression_opts', None))
+            for index, value in enumerate(arrays):
+                group.create_dataset(name=str(index), data=value, **options)
 
     def load(self, pathname):
-        with h5py.File(pathname) as h5file:
-            return h5file['data'].value
\ No newline at end of file
+        self.close()
+        self._pathname = pathname
+        self._file = h5py.File(pathname, 'r')
+        self.context.shared_data[EXTERNAL_ARRAY_READER] = self._read_array
+        return self._file['data'].value
+
+    def close(self):
+        self.context.shared_data.pop(EXTERNAL_ARRAY_READER, None)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _read_array(self, index, is_data):
+        dataset = self._file['arrays'][str(index)]
+        if is_data and not getattr(self.context, 'load_data_holders', True):
+            return np.empty((0,) + dataset.shape[1:], dtype=dataset.dtype)
+        offset = dataset.id.get_offset() if getattr(self.context, 'mmap', False) else None
+        if offset is not None and dataset.compression is None:
+            # Copy-on-write, assigned values are not written back to the file.
+            return np.memmap(self._pathname, mode='c', dtype=dataset.dtype,
+                             shape=dataset.shape, offset=offset)
+        return dataset[...]
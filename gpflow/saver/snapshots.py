@@ -0,0 +1,238 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Snapshots are a compact alternative to `Saver` for storing many models of the same
+structure, e.g. one model per entity. A snapshot keeps only the unconstrained values
+of all parameters concatenated into a flat vector, and a structural fingerprint: the
+list of parameter pathnames relative to the saved object, their shapes, dtypes and
+transforms. Models are not reconstructed on loading, instead the values are assigned
+to an existing, possibly compiled, model in one session call.
+
+Snapshot files are HDF5 files with a `values` dataset of size P, or K x P for a bank of
+K models, and `fingerprint` and `digest` attributes. The dataset is contiguous and
+uncompressed, so that banks can be memory-mapped.
+
+>>> gpflow.saver.save_snapshot('models.h5', models)
+>>> with gpflow.saver.SnapshotBank('models.h5') as bank:
+>>>     bank.assign(model, 42)
+"""
+
+import hashlib
+import json
+import weakref
+
+import h5py
+import numpy as np
+import tensorflow as tf
+
+from .. import settings
+from ..core.errors import GPflowError
+from ..params import Parameterized
+
+
+def fingerprint(target):
+    """
+    Structural fingerprint of the parameters of a Parameterized object.
+
+    :return: list of tuples of a pathname relative to the target, shape, dtype name and
+        transform description for every parameter, in the order of `target.parameters`.
+    """
+    if not isinstance(target, Parameterized):
+        raise ValueError('Snapshots can be taken of Parameterized objects only.')
+    prefix = len(target.pathname) + 1
+    return [(param.pathname[prefix:], tuple(int(d) for d in param.shape),
+             np.dtype(param.dtype).name, str(param.transform))
+            for param in target.parameters]
+
+
+def read_snapshot(target, session=None):
+    """
+    Reads the unconstrained values of all parameters of the target into a flat vector.
+    Values of compiled objects are read from the session in one call.
+    """
+    params = list(_parameters(target))
+    if _is_compiled(params):
+        session = target.enquire_session(session)
+        values = session.run([param.unconstrained_tensor for param in params])
+    else:
+        values = [param.transform.backward(param.read_value()) for param in params]
+    if not values:
+        return np.zeros(0, dtype=settings.float_type)
+    return np.concatenate([np.reshape(value, -1) for value in values]).astype(settings.float_type)
+
+
+def assign_snapshot(target, values, session=None):
+    """
+    Assigns a flat vector of unconstrained values to all parameters of the target. For
+    compiled objects it runs a single assign operation, which is created on the first call
+    and reused afterwards.
+    """
+    params = list(_parameters(target))
+    values = np.asarray(values, dtype=settings.float_type)
+    sizes = [int(param.size) for param in params]
+    if values.shape != (sum(sizes),):
+        raise ValueError('Snapshot of size {} does not match {} parameter values.'
+                         .format(values.size, sum(sizes)))
+    if any(param._externally_defined for param in params):
+        raise GPflowError('Externally defined parameter tensors are not modifiable.')
+
+    if _is_compiled(params):
+        session = target.enquire_session(session)
+        placeholder, assign_op = _assign_operation(target, params, sizes)
+        session.run(assign_op, feed_dict={placeholder: values})
+
+    # Keep the values of parameters coherent with their tensors.
+    offsets = np.cumsum([0] + sizes)
+    for param, start, end in zip(params, offsets[:-1], offsets[1:]):
+        value = param.transform.forward(np.reshape(values[start:end], param.shape))
+        if param.fixed_shape:
+            param._value[...] = value
+        else:
+            param._value = value.astype(param.dtype)
+
+
+def save_snapshot(pathname, target, session=None):
+    """
+    Saves a snapshot of the target, or a bank of snapshots of a list of targets with the
+    same structure, to an HDF5 file.
+    """
+    targets = target if isinstance(target, (list, tuple)) else [target]
+    if not targets:
+        raise ValueError('At least one object is required for saving a snapshot.')
+    structure = fingerprint(targets[0])
+    for other in targets[1:]:
+        _check_fingerprint(structure, fingerprint(other))
+    values = np.stack([read_snapshot(t, session=session) for t in targets])
+    if not isinstance(target, (list, tuple)):
+        values = values[0]
+    with h5py.File(pathname, 'w') as h5file:
+        h5file.create_dataset('values', data=values)
+        encoded = json.dumps(structure)
+        h5file.attrs['fingerprint'] = encoded
+        h5file.attrs['digest'] = _digest(encoded)
+
+
+def load_snapshot(pathname, target, index=None, session=None):
+    """
+    Assigns a snapshot saved by `save_snapshot` to the target. For banks, `index` selects
+    the model to load.
+    """
+    with SnapshotBank(pathname, mmap=False) as bank:
+        if bank.values.ndim == 2 and index is None:
+            raise ValueError('The snapshot file stores a bank, index must be provided.')
+        bank.assign(target, index, session=session)
+
+
+class SnapshotBank:
+    """
+    Snapshots of many models of the same structure stored in one file. Values are
+    memory-mapped when possible, so that opening a bank is cheap and only the rows
+    which are loaded are read from disk.
+    """
+
+    def __init__(self, pathname, mmap=True):
+        """
+        :param pathname: snapshot file saved by `save_snapshot`.
+        :param mmap: memory-map values instead of reading them through HDF5.
+        """
+        self._file = h5py.File(pathname, 'r')
+        self.digest = self._file.attrs['digest']
+        self.fingerprint = [(name, tuple(shape), dtype, transform) for name, shape, dtype, transform
+                            in json.loads(self._file.attrs['fingerprint'])]
+        dataset = self._file['values']
+        offset = dataset.id.get_offset() if mmap else None
+        if offset is not None:
+            self.values = np.memmap(pathname, mode='r', dtype=dataset.dtype,
+                                    shape=dataset.shape, offset=offset)
+        else:
+            self.values = dataset
+
+    def __len__(self):
+        return self.values.shape[0] if self.values.ndim == 2 else 1
+
+    def __getitem__(self, index):
+        """Flat unconstrained values of the model with the given index."""
+        if self.values.ndim == 1:
+            if index not in (0, None):
+                raise IndexError('The snapshot file stores a single model.')
+            return self.values[...]
+        return self.values[index]
+
+    def assign(self, target, index=None, session=None):
+        """
+        Assigns values of the model with the given index to the target.
+        """
+        structure = fingerprint(target)
+        if _digest(json.dumps(structure)) != self.digest:
+            _check_fingerprint(self.fingerprint, structure)
+        assign_snapshot(target, self[index], session=session)
+
+    def close(self):
+        self.values = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+# Assign operations of compiled objects, keyed by the object.
+_assign_operations = weakref.WeakKeyDictionary()
+
+
+def _assign_operation(target, params, sizes):
+    tensors = tuple(param.unconstrained_tensor for param in params)
+    cached = _assign_operations.get(target)
+    if cached is not None and cached[0] == tensors:
+        return cached[1:]
+    with tensors[0].graph.as_default(), tf.name_scope('assign_snapshot'):
+        placeholder = tf.placeholder(settings.float_type, shape=[sum(sizes)])
+        assigns = []
+        for param, piece in zip(params, tf.split(placeholder, sizes)):
+            value = tf.reshape(tf.cast(piece, param.dtype), param.shape)
+            assigns.append(tf.assign(param.unconstrained_tensor, value,
+                                     validate_shape=param.fixed_shape))
+        assign_op = tf.group(*assigns)
+    _assign_operations[target] = (tensors, placeholder, assign_op)
+    return placeholder, assign_op
+
+
+def _parameters(target):
+    if not isinstance(target, Parameterized):
+        raise ValueError('Snapshots can be taken of Parameterized objects only.')
+    return target.parameters
+
+
+def _is_compiled(params):
+    return bool(params) and all(param.unconstrained_tensor is not None for param in params)
+
+
+def _digest(encoded_fingerprint):
+    return hashlib.sha1(encoded_fingerprint.encode('utf-8')).hexdigest()
+
+
+def _check_fingerprint(expected, actual):
+    expected = [(name, tuple(shape), dtype, transform) for name, shape, dtype, transform in expected]
+    actual = [(name, tuple(shape), dtype, transform) for name, shape, dtype, transform in actual]
+    if expected == actual:
+        return
+    expected_dict, actual_dict = dict((e[0], e[1:]) for e in expected), dict((a[0], a[1:]) for a in actual)
+    for name in sorted(set(expected_dict) | set(actual_dict)):
+        if expected_dict.get(name) != actual_dict.get(name):
+            raise ValueError('Snapshot structure mismatch at parameter "{}": {} != {}.'
+                             .format(name, expected_dict.get(name), actual_dict.get(name)))
+    raise ValueError('Snapshot structure mismatch: parameters are in different order.')
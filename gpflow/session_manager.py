@@ -13,12 +13,16 @@
 # limitations under the License.
 
 import os
+import queue
+import threading
 import warnings
 
+import numpy as np
 import tensorflow as tf
 from tensorflow.python.client import timeline
 
 from . import settings
+from .profiler import CostProfiler
 
 
 logger = settings.logger()
@@ -29,23 +33,52 @@ class _DefaultSessionKeeper:
 
 
 class TracerSession(tf.Session):
+    """
+    Session which traces runs and dumps Chrome timelines of them.
+
+    Tracing can be restricted to every `trace_every`-th run and, of those, to
+    a random fraction `trace_fraction`, so that untraced runs have no overhead.
+    With `async_trace_writing` the traces are serialised and written on a
+    background thread off the hot path; `flush` waits for pending writes.
+    Aggregate statistics of all traced runs are kept in `statistics`, a
+    `profiler.CostProfiler`.
+    """
+
     def __init__(self, output_file_name=None, output_directory=None,
-                 each_time=None, **kwargs):
+                 each_time=None, trace_every=None, trace_fraction=None,
+                 async_trace_writing=None, **kwargs):
         self.output_file_name = output_file_name
         self.output_directory = output_directory
         self.each_time = each_time
+        self.trace_every = 1 if trace_every is None else trace_every
+        self.trace_fraction = 1. if trace_fraction is None else trace_fraction
+        self.async_trace_writing = bool(async_trace_writing)
         self.local_run_metadata = None
+        if self.trace_every < 1:
+            raise ValueError('The trace_every parameter must be greater zero.')
+        if not 0. <= self.trace_fraction <= 1.:
+            raise ValueError('The trace_fraction parameter must be in [0, 1] interval.')
         if self.each_time:
             logger.warn("Outputting a trace for each run. May result in large disk usage.")
 
         super(TracerSession, self).__init__(**kwargs)
         self.counter = 0
+        self.num_runs = 0
+        self.num_traced_runs = 0
+        self.statistics = CostProfiler()
         self.profiler_options = tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE)
+        self._random_state = np.random.RandomState()
+        self._trace_queue = None
+        self._trace_writer = None
         if self.output_directory is not None:
             if os.path.isfile(self.output_directory):
                 raise IOError("In tracer: given directory name is a file.")
             if not os.path.isdir(self.output_directory):
                 os.mkdir(self.output_directory)
+        if self.async_trace_writing:
+            self._trace_queue = queue.Queue()
+            self._trace_writer = threading.Thread(target=self._write_traces, daemon=True)
+            self._trace_writer.start()
 
     def _trace_filename(self):
         """
@@ -61,7 +94,20 @@ class TracerSession(tf.Session):
             filename = '{0}.json'.format(self.output_file_name)
         return os.path.join(dir_stub, filename)
 
+    def _sample_trace(self):
+        """
+        Decides whether the current run is traced.
+        """
+        if (self.num_runs - 1) % self.trace_every != 0:
+            return False
+        return self.trace_fraction >= 1. or self._random_state.rand() < self.trace_fraction
+
     def run(self, fetches, feed_dict=None, options=None, run_metadata=None):
+        self.num_runs += 1
+        if not self._sample_trace():
+            return super(TracerSession, self).run(
+                fetches, feed_dict=feed_dict, options=options, run_metadata=run_metadata)
+
         # Make sure there is no disagreement doing this.
         if options is not None:
             if options.trace_level != self.profiler_options.trace_level:  # pragma: no cover
@@ -75,17 +121,53 @@ class TracerSession(tf.Session):
             fetches, feed_dict=feed_dict,
             options=self.profiler_options,
             run_metadata=self.local_run_metadata)
+        self.num_traced_runs += 1
 
-        trace_time = timeline.Timeline(self.local_run_metadata.step_stats)
-        ctf = trace_time.generate_chrome_trace_format()
-        with open(self._trace_filename(), 'w') as trace_file:
-            trace_file.write(ctf)
+        trace = (self._trace_filename(), self.local_run_metadata.step_stats)
+        if self._trace_queue is not None:
+            self._trace_queue.put(trace)
+        else:
+            self._write_trace(*trace)
 
         if self.each_time:
             self.counter += 1
 
         return output
 
+    def flush(self):
+        """
+        Waits until all pending traces are written.
+        """
+        if self._trace_queue is not None:
+            self._trace_queue.join()
+
+    def close(self):
+        if self._trace_writer is not None:
+            self.flush()
+            self._trace_queue.put(None)
+            self._trace_writer.join()
+            self._trace_queue = self._trace_writer = None
+        super(TracerSession, self).close()
+
+    def _write_trace(self, filename, step_stats):
+        self.statistics.add_step_stats(step_stats)
+        trace_time = timeline.Timeline(step_stats)
+        ctf = trace_time.generate_chrome_trace_format()
+        with open(filename, 'w') as trace_file:
+            trace_file.write(ctf)
+
+    def _write_traces(self):
+        while True:
+            trace = self._trace_queue.get()
+            try:
+                if trace is None:
+                    return
+                self._write_trace(*trace)
+            except Exception as error:  # pylint: disable=W0703
+                logger.warning('Writing trace "{}" failed: {}'.format(trace[0], error))
+            finally:
+                self._trace_queue.task_done()
+
 
 def reset_default_session(*args, **kwargs):
     _DefaultSessionKeeper.session = get_session(*args, **kwargs)
@@ -120,8 +202,14 @@ def get_session(*args, **kwargs):
         fill_kwargs('output_file_name', settings.profiling.output_file_name)
         fill_kwargs('output_directory', settings.profiling.output_directory)
         fill_kwargs('each_time', settings.profiling.each_time)
+        fill_kwargs('trace_every', settings.profiling.trace_every)
+        fill_kwargs('trace_fraction', settings.profiling.trace_fraction)
+        fill_kwargs('async_trace_writing', settings.profiling.async_trace_writing)
         return TracerSession(*args, **kwargs)
     kwargs.pop("output_file_name", None)
     kwargs.pop("output_directory", None)
     kwargs.pop("each_time", None)
+    kwargs.pop("trace_every", None)
+    kwargs.pop("trace_fraction", None)
+    kwargs.pop("async_trace_writing", None)
     return tf.Session(*args, **kwargs)
@@ -1,9 +1,16 @@
 # pylint: disable=wildcard-import
 
 from .scipy_optimizer import ScipyOptimizer
+from .ingraph_optimizer import InGraphOptimizer
 from .hmc import HMC
+from .trace_store import HDF5TraceStore
+from .nuts import NUTS
+from .elliptical_slice import EllipticalSliceSampler
+from .sgmcmc import SGLD, SGHMC
+from .multistart import MultiStartOptimizer
 from .natgrad_optimizer import XiTransform
 from .natgrad_optimizer import XiNat
 from .natgrad_optimizer import XiSqrtMeanVar
 from .natgrad_optimizer import NatGradOptimizer
+from .cvi_optimizer import CVIOptimizer
 from .tensorflow_optimizer import *
@@ -0,0 +1,164 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tensorflow as tf
+
+from . import optimizer
+from .. import settings
+from ..actions import Optimization
+from ..decors import params_as_tensors_for
+from ..models import Model, VGP_CVI
+
+
+class CVIOptimizer(optimizer.Optimizer):
+    """
+    Conjugate-computation variational inference for `VGP_CVI` models. Every step
+    computes gradients of `likelihood.variational_expectations` w.r.t. the marginal
+    means `m` and variances `v` of q(f) and moves the sites towards
+
+        λ₁ = ∂E/∂m - 2 (∂E/∂v) m,  λ₂ = -2 ∂E/∂v,
+
+        λ <- (1 - rho) λ + rho λ_target,
+
+    which is a natural gradient step of the evidence lower bound w.r.t. the
+    site parameters. For Gaussian likelihood a single step with `rho=1` gives
+    the exact posterior, for log-concave likelihoods tens of steps are usually
+    enough. Site precisions of likelihoods which are not log-concave can become
+    negative, they are clipped at `min_precision` above the lower bound of the
+    transform of site precisions.
+
+        :param rho: Step length in (0, 1].
+        :param min_precision: Margin of site precisions above the lower bound of
+            their transform.
+    """
+
+    def __init__(self, rho=1.0, min_precision=1e-8, **kwargs):
+        super().__init__(**kwargs)
+        if not 0. < rho <= 1.:
+            raise ValueError('The rho parameter must be in (0, 1] interval.')
+        if min_precision <= 0.:
+            raise ValueError('The min_precision parameter must be greater zero.')
+        self.name = self.__class__.__name__
+        self._rho = rho
+        self._min_precision = min_precision
+        self._cvi_op = None
+        self._model = None
+
+    @property
+    def rho(self):
+        return self._rho
+
+    @property
+    def model(self):
+        return self._model
+
+    @property
+    def minimize_operation(self):
+        return self._cvi_op
+
+    def minimize(self, model, session=None, var_list=None, feed_dict=None,
+                 maxiter=20, anchor=True, step_callback=None, **kwargs):
+        """
+        Updates sites of the model. Hyperparameters are not changed.
+
+            :param model: `VGP_CVI` model.
+            :param session: Tensorflow session where optimization will be run.
+            :param var_list: Not used, sites of the model are always updated.
+            :param feed_dict: Feed dictionary of tensors passed to session run method.
+            :param maxiter: Number of site updates.
+            :param anchor: Synchronize updated parameters for a session with internal
+                parameter's values.
+            :param step_callback: A callback function to execute at each optimization step.
+                The callback should accept variable argument list, where first argument is
+                optimization step number.
+            :type step_callback: Callable[[], None]
+            :param kwargs: Extra parameters passed to session run's method.
+        """
+        if model is None or not isinstance(model, Model):
+            raise ValueError('Unknown type passed for optimization.')
+
+        self._model = model
+        session = model.enquire_session(session)
+        opt = self.make_optimize_action(model, session=session, var_list=var_list,
+                                        feed_dict=feed_dict, **kwargs)
+        with session.as_default():
+            for step in range(maxiter):
+                opt()
+                if step_callback is not None:
+                    step_callback(step)
+        if anchor:
+            model.anchor(session)
+
+    def make_optimize_tensor(self, model, session=None, var_list=None, **kwargs):
+        """
+        Make Tensorflow operation, which performs single update of the sites.
+
+            :param model: `VGP_CVI` model.
+            :param session: Tensorflow session.
+            :param var_list: Not used.
+            :return: Tensorflow operation.
+        """
+        if not isinstance(model, VGP_CVI):
+            raise ValueError('CVI optimizer works with VGP_CVI models only.')
+        session = model.enquire_session(session)
+        with session.as_default(), tf.name_scope(self.name):
+            self._cvi_op = self._build_cvi_step(model)
+            return self._cvi_op
+
+    def make_optimize_action(self, model, session=None, var_list=None, **kwargs):
+        """
+        Builds optimization action.
+
+            :param model: `VGP_CVI` model.
+            :param session: Tensorflow session where optimization will be run.
+            :param var_list: Not used.
+            :param kwargs: Extra parameters passed to session's run method.
+            :return: Optimization action.
+        """
+        if model is None or not isinstance(model, Model):
+            raise ValueError('Unknown type passed for optimization.')
+        feed_dict = kwargs.pop('feed_dict', None)
+        feed_dict_update = self._gen_feed_dict(model, feed_dict)
+        run_kwargs = {} if feed_dict_update is None else {'feed_dict': feed_dict_update}
+        optimizer_tensor = self.make_optimize_tensor(model, session=session)
+        opt = Optimization()
+        opt.with_optimizer(self)
+        opt.with_model(model)
+        opt.with_optimizer_tensor(optimizer_tensor)
+        opt.with_run_kwargs(**run_kwargs)
+        return opt
+
+    def _build_cvi_step(self, model):
+        f_mean, f_var = model.build_marginals()
+        with params_as_tensors_for(model):
+            Y = model.Y
+            nat1 = model.site_nat1
+            precision = model.site_precision
+        v_exp = tf.reduce_sum(model.likelihood.variational_expectations(f_mean, f_var, Y))
+        dE_dmean, dE_dvar = tf.gradients(v_exp, [f_mean, f_var])
+
+        nat1_target = dE_dmean - 2. * dE_dvar * f_mean
+        precision_target = -2. * dE_dvar
+        nat1_new = (1. - self.rho) * nat1 + self.rho * nat1_target
+        precision_new = (1. - self.rho) * precision + self.rho * precision_target
+        # Values at or below the lower bound of the transform have no unconstrained value.
+        lower = getattr(model.site_precision.transform, '_lower', 0.)
+        min_precision = tf.constant(lower + self._min_precision, dtype=settings.float_type)
+        precision_new = tf.maximum(precision_new, min_precision)
+
+        nat1_assign = tf.assign(model.site_nat1.unconstrained_tensor,
+                                model.site_nat1.transform.backward_tensor(nat1_new))
+        precision_assign = tf.assign(model.site_precision.unconstrained_tensor,
+                                     model.site_precision.transform.backward_tensor(precision_new))
+        return tf.group(nat1_assign, precision_assign)
@@ -0,0 +1,232 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from .hmc import _chains_transition, _split_columns, _while_loop
+from .optimizer import Optimizer
+from .tensor_substitution import pack_tensors, unpack_tensor, substitute_parameters
+from .. import priors, transforms
+from ..decors import name_scope
+
+
+class EllipticalSliceSampler(Optimizer):
+    """
+    Elliptical slice sampler of Murray, Adams and MacKay (2010) for whitened latent
+    variables with standard normal prior, such as `V` of `GPMC` and `SGPMC` models.
+    Every update proposes points on the ellipse through the current state and an
+    auxiliary draw from the prior, and shrinks the bracket of angles until the
+    proposal is accepted. It requires neither gradients nor step size tuning.
+
+    Remaining trainable parameters, e.g. kernel hyperparameters, are either kept
+    fixed or updated by a HMC transition after each elliptical slice update, which
+    makes a Gibbs sampler of the joint posterior. Both updates run in one graph.
+
+        :param max_shrinks: Maximum number of bracket shrinks per update. When it
+            is exceeded, the latent variables keep their previous values.
+    """
+
+    def __init__(self, max_shrinks=100):
+        if max_shrinks <= 0:
+            raise ValueError('The max_shrinks parameter must be greater zero.')
+        self.max_shrinks = max_shrinks
+
+    def sample(self, model, num_samples, latent=None, thin=1, burn=0,
+               epsilon=None, lmin=1, lmax=1,
+               session=None, initialize=True, anchor=True, logprobs=True):
+        """
+        Samples latent variables and, when `epsilon` is given, the remaining
+        trainable parameters of the model.
+
+        The total number of iterations is given by:
+
+            burn + thin * num_samples
+
+        :param model: gpflow model with `build_objective` method implementation.
+        :param num_samples: number of samples to generate.
+        :param latent: trainable parameter with standard normal prior and without
+            transform. By default it is `model.V`.
+        :param thin: an integer which specifies the thinning interval.
+        :param burn: an integer which specifies how many initial samples to discard.
+        :param epsilon: HMC step size for the remaining trainable parameters.
+            When it is `None` they are not sampled.
+        :param lmin: HMC tuning parameter - lowest integer `a` of uniform `[a, b]` distribution
+            used for drawing number of leapfrog iterations.
+        :param lmax: HMC tuning parameter - largest integer `b` from uniform `[a, b]` distribution
+            used for drawing number of leapfrog iterations.
+        :param session: TensorFlow session. The default session or cached GPflow session
+            will be used if it is none.
+        :param initialize: indication either TensorFlow initialization is required or not.
+        :param anchor: assign the last sample to trainable parameters.
+        :param logprobs: indicates either logprob values shall be included in output or not.
+
+        :return: data frame with `num_samples` traces, where columns are full names of
+            sampled parameters except last column, which is `logprobs`.
+            Parameters are represented as constrained values in output.
+
+        :raises: ValueError exception in case when wrong parameter ranges were passed
+            or latent parameter does not have standard normal prior.
+        """
+        if num_samples <= 0:
+            raise ValueError('The num_samples parameter must be greater zero.')
+        if thin <= 0:
+            raise ValueError('The thin parameter must be greater zero.')
+        if burn < 0:
+            raise ValueError('The burn parameter must be equal or greater zero.')
+        if lmax <= 0 or lmin <= 0:
+            raise ValueError('The lmin and lmax parameters must be greater zero.')
+
+        latent = model.V if latent is None else latent
+        _check_latent(latent)
+        others = [p for p in model.trainable_parameters if p is not latent]
+        if epsilon is None:
+            others = []
+
+        lmax += 1
+        session = model.enquire_session(session)
+        model.initialize(session=session, force=initialize)
+
+        with tf.name_scope('elliptical_slice'):
+            params = [latent] + others
+            variables = [p.unconstrained_tensor for p in params]
+
+            def log_joint(v, h):
+                tensors = [v] + (unpack_tensor(h, others) if others else [])
+                with substitute_parameters(params, tensors):
+                    return tf.negative(tf.reshape(model.build_objective(), []))
+
+            v = tf.identity(variables[0])
+            h = pack_tensors(variables[1:]) if others else tf.zeros([0], dtype=v.dtype)
+
+            def step(v, h, logprob):
+                v, logprob = self._slice_update(log_joint, v, h, logprob)
+                if not others:
+                    return v, h, logprob
+
+                def logprob_grads(hs):
+                    logprob = log_joint(v, hs[0])
+                    return logprob[None], tf.gradients(logprob, hs)[0]
+
+                hs = h[None, :]
+                hmc_state = [hs] + list(logprob_grads(hs))
+                hs, logprob, _grads = _chains_transition(hmc_state, logprob_grads,
+                                                         epsilon, lmin, lmax)
+                return v, hs[0], logprob[0]
+
+            def iterate(num_steps, v, h, logprob):
+                def cond(i, *_state):
+                    return i < num_steps
+
+                def body(i, v, h, logprob):
+                    return (i + 1,) + step(v, h, logprob)
+
+                return _while_loop(cond, body, [0, v, h, logprob])[1:]
+
+            state = (v, h, log_joint(v, h))
+            if burn > 0:
+                state = iterate(burn, *state)
+
+            v_array = tf.TensorArray(v.dtype, size=num_samples)
+            h_array = tf.TensorArray(h.dtype, size=num_samples)
+            logprob_array = tf.TensorArray(state[2].dtype, size=num_samples)
+
+            def cond(i, *_args):
+                return i < num_samples
+
+            def body(i, v_ta, h_ta, logprob_ta, v, h, logprob):
+                v, h, logprob = iterate(thin, v, h, logprob)
+                return (i + 1, v_ta.write(i, v), h_ta.write(i, h),
+                        logprob_ta.write(i, logprob), v, h, logprob)
+
+            loop_vars = [0, v_array, h_array, logprob_array] + list(state)
+            result = _while_loop(cond, body, loop_vars)
+            v_trace, h_trace, logprob_trace = [ta.stack() for ta in result[1:4]]
+            v_last, h_last = result[4:6]
+
+            unconstrained_trace = [v_trace]
+            if others:
+                unconstrained_trace += [tf.reshape(t, [-1] + p.unconstrained_tensor.shape.as_list())
+                                        for t, p in zip(_split_columns(h_trace, others), others)]
+            constrained_trace = [p.transform.forward_tensor(t)
+                                 for t, p in zip(unconstrained_trace, params)]
+            if anchor:
+                last = [v_last] + (unpack_tensor(h_last, others) if others else [])
+                assigns = [tf.assign(var, value) for var, value in zip(variables, last)]
+                with tf.control_dependencies(assigns):
+                    logprob_trace = tf.identity(logprob_trace)
+            output = constrained_trace + [logprob_trace]
+
+        raw_traces = session.run(output, feed_dict=model.feeds)
+
+        if anchor:
+            model.anchor(session)
+
+        names = [p.pathname for p in params]
+        traces = dict(zip(names, map(list, raw_traces[:-1])))
+        if logprobs:
+            traces.update({'logprobs': raw_traces[-1]})
+        return pd.DataFrame(traces)
+
+    def make_optimize_tensor(self, model, session=None, var_list=None, **kwargs):
+        raise NotImplementedError('Elliptical slice sampler does not provide '
+                                  'make_optimize_tensor method')
+
+    def minimize(self, model, **kwargs):
+        raise NotImplementedError('Elliptical slice sampler does not provide minimize '
+                                  'method, use `sample` instead.')
+
+    @name_scope('slice_update')
+    def _slice_update(self, log_joint, v, h, logprob):
+        """
+        One elliptical slice update of latent variables `v`. Log-likelihood is the
+        log joint without the standard normal prior of `v`.
+        """
+        def loglik(v_value, logprob_value):
+            return logprob_value + 0.5 * tf.reduce_sum(tf.square(v_value))
+
+        dtype = v.dtype
+        two_pi = tf.constant(2 * np.pi, dtype=dtype)
+        nu = tf.random_normal(tf.shape(v), dtype=dtype)
+        logy = loglik(v, logprob) + tf.log(tf.random_uniform([], dtype=dtype))
+        theta = tf.random_uniform([], maxval=two_pi, dtype=dtype)
+
+        def cond(i, accepted, *_args):
+            return tf.logical_and(tf.logical_not(accepted), i < self.max_shrinks)
+
+        def body(i, _accepted, theta, lower, upper, _v, _logprob):
+            v_new = v * tf.cos(theta) + nu * tf.sin(theta)
+            logprob_new = log_joint(v_new, h)
+            accepted = loglik(v_new, logprob_new) > logy
+            lower = tf.where(theta < 0., theta, lower)
+            upper = tf.where(theta < 0., upper, theta)
+            theta_new = tf.random_uniform([], minval=lower, maxval=upper, dtype=dtype)
+            theta = tf.where(accepted, theta, theta_new)
+            return i + 1, accepted, theta, lower, upper, v_new, logprob_new
+
+        loop_vars = [0, False, theta, theta - two_pi, theta, v, logprob]
+        _i, accepted, _theta, _lower, _upper, v_new, logprob_new = _while_loop(cond, body, loop_vars)
+        return tf.where(accepted, v_new, v), tf.where(accepted, logprob_new, logprob)
+
+
+def _check_latent(latent):
+    prior = latent.prior
+    standard = (isinstance(prior, priors.Gaussian) and
+                np.all(prior.mu == 0.) and np.all(prior.var == 1.))
+    if not standard or not isinstance(latent.transform, transforms.Identity):
+        raise ValueError('Latent parameter "{}" must have standard normal prior and '
+                         'identity transform.'.format(latent.pathname))
+    if not latent.trainable:
+        raise ValueError('Latent parameter "{}" must be trainable.'.format(latent.pathname))
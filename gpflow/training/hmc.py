@@ -18,6 +18,8 @@ import numpy as np
 import pandas as pd
 
 from .optimizer import Optimizer
+from .trace_store import HDF5TraceStore
+from .tensor_substitution import pack_tensors, unpack_tensor, substitute_parameters
 from ..decors import name_scope
 
 class HMC(Optimizer):
@@ -82,34 +84,199 @@ class HMC(Optimizer):
 
         with tf.name_scope('hmc'):
             params = list(model.trainable_parameters)
-            xs = list(model.trainable_tensors)
+            thin_args = _thin_args(model, thin, epsilon, lmin, lmax)
 
-            def logprob_grads():
-                logprob = tf.negative(model.build_objective())
-                grads = tf.gradients(logprob, xs)
-                return logprob, grads
+            if burn > 0:
+                burn_op = _burning(burn, *thin_args)
+                session.run(burn_op, feed_dict=model.feeds)
+
+            hmc_output = _sampling(model, params, num_samples, thin_args)
+
+        raw_traces = session.run(hmc_output, feed_dict=model.feeds)
+
+        if anchor:
+            model.anchor(session)
+
+        return _traces_frame(params, raw_traces, logprobs)
+
+    def sample_stream(self, model, num_samples, epsilon,
+                      lmin=1, lmax=1, thin=1, burn=0, chunk_size=100,
+                      callback=None, store=None, resume=False,
+                      session=None, initialize=True, anchor=True,
+                      logprobs=True):
+        """
+        Streaming version of `sample` method. Samples are generated in chunks of
+        `chunk_size` samples, each chunk is passed to the `callback` and appended
+        to the `store` as soon as it is computed, so that only one chunk is kept
+        in memory. The chain state is kept in model's variables between chunks.
+
+        Arguments which are not listed below have the same meaning as in `sample`.
+
+        :param chunk_size: number of samples generated by one session run.
+        :param callback: function called with every chunk as a data frame, formatted
+            as `sample` output, and the index of the first sample in the chunk.
+        :type callback: Callable[[pd.DataFrame, int], None]
+        :param store: `HDF5TraceStore` or a path to the HDF5 file where traces are
+            appended.
+        :param resume: when `True` and the store is not empty, the chain continues
+            from the last sample in the store instead of the current values of
+            trainable parameters.
+
+        :return: total number of samples in the store, or number of generated
+            samples if there is no store.
+
+        :raises: ValueError exception in case when wrong parameter ranges were passed.
+        """
+
+        if lmax <= 0 or lmin <= 0:
+            raise ValueError('The lmin and lmax parameters must be greater zero.')
+        if thin <= 0:
+            raise ValueError('The thin parameter must be greater zero.')
+        if burn < 0:
+            raise ValueError('The burn parameter must be equal or greater zero.')
+        if chunk_size <= 0:
+            raise ValueError('The chunk_size parameter must be greater zero.')
+        if callback is None and store is None:
+            raise ValueError('Either callback or store must be provided.')
+
+        lmax += 1
+        session = model.enquire_session(session)
+        params = list(model.trainable_parameters)
 
-            thin_args = [logprob_grads, xs, thin, epsilon, lmin, lmax]
+        if store is not None and not isinstance(store, HDF5TraceStore):
+            store = HDF5TraceStore(store)
+        offset = 0
+        if store is not None:
+            offset = len(store)
+            if resume and offset > 0:
+                model.assign(store.last_sample(), session=session)
+
+        model.initialize(session=session, force=initialize)
+
+        with tf.name_scope('hmc'):
+            thin_args = _thin_args(model, thin, epsilon, lmin, lmax)
 
             if burn > 0:
                 burn_op = _burning(burn, *thin_args)
                 session.run(burn_op, feed_dict=model.feeds)
 
-            xs_dtypes = _map(lambda x: x.dtype, xs)
-            logprob_dtype = model.objective.dtype
-            dtypes = _flat(xs_dtypes, [logprob_dtype])
-            indices = np.arange(num_samples)
+            chunk_ops = {}
+            for start in range(0, num_samples, chunk_size):
+                size = min(chunk_size, num_samples - start)
+                if size not in chunk_ops:
+                    chunk_ops[size] = _sampling(model, params, size, thin_args)
+                raw_traces = session.run(chunk_ops[size], feed_dict=model.feeds)
+                chunk = _traces_frame(params, raw_traces, logprobs)
+                if store is not None:
+                    store.append(chunk)
+                if callback is not None:
+                    callback(chunk, offset + start)
+
+        if anchor:
+            model.anchor(session)
+
+        return offset + num_samples
+
+    def sample_chains(self, model, num_samples, num_chains, epsilon,
+                      lmin=1, lmax=1, thin=1, burn=0, init_scale=None,
+                      session=None, initialize=True, anchor=True,
+                      logprobs=True):
+        """
+        Runs `num_chains` HMC chains at once. The chains share one graph: the
+        state of all chains is a matrix with chains along the leading dimension
+        and flattened unconstrained parameters along the second one. Objective
+        and gradients are evaluated for all chains in parallel, the leapfrog
+        integration and accept/reject step are vectorized over chains. Each chain
+        draws its own number of leapfrog steps.
+
+        All chains start from the current values of trainable parameters, which
+        are perturbed with Gaussian noise of standard deviation `init_scale` in
+        the unconstrained space. Chains started from the same state make the
+        convergence diagnostics meaningless, therefore a positive `init_scale` is
+        required for more than one chain.
+
+        :param model: gpflow model with `build_objective` method implementation.
+        :param num_samples: number of samples to generate per chain.
+        :param num_chains: number of chains.
+        :param epsilon: HMC tuning parameter - stepsize.
+        :param lmin: HMC tuning parameter - lowest integer `a` of uniform `[a, b]` distribution
+            used for drawing number of leapfrog iterations.
+        :param lmax: HMC tuning parameter - largest integer `b` from uniform `[a, b]` distribution
+            used for drawing number of leapfrog iterations.
+        :param thin: an integer which specifies the thinning interval.
+        :param burn: an integer which specifies how many initial samples to discard.
+        :param init_scale: standard deviation of the noise added to the initial state
+            of each chain in the unconstrained space, required when `num_chains`
+            is greater than one.
+        :param session: TensorFlow session. The default session or cached GPflow session
+            will be used if it is none.
+        :param initialize: indication either TensorFlow initialization is required or not.
+        :param anchor: assign the last state of the first chain to trainable variables
+            and dump it to actual parameters (in python scope).
+        :param logprobs: indicates either logprob values shall be included in output or not.
+
+        :return: tuple of two data frames. The first one contains `num_chains * num_samples`
+            traces ordered by chain, with columns named as in `sample` output and an
+            additional `chain` column. The second one is indexed by full names of
+            trainable parameters and has columns `rhat` and `ess` with split potential
+            scale reduction factor and effective sample size of constrained values.
+
+        :raises: ValueError exception in case when wrong parameter ranges were passed.
+        """
 
-            def map_body(_):
-                xs_sample, logprob_sample = _thinning(*thin_args)
-                return _flat(xs_sample, [logprob_sample])
+        if num_chains <= 0:
+            raise ValueError('The num_chains parameter must be greater zero.')
+        if lmax <= 0 or lmin <= 0:
+            raise ValueError('The lmin and lmax parameters must be greater zero.')
+        if thin <= 0:
+            raise ValueError('The thin parameter must be greater zero.')
+        if burn < 0:
+            raise ValueError('The burn parameter must be equal or greater zero.')
+        if init_scale is None:
+            if num_chains > 1:
+                raise ValueError('The init_scale parameter must be set for more than one chain.')
+            init_scale = 0.0
+        if init_scale < 0 or (num_chains > 1 and init_scale == 0):
+            raise ValueError('The init_scale parameter must be greater zero '
+                             'for more than one chain.')
+
+        lmax += 1
+        session = model.enquire_session(session)
+
+        model.initialize(session=session, force=initialize)
 
-            hmc_output = tf.map_fn(map_body, indices, dtype=dtypes,
-                                   back_prop=False, parallel_iterations=1)
-            with tf.control_dependencies(hmc_output):
-                unconstrained_trace, logprob_trace = hmc_output[:-1], hmc_output[-1]
-                constrained_trace = _map(lambda x, param: param.transform.forward_tensor(x),
+        with tf.name_scope('hmc_chains'):
+            params = list(model.trainable_parameters)
+            variables = [param.unconstrained_tensor for param in params]
+            x = pack_tensors(variables)
+            xs = tf.tile(x[None, :], [num_chains, 1])
+            xs += init_scale * tf.random_normal(tf.shape(xs), dtype=xs.dtype)
+
+            def logprob_grads(xs_batch):
+                return _chains_logprob_grads(model, params, xs_batch, num_chains)
+
+            thin_args = [logprob_grads, thin, epsilon, lmin, lmax]
+
+            logprob, grads = logprob_grads(xs)
+            state = [xs, logprob, grads]
+            if burn > 0:
+                state = _chains_burning(burn, state, *thin_args)
+
+            xs_trace, logprob_trace, state = _chains_sampling(num_samples, state, *thin_args)
+            xs_last = state[0]
+
+            with tf.control_dependencies([xs_trace, logprob_trace]):
+                flat_trace = tf.reshape(xs_trace, [num_samples * num_chains, -1])
+                unconstrained_trace = [tf.reshape(t, [-1] + v.shape.as_list())
+                                       for t, v in zip(_split_columns(flat_trace, params),
+                                                       variables)]
+                constrained_trace = _map(lambda t, param: param.transform.forward_tensor(t),
                                          unconstrained_trace, params)
+                if anchor:
+                    last = unpack_tensor(xs_last[0], params)
+                    assigns = _assign_variables(variables, last)
+                    with tf.control_dependencies(assigns):
+                        logprob_trace = tf.identity(logprob_trace)
                 hmc_output = constrained_trace + [logprob_trace]
 
         names = [param.pathname for param in params]
@@ -118,10 +285,18 @@ class HMC(Optimizer):
         if anchor:
             model.anchor(session)
 
-        traces = dict(zip(names, map(list, raw_traces[:-1])))
+        chain_major = lambda t: np.swapaxes(np.reshape(t, (num_samples, num_chains) + t.shape[1:]), 0, 1)
+        traces = [chain_major(t) for t in raw_traces[:-1]]
+
+        columns = {name: list(np.reshape(t, (-1,) + t.shape[2:])) for name, t in zip(names, traces)}
         if logprobs:
-            traces.update({'logprobs': raw_traces[-1]})
-        return pd.DataFrame(traces)
+            columns['logprobs'] = np.reshape(raw_traces[-1].T, -1)
+        columns['chain'] = np.repeat(np.arange(num_chains), num_samples)
+
+        diagnostics = {
+            'rhat': [potential_scale_reduction(np.swapaxes(t, 0, 1)) for t in traces],
+            'ess': [effective_sample_size(np.swapaxes(t, 0, 1)) for t in traces]}
+        return pd.DataFrame(columns), pd.DataFrame(diagnostics, index=names)
 
     def make_optimize_tensor(self, model, session=None, var_list=None, **kwargs):
         raise NotImplementedError('HMC does not provide make_optimize_tensor method')
@@ -130,6 +305,45 @@ class HMC(Optimizer):
         raise NotImplementedError('HMC does not provide minimize method, use `sample` instead.')
 
 
+def _thin_args(model, thin, epsilon, lmin, lmax):
+    xs = list(model.trainable_tensors)
+
+    def logprob_grads():
+        logprob = tf.negative(model.build_objective())
+        grads = tf.gradients(logprob, xs)
+        return logprob, grads
+
+    return [logprob_grads, xs, thin, epsilon, lmin, lmax]
+
+
+def _sampling(model, params, num_samples, thin_args):
+    xs = thin_args[1]
+    xs_dtypes = _map(lambda x: x.dtype, xs)
+    logprob_dtype = model.objective.dtype
+    dtypes = _flat(xs_dtypes, [logprob_dtype])
+    indices = np.arange(num_samples)
+
+    def map_body(_):
+        xs_sample, logprob_sample = _thinning(*thin_args)
+        return _flat(xs_sample, [logprob_sample])
+
+    hmc_output = tf.map_fn(map_body, indices, dtype=dtypes,
+                           back_prop=False, parallel_iterations=1)
+    with tf.control_dependencies(hmc_output):
+        unconstrained_trace, logprob_trace = hmc_output[:-1], hmc_output[-1]
+        constrained_trace = _map(lambda x, param: param.transform.forward_tensor(x),
+                                 unconstrained_trace, params)
+        return constrained_trace + [logprob_trace]
+
+
+def _traces_frame(params, raw_traces, logprobs):
+    names = [param.pathname for param in params]
+    traces = dict(zip(names, map(list, raw_traces[:-1])))
+    if logprobs:
+        traces.update({'logprobs': raw_traces[-1]})
+    return pd.DataFrame(traces)
+
+
 @name_scope("burning")
 def _burning(burn, logprob_grads_fn, xs, *thin_args):
     def cond(i, _xs, _logprob):
@@ -257,6 +471,164 @@ def _leapfrog_step(xs, ps, epsilon, max_iterations, logprob_grads_fn):
         return proceed_out, xs_out, ps_out, logprob_out, grads_out
 
 
+def potential_scale_reduction(samples):
+    """
+    Split potential scale reduction factor (R-hat) of Gelman and Rubin. Each chain
+    is split into two halves, values close to one indicate convergence.
+
+    :param samples: array of shape `[num_samples, num_chains, ...]`.
+    :return: array of the trailing shape of `samples`.
+    """
+    samples = _split_chains(np.asarray(samples, dtype=np.float64))
+    n = samples.shape[0]
+    within = np.mean(np.var(samples, axis=0, ddof=1), axis=0)
+    between = n * np.var(np.mean(samples, axis=0), axis=0, ddof=1)
+    var_plus = (n - 1) / n * within + between / n
+    return np.sqrt(var_plus / within)
+
+
+def effective_sample_size(samples):
+    """
+    Effective sample size of multiple chains, estimated from the chains' mean
+    autocorrelation truncated by Geyer's initial monotone sequence criterion.
+
+    :param samples: array of shape `[num_samples, num_chains, ...]`.
+    :return: array of the trailing shape of `samples`.
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    n, m = samples.shape[:2]
+    flat = np.reshape(samples, (n, m, -1))
+    ess = np.array([_effective_sample_size(flat[:, :, i]) for i in range(flat.shape[-1])])
+    return np.reshape(ess, samples.shape[2:])
+
+
+def _effective_sample_size(chains):
+    n, m = chains.shape
+    centred = chains - chains.mean(axis=0)
+    size = 2 ** int(np.ceil(np.log2(2 * n)))
+    spectrum = np.fft.rfft(centred, n=size, axis=0)
+    acov = np.fft.irfft(spectrum * np.conj(spectrum), n=size, axis=0)[:n] / n
+    within = np.mean(acov[0] * n / (n - 1))
+    var_plus = within * (n - 1) / n
+    if m > 1:
+        var_plus += np.var(chains.mean(axis=0), ddof=1)
+    if var_plus <= 0.:
+        return float(n * m)
+    rho = 1. - (within - np.mean(acov, axis=1)) / var_plus
+    rho[0] = 1.
+    pairs = rho[:n - n % 2].reshape(-1, 2).sum(axis=1)
+    positive = np.where(pairs <= 0.)[0]
+    pairs = pairs[:positive[0]] if positive.size else pairs
+    pairs = np.minimum.accumulate(pairs)
+    tau = max(-1. + 2. * np.sum(pairs), 1. / np.log10(n * m))
+    return n * m / tau
+
+
+def _split_chains(samples):
+    half = samples.shape[0] // 2
+    return np.concatenate([samples[:half], samples[-half:]], axis=1)
+
+
+def _chains_logprob_grads(model, params, xs, num_chains):
+    def chain_logprob_grads(x):
+        with substitute_parameters(params, unpack_tensor(x, params)):
+            logprob = tf.negative(tf.reshape(model.build_objective(), []))
+        grad = tf.gradients(logprob, x)[0]
+        return logprob, grad
+
+    dtypes = (model.objective.dtype, xs.dtype)
+    return tf.map_fn(chain_logprob_grads, xs, dtype=dtypes,
+                     parallel_iterations=num_chains, back_prop=False)
+
+
+@name_scope("burning")
+def _chains_burning(burn, state, *thin_args):
+    def cond(i, *_state):
+        return i < burn
+
+    def body(i, *state):
+        return [i + 1] + _chains_thinning(list(state), *thin_args)
+
+    return _while_loop(cond, body, [0] + state)[1:]
+
+
+@name_scope("sampling")
+def _chains_sampling(num_samples, state, *thin_args):
+    xs, logprob, _grads = state
+    xs_array = tf.TensorArray(xs.dtype, size=num_samples)
+    logprob_array = tf.TensorArray(logprob.dtype, size=num_samples)
+
+    def cond(i, *_args):
+        return i < num_samples
+
+    def body(i, xs_ta, logprob_ta, *state):
+        state = _chains_thinning(list(state), *thin_args)
+        xs_ta = xs_ta.write(i, state[0])
+        logprob_ta = logprob_ta.write(i, state[1])
+        return [i + 1, xs_ta, logprob_ta] + state
+
+    result = _while_loop(cond, body, [0, xs_array, logprob_array] + state)
+    return result[1].stack(), result[2].stack(), result[3:]
+
+
+@name_scope("thinning")
+def _chains_thinning(state, logprob_grads_fn, thin, epsilon, lmin, lmax):
+    def cond(i, *_state):
+        return i < thin
+
+    def body(i, *state):
+        return [i + 1] + _chains_transition(list(state), logprob_grads_fn, epsilon, lmin, lmax)
+
+    return _while_loop(cond, body, [0] + state)[1:]
+
+
+@name_scope("transition")
+def _chains_transition(state, logprob_grads_fn, epsilon, lmin, lmax):
+    xs_prev, logprob_prev, grads_prev = state
+    num_chains = tf.shape(xs_prev)[0]
+    ps_init = tf.random_normal(tf.shape(xs_prev), dtype=xs_prev.dtype)
+    num_steps = tf.random_uniform([num_chains], minval=lmin, maxval=lmax, dtype=tf.int32)
+    epsilon = tf.cast(epsilon, xs_prev.dtype)
+
+    def cond(i, _alive, _xs, _ps, _logprob, _grads):
+        return i < tf.reduce_max(num_steps)
+
+    def body(i, alive, xs, ps, logprob, grads):
+        active = tf.logical_and(alive, i < num_steps)
+        mask = tf.cast(active, xs.dtype)[:, None]
+        xs_new = xs + mask * epsilon * ps
+        logprob_new, grads_new = logprob_grads_fn(xs_new)
+        finite = tf.logical_and(tf.is_finite(logprob_new),
+                                tf.reduce_all(tf.is_finite(grads_new), axis=1))
+        alive_new = tf.logical_and(alive, tf.logical_or(finite, tf.logical_not(active)))
+        update = tf.logical_and(active, finite)
+        ps_new = ps + tf.cast(update, xs.dtype)[:, None] * epsilon * grads_new
+        logprob_new = tf.where(update, logprob_new, logprob)
+        grads_new = tf.where(update, grads_new, grads)
+        return i + 1, alive_new, xs_new, ps_new, logprob_new, grads_new
+
+    ps = ps_init + 0.5 * epsilon * grads_prev
+    alive = tf.ones([num_chains], dtype=tf.bool)
+    loop_vars = [0, alive, xs_prev, ps, logprob_prev, grads_prev]
+    _i, alive, xs, ps, logprob, grads = _while_loop(cond, body, loop_vars)
+    ps = ps - 0.5 * epsilon * grads
+
+    def energy(p):
+        return 0.5 * tf.reduce_sum(tf.square(p), axis=1)
+
+    log_accept_ratio = logprob - energy(ps) - logprob_prev + energy(ps_init)
+    logu = tf.log(tf.random_uniform(tf.shape(log_accept_ratio), dtype=logprob.dtype))
+    accept = tf.logical_and(alive, logu < log_accept_ratio)
+    return [tf.where(accept, xs, xs_prev),
+            tf.where(accept, logprob, logprob_prev),
+            tf.where(accept, grads, grads_prev)]
+
+
+def _split_columns(flat, params):
+    sizes = [int(np.prod(p.unconstrained_tensor.shape.as_list())) for p in params]
+    return tf.split(flat, sizes, axis=1)
+
+
 def _assign_variables(variables, values):
     return _map(lambda var, value: var.assign(value), variables, values)
 
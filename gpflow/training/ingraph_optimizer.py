@@ -0,0 +1,351 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tensorflow as tf
+
+from . import optimizer
+from .tensor_substitution import pack_tensors, unpack_tensor, substitute_parameters
+from .. import settings
+from ..actions import Optimization
+from ..core.compilable import Build
+from ..core.errors import GPflowError
+from ..models.model import Model
+
+
+logger = settings.logger()
+
+
+class InGraphOptimizer(optimizer.Optimizer):
+    """
+    Deterministic gradient based optimizers implemented entirely with TensorFlow
+    control flow. In contrast to `ScipyOptimizer`, which calls back into Python
+    for every function evaluation, the whole optimization loop including the line
+    search is executed by a single `session.run` call.
+
+    Supported methods:
+        - 'L-BFGS', limited memory BFGS with `memory` curvature pairs.
+        - 'BFGS', BFGS with a dense approximation of the inverse Hessian.
+        - 'CG', nonlinear conjugate gradients (Polak-Ribière+).
+
+    All methods use a backtracking line search satisfying the Armijo condition.
+    Trainable parameters of the model are packed into a single flat vector of
+    unconstrained values, the model objective is rebuilt as a function of that
+    vector and the final values are assigned back to parameters' variables once
+    the loop has finished.
+
+        :param method: Name of the optimization method.
+        :param memory: Number of curvature pairs stored by L-BFGS.
+        :param gtol: Stop when the largest absolute gradient value is below `gtol`.
+        :param ftol: Stop when relative reduction of the objective is below `ftol`.
+        :param max_linesearch: Maximum number of backtracking steps per iteration.
+    """
+
+    _METHODS = ('L-BFGS', 'BFGS', 'CG')
+
+    def __init__(self, method='L-BFGS', memory=10, gtol=1e-5, ftol=2.2e-9,
+                 max_linesearch=20):
+        if method not in self._METHODS:
+            raise ValueError('Unknown method "{0}", expected one of {1}.'
+                             .format(method, self._METHODS))
+        if memory <= 0:
+            raise ValueError('The memory parameter must be greater zero.')
+        self.name = self.__class__.__name__
+        self._method = method
+        self._memory = memory
+        self._gtol = gtol
+        self._ftol = ftol
+        self._max_linesearch = max_linesearch
+        self._model = None
+        self._minimize_operation = None
+        self._result = None
+
+    @property
+    def method(self):
+        return self._method
+
+    @property
+    def model(self):
+        return self._model
+
+    @property
+    def minimize_operation(self):
+        return self._minimize_operation
+
+    @property
+    def result(self):
+        """
+        Tensors with the final objective value, the number of performed iterations
+        and the convergence flag of the last built optimization operation.
+        """
+        return self._result
+
+    def make_optimize_tensor(self, model, session=None, var_list=None, maxiter=1000, **kwargs):
+        """
+        Make in-graph optimization tensor.
+        The `make_optimize_tensor` method builds optimization operation and initializes
+        model's variables.
+
+            :param model: GPflow model.
+            :param session: Tensorflow session.
+            :param var_list: Not supported, in-graph optimizer works with trainable
+                parameters of the model only.
+            :param maxiter: Maximum number of iterations executed by the operation.
+            :return: Tensorflow operation.
+        """
+        if var_list:
+            raise ValueError('In-graph optimizer does not support extra variables, '
+                             'only trainable parameters of the model are optimized.')
+        session = model.enquire_session(session)
+        with session.as_default(), tf.name_scope(self.name):
+            params = list(model.trainable_parameters)
+            if not params:
+                raise ValueError('No trainable parameters to optimize.')
+            minimize, result = self._build_minimize(model, params, maxiter)
+            model.initialize(session=session)
+            self._result = result
+            return minimize
+
+    def make_optimize_action(self, model, session=None, var_list=None, **kwargs):
+        """
+        Build Optimization action task with in-graph optimizer.
+        Every run of the action performs up to `maxiter` iterations.
+
+            :param model: GPflow model.
+            :param session: Tensorflow session.
+            :param var_list: Not supported.
+            :param feed_dict: Tensorflow feed_dict dictionary.
+            :param kwargs: Extra parameters passed to `make_optimize_tensor`.
+            :return: Optimization action.
+        """
+        if model is None or not isinstance(model, Model):
+            raise ValueError('Unknown type passed for optimization.')
+        session = model.enquire_session(session)
+        feed_dict = kwargs.pop('feed_dict', None)
+        feed_dict_update = self._gen_feed_dict(model, feed_dict)
+        run_kwargs = {} if feed_dict_update is None else {'feed_dict': feed_dict_update}
+        optimizer_tensor = self.make_optimize_tensor(model, session, var_list=var_list, **kwargs)
+        opt = Optimization()
+        opt.with_optimizer(self)
+        opt.with_model(model)
+        opt.with_optimizer_tensor(optimizer_tensor)
+        opt.with_run_kwargs(**run_kwargs)
+        return opt
+
+    def minimize(self, model, session=None, var_list=None, feed_dict=None, maxiter=1000,
+                 disp=False, initialize=False, anchor=True, step_callback=None, **kwargs):
+        """
+        Minimizes objective function of the model.
+
+        :param model: GPflow model with objective tensor.
+        :param session: Session where optimization will be run.
+        :param var_list: Not supported, must be empty.
+        :param feed_dict: Feed dictionary of tensors passed to session run method.
+        :param maxiter: Maximum number of iterations. Optimization stops earlier
+            if model converged.
+        :param disp: Set to True to log convergence messages.
+        :param initialize: If `True` model parameters will be re-initialized even if they were
+            initialized before for gotten session.
+        :param anchor: If `True` trained parameters computed during optimization at
+            particular session will be synchronized with internal parameter values.
+        :param step_callback: A function called once after the optimization loop;
+            the argument is the number of performed iterations.
+        :type step_callback: Callable[[int], None]
+        :param kwargs: This is a dictionary of extra parameters for session run method.
+        """
+        if model is None or not isinstance(model, Model):
+            raise ValueError('Unknown type passed for optimization.')
+
+        if model.is_built_coherence() is Build.NO:
+            raise GPflowError('Model is not built.')
+
+        session = model.enquire_session(session)
+        self._model = model
+        optimize_tensor = self.make_optimize_tensor(model, session, var_list=var_list,
+                                                    maxiter=maxiter)
+        self._minimize_operation = optimize_tensor
+        model.initialize(session=session, force=initialize)
+        feed_dict = self._gen_feed_dict(model, feed_dict)
+        _, (objective, iterations, converged) = session.run(
+            [optimize_tensor, self._result], feed_dict=feed_dict, **kwargs)
+
+        if disp:
+            status = 'converged' if converged else 'stopped'
+            logger.warning('{0} ({1}) {2} after {3} iterations, objective value {4}.'
+                           .format(self.name, self.method, status, iterations, objective))
+        if step_callback is not None:
+            step_callback(iterations)
+        if anchor:
+            model.anchor(session)
+
+    def _build_minimize(self, model, params, maxiter):
+        x0 = pack_tensors([p.unconstrained_tensor for p in params])
+        dtype = x0.dtype
+        zero = tf.constant(0, dtype=dtype)
+
+        def loss_and_grad(x):
+            with substitute_parameters(params, unpack_tensor(x, params)):
+                loss = tf.reshape(model.build_objective(), [])
+            grad = tf.gradients(loss, x)[0]
+            grad = tf.zeros_like(x) if grad is None else grad
+            return loss, grad
+
+        def cond(k, _x, _f, _g, converged, failed, *_extra):
+            proceed = tf.logical_not(tf.logical_or(converged, failed))
+            return tf.logical_and(proceed, k < maxiter)
+
+        def body(k, x, f, g, _converged, _failed, *extra):
+            d = self._direction(k, g, extra)
+            slope = _dot(g, d)
+            # Restart with the steepest descent direction if `d` is not a descent direction.
+            restart = slope >= zero
+            d = tf.where(restart, -g, d)
+            slope = tf.where(restart, -_dot(g, g), slope)
+            step0 = self._initial_step(k, g, slope, restart, extra)
+
+            step, f_new, g_new, ok = self._linesearch(loss_and_grad, x, f, slope, d, step0)
+            x_new = tf.where(ok, x + step * d, x)
+            f_new = tf.where(ok, f_new, f)
+            g_new = tf.where(ok, g_new, g)
+
+            extra_new = self._update(k, x_new - x, g_new - g, g_new, d, step, slope,
+                                     restart, extra)
+            gnorm = tf.reduce_max(tf.abs(g_new))
+            scale = tf.maximum(tf.maximum(tf.abs(f), tf.abs(f_new)), tf.ones_like(f))
+            converged = tf.logical_or(gnorm <= self._gtol,
+                                      tf.abs(f - f_new) <= self._ftol * scale)
+            converged = tf.logical_and(ok, converged)
+            return [k + 1, x_new, f_new, g_new, converged, tf.logical_not(ok)] + extra_new
+
+        with tf.name_scope('initial'):
+            f0, g0 = loss_and_grad(x0)
+        init_extra = self._init_extra(x0)
+        loop_vars = [tf.constant(0), x0, f0, g0,
+                     tf.constant(False), tf.constant(False)] + init_extra
+        result = tf.while_loop(cond, body, loop_vars, back_prop=False)
+        iterations, x_final, f_final, _g_final, converged = result[:5]
+
+        values = unpack_tensor(x_final, params)
+        assigns = [tf.assign(p.unconstrained_tensor, v) for p, v in zip(params, values)]
+        return tf.group(*assigns), (f_final, iterations, converged)
+
+    def _linesearch(self, loss_and_grad, x, f, slope, d, step0):
+        c1 = 1e-4
+
+        def cond(i, _step, _f, _g, ok):
+            return tf.logical_and(tf.logical_not(ok), i < self._max_linesearch)
+
+        def body(i, step, _f, _g, _ok):
+            f_new, g_new = loss_and_grad(x + step * d)
+            finite = tf.logical_and(tf.is_finite(f_new), tf.reduce_all(tf.is_finite(g_new)))
+            ok = tf.logical_and(finite, f_new <= f + c1 * step * slope)
+            step_next = tf.where(ok, step, 0.5 * step)
+            return i + 1, step_next, f_new, g_new, ok
+
+        init = [tf.constant(0), step0, f, tf.zeros_like(x), tf.constant(False)]
+        _i, step, f_new, g_new, ok = tf.while_loop(cond, body, init, back_prop=False)
+        return step, f_new, g_new, ok
+
+    def _init_extra(self, x):
+        n = x.shape[0]
+        if self.method == 'L-BFGS':
+            history = tf.zeros([self._memory, n], dtype=x.dtype)
+            return [history, history]
+        elif self.method == 'BFGS':
+            return [tf.eye(n, dtype=x.dtype)]
+        # CG: previous direction and step size.
+        return [tf.zeros_like(x), tf.ones([], dtype=x.dtype)]
+
+    def _direction(self, k, g, extra):
+        if self.method == 'L-BFGS':
+            return -_lbfgs_two_loop(g, *extra)
+        elif self.method == 'BFGS':
+            hessian_inv, = extra
+            return -tf.squeeze(tf.matmul(hessian_inv, g[:, None]), axis=1)
+        d_prev, _step_prev = extra
+        return tf.cond(tf.equal(k, 0), lambda: -g, lambda: d_prev)
+
+    def _initial_step(self, k, g, slope, restart, extra):
+        first = tf.minimum(tf.ones([], dtype=g.dtype), 1. / tf.norm(g, ord=1))
+        if self.method == 'CG':
+            _d_prev, step_prev = extra
+            return tf.where(tf.logical_or(tf.equal(k, 0), restart), first, step_prev)
+        fresh = tf.equal(k, 0)
+        if self.method == 'L-BFGS':
+            s_history, _ = extra
+            fresh = tf.logical_or(fresh, tf.equal(tf.reduce_sum(tf.abs(s_history)), 0))
+        return tf.where(tf.logical_or(fresh, restart), first, tf.ones_like(first))
+
+    def _update(self, k, s, y, g_new, d, step, slope, restart, extra):
+        sy = _dot(s, y)
+        yy = _dot(y, y)
+        accept = sy > 1e-10 * yy
+        if self.method == 'L-BFGS':
+            s_history, y_history = extra
+
+            def append():
+                return (tf.concat([s_history[1:], s[None]], axis=0),
+                        tf.concat([y_history[1:], y[None]], axis=0))
+
+            s_history, y_history = tf.cond(accept, append, lambda: (s_history, y_history))
+            return [s_history, y_history]
+        elif self.method == 'BFGS':
+            hessian_inv, = extra
+
+            def bfgs_update():
+                n = tf.shape(s)[0]
+                rho = 1. / sy
+                eye = tf.eye(n, dtype=s.dtype)
+                H = tf.cond(tf.equal(k, 0), lambda: (sy / yy) * eye, lambda: hessian_inv)
+                A = eye - rho * s[:, None] * y[None, :]
+                return tf.matmul(tf.matmul(A, H), A, transpose_b=True) + rho * s[:, None] * s[None, :]
+
+            return [tf.cond(accept, bfgs_update, lambda: hessian_inv)]
+        # Polak-Ribière+ update of the conjugate direction.
+        g_prev = g_new - y
+        beta = tf.maximum(_dot(g_new, y) / _dot(g_prev, g_prev), tf.zeros_like(sy))
+        d_new = -g_new + beta * d
+        slope_new = _dot(g_new, d_new)
+        step_new = tf.where(slope_new < 0., tf.minimum(step * slope / slope_new, 1e3 * step), step)
+        return [d_new, step_new]
+
+
+def _lbfgs_two_loop(g, s_history, y_history):
+    """
+    L-BFGS two-loop recursion computing the product of the inverse Hessian
+    approximation and the gradient. History is ordered from the oldest pair
+    to the newest one, empty pairs are filled with zeros and do not contribute.
+    """
+    memory = s_history.shape[0].value
+    sy = tf.reduce_sum(s_history * y_history, axis=1)
+    yy = tf.reduce_sum(y_history * y_history, axis=1)
+    valid = sy > 0.
+    rho = tf.where(valid, 1. / tf.where(valid, sy, tf.ones_like(sy)), tf.zeros_like(sy))
+
+    q = g
+    alphas = [None] * memory
+    for i in reversed(range(memory)):
+        alphas[i] = rho[i] * _dot(s_history[i], q)
+        q = q - alphas[i] * y_history[i]
+
+    one = tf.ones([], dtype=g.dtype)
+    gamma = tf.where(valid[-1], sy[-1] / tf.where(valid[-1], yy[-1], one), one)
+    r = gamma * q
+    for i in range(memory):
+        beta = rho[i] * _dot(y_history[i], r)
+        r = r + s_history[i] * (alphas[i] - beta)
+    return r
+
+
+def _dot(a, b):
+    return tf.reduce_sum(a * b)
@@ -102,11 +102,14 @@ with mon.LogdirWriter('./model-tensorboard') as writer:
 import time
 import abc
 from typing import Callable, List, Dict, Set, Optional, Iterator, Any, Tuple
+import collections
+import copy
 import itertools
 import logging
 import math
 from pathlib import PurePath
 import io
+from concurrent.futures import Executor, ThreadPoolExecutor
 from timeit import default_timer as timer
 
 import numpy as np
@@ -221,6 +224,9 @@ class MonitorContext(object):
 
     - optimiser_updated: Flag indicating that the optimiser's state has already been written to
         the correspondent variables in the current step.
+
+    - feed_dict: Values of TensorFlow variables to feed when evaluating tensors. It is set in
+        snapshots of the context passed to tasks running in the background (see `snapshot`).
     """
     def __init__(self) -> None:
 
@@ -233,18 +239,48 @@ class MonitorContext(object):
         self.init_global_step = 0
         self.optimiser = None   # type: Any
         self.optimiser_updated = False
+        self.feed_dict = {}     # type: Dict
+        self._frozen_global_step = None  # type: Optional[int]
 
     @property
     def global_step(self) -> int:
         """
         Evaluates the value of the global step variable if it is set, otherwise returns the
-        current iteration number.
+        current iteration number. In snapshots of the context it returns the global step at the
+        time the snapshot was taken.
         """
+        if self._frozen_global_step is not None:
+            return self._frozen_global_step
         if self.session is None or self.global_step_tensor is None:
             return self.iteration_no + self.init_global_step
         else:
             return self.session.run(self.global_step_tensor)
 
+    def snapshot(self, tensors: Optional[List[tf.Variable]]=None) -> 'MonitorContext':
+        """
+        Creates a copy of the context for a task running in the background. The global step and
+        the values of the given variables are evaluated in a single session call, the values are
+        stored in the `feed_dict` of the copy. Feeding them when evaluating tensors later gives
+        the same results as at the current iteration, even if the optimiser has moved on.
+        :param tensors: TensorFlow variables to take the values of, e.g. unconstrained tensors of
+        model parameters.
+        :return: The copy of the context.
+        """
+        context = copy.copy(self)
+        tensors = list(tensors or [])
+        fetch_step = self.session is not None and self.global_step_tensor is not None \
+            and self._frozen_global_step is None
+        if self.session is not None and (tensors or fetch_step):
+            fetches = tensors + ([self.global_step_tensor] if fetch_step else [])
+            values = self.session.run(fetches, feed_dict=self.feed_dict or None)
+            context.feed_dict = dict(self.feed_dict)
+            context.feed_dict.update(zip(tensors, values[:len(tensors)]))
+            if fetch_step:
+                context._frozen_global_step = values[-1]
+        if context._frozen_global_step is None:
+            context._frozen_global_step = self.global_step
+        return context
+
 
 class MonitorTask(metaclass=abc.ABCMeta):
     """
@@ -262,6 +298,12 @@ class MonitorTask(metaclass=abc.ABCMeta):
     If the task is called when the optimisation has already finished the execution of `run` will
     depend on the `exit condition`. This is a simple boolean flag which allows or disallows `run`
     after the optimisation is done. The flag can be set using `with_exit_condition` function.
+
+    A task can be made to run in the background using `with_async_execution`. The condition is
+    still evaluated in the optimisation loop, but `run` is submitted to an executor with a
+    snapshot of the context, and the optimisation continues immediately. The time the task takes
+    from the optimisation loop is given by `total_time`, the time spent in the background by
+    `background_time`.
     """
 
     def __init__(self, need_optimiser_update: Optional[bool]=False) -> None:
@@ -276,6 +318,10 @@ class MonitorTask(metaclass=abc.ABCMeta):
         self._total_time = 0.0
         self._last_call_time = 0.0
         self._need_optimiser_update = need_optimiser_update
+        self._executor = None  # type: Optional[Executor]
+        self._max_pending = 1
+        self._pending = collections.deque()
+        self._background_time = 0.0
 
     def with_condition(self, condition: Callable[[MonitorContext], bool]) -> 'MonitorTask':
         """
@@ -299,6 +345,31 @@ class MonitorTask(metaclass=abc.ABCMeta):
         self._task_name = task_name
         return self
 
+    def with_async_execution(self, executor: Optional[Executor]=None,
+                             max_pending: Optional[int]=1) -> 'MonitorTask':
+        """
+        Makes the task run in the background, off the optimisation loop.
+
+        When the task fires, the values of the variables listed by `snapshot_tensors` are taken
+        and `run` is submitted to the executor with the snapshot of the context. TensorBoard
+        tasks of a model evaluate their summaries with the parameter values of the iteration the
+        task fired at. Other tasks, e.g. `CheckpointTask`, read the variables when they run.
+
+        If `max_pending` runs of the task are not finished yet, the optimisation loop waits for
+        the oldest one, so that slow tasks can't pile up. Errors raised by background runs are
+        re-raised in the optimisation loop when the runs are collected.
+
+        :param executor: Executor to run the task with, e.g. a thread pool shared by several
+        tasks. By default a new thread pool with one worker is created. The TensorFlow session
+        can't be shared with other processes, so process pools only suit tasks not using it.
+        :param max_pending: Maximum number of unfinished background runs of the task.
+        """
+        if max_pending < 1:
+            raise ValueError('The max_pending parameter must be greater zero.')
+        self._executor = executor or ThreadPoolExecutor(max_workers=1)
+        self._max_pending = max_pending
+        return self
+
     @property
     def task_name(self):
         """Task name"""
@@ -314,6 +385,30 @@ class MonitorTask(metaclass=abc.ABCMeta):
         """Last execution time"""
         return self._last_call_time
 
+    @property
+    def background_time(self):
+        """Accumulated execution time of background runs of this task"""
+        return self._background_time
+
+    def snapshot_tensors(self) -> List[tf.Variable]:
+        """
+        TensorFlow variables whose values are taken when the task fires, if it runs in the
+        background. Descendants can override it, there are none by default.
+        """
+        return []
+
+    def wait(self) -> None:
+        """
+        Waits until all background runs of the task are finished. Re-raises the error of the
+        first failed run.
+        """
+        start_timestamp = get_hr_time()
+        try:
+            while self._pending:
+                self._pending.popleft().result()
+        finally:
+            self._total_time += get_hr_time() - start_timestamp
+
     @abc.abstractmethod
     def run(self, context: MonitorContext, *args, **kwargs) -> None:
         """
@@ -338,12 +433,31 @@ class MonitorTask(metaclass=abc.ABCMeta):
             if fire_task:
                 if self._need_optimiser_update:
                     update_optimiser(context, *args, **kwargs)
-                self.run(context, *args, **kwargs)
+                if self._executor is None:
+                    self.run(context, *args, **kwargs)
+                else:
+                    self._submit(context, *args, **kwargs)
         finally:
             # Remember the time of the last execution and update the accumulated time.
             self._last_call_time = get_hr_time() - start_timestamp
             self._total_time += self._last_call_time
 
+    def _submit(self, context: MonitorContext, *args, **kwargs) -> None:
+        # Collect finished runs, and wait for the oldest one if there are too many pending.
+        while self._pending and (self._pending[0].done() or
+                                 len(self._pending) >= self._max_pending):
+            self._pending.popleft().result()
+        snapshot = context.snapshot(self.snapshot_tensors())
+        future = self._executor.submit(self._run_in_background, snapshot, *args, **kwargs)
+        self._pending.append(future)
+
+    def _run_in_background(self, context: MonitorContext, *args, **kwargs) -> None:
+        start_timestamp = get_hr_time()
+        try:
+            self.run(context, *args, **kwargs)
+        finally:
+            self._background_time += get_hr_time() - start_timestamp
+
 
 class Monitor(object):
     """
@@ -399,8 +513,13 @@ class Monitor(object):
         completes an iteration. The optimiser may pass some arguments, e.g. the state of trainable
         variables. This arguments will be passed to all monitoring tasks in case they make sense
         to some of them.
+
+        Multi-step optimisers (see `steps_per_run` option of TensorFlow and natural gradient
+        optimisers) call the monitor once per chunk of steps and pass the number of performed
+        steps in the `num_steps` keyword argument.
         """
-        self._on_iteration(*args, **kwargs)
+        num_steps = kwargs.pop('num_steps', 1)
+        self._on_iteration(*args, num_steps=num_steps, **kwargs)
 
     def start_monitoring(self) -> None:
         """
@@ -421,28 +540,46 @@ class Monitor(object):
         the user doesn't need to call this function explicitly. Otherwise the function should be
         called when the optimisation is done.
 
-        The function sets the optimisation completed flag in the monitoring context and runs the
-        tasks once more. If the monitor was created with the `print_summary` option it prints the
-        tasks' timing summary.
+        The function sets the optimisation completed flag in the monitoring context, runs the
+        tasks once more and waits for the tasks running in the background. If the monitor was
+        created with the `print_summary` option it prints the tasks' timing summary.
         """
 
         self._context.optimisation_finished = True
         self._on_iteration()
+        for mon_task in self._monitor_tasks:
+            mon_task.wait()
 
         if self._print_summary:
             self.print_summary()
 
+    @property
+    def monitoring_time(self) -> float:
+        """
+        Time the monitoring tasks took from the optimisation loop. It doesn't include the time
+        tasks spent running in the background.
+        """
+        return sum(mon_task.total_time for mon_task in self._monitor_tasks)
+
     def print_summary(self) -> None:
         """
         Prints the tasks' timing summary.
         """
         print("Tasks execution time summary:")
         for mon_task in self._monitor_tasks:
-            print("%s:\t%.4f (sec)" % (mon_task.task_name, mon_task.total_time))
+            if mon_task.background_time > 0.0:
+                print("%s:\t%.4f (sec)\t%.4f (sec) in background" %
+                      (mon_task.task_name, mon_task.total_time, mon_task.background_time))
+            else:
+                print("%s:\t%.4f (sec)" % (mon_task.task_name, mon_task.total_time))
+        total_time = get_hr_time() - self._start_timestamp
+        print("Time taken from the optimisation:\t%.4f (sec), %.1f%% of the total time" %
+              (self.monitoring_time,
+               100.0 * self.monitoring_time / total_time if total_time > 0.0 else np.nan))
 
-    def _on_iteration(self, *args, **kwargs) -> None:
+    def _on_iteration(self, *args, num_steps: int=1, **kwargs) -> None:
         """
-        Called at each iteration.
+        Called at each iteration, or once per `num_steps` iterations.
 
         This function does time measurements, updates timing in the monitoring context and calls
         all monitoring tasks.
@@ -454,7 +591,7 @@ class Monitor(object):
         self._context.total_time = current_timestamp - self._start_timestamp
         self._context.optimiser_updated = False
         if not self._context.optimisation_finished:
-            self._context.iteration_no += 1
+            self._context.iteration_no += num_steps
 
         # Call all monitoring functions
         for func in self._monitor_tasks:
@@ -691,8 +828,8 @@ class CheckpointTask(MonitorTask):
 
     def run(self, context: MonitorContext, *args, **kwargs) -> None:
 
-        self._saver.save(context.session, self._checkpoint_path,
-                         global_step=context.global_step_tensor)
+        global_step = context.global_step if context.global_step_tensor is not None else None
+        self._saver.save(context.session, self._checkpoint_path, global_step=global_step)
 
 
 class LogdirWriter(tf.summary.FileWriter):
@@ -818,6 +955,15 @@ class BaseTensorBoardTask(MonitorTask):
     def run(self, context: MonitorContext, *args, **kwargs) -> None:
         self._eval_summary(context)
 
+    def snapshot_tensors(self) -> List[tf.Variable]:
+        """
+        Unconstrained tensors of the model parameters, if the task has a model.
+        """
+        if self._model is None:
+            return []
+        return [p.unconstrained_tensor for p in self._model.parameters
+                if p.unconstrained_tensor is not None]
+
     def with_flush_immediately(self, flush_immediately: Optional[bool]=True)\
             -> 'BaseTensorBoardTask':
         """
@@ -848,7 +994,9 @@ class BaseTensorBoardTask(MonitorTask):
             raise RuntimeError('To run a TensorBoard monitor task the TF session object'
                                ' must be provided when creating an instance of the Monitor')
 
-        summary = context.session.run(self._summary, feed_dict=feed_dict)
+        feeds = dict(context.feed_dict)
+        feeds.update(feed_dict or {})
+        summary = context.session.run(self._summary, feed_dict=feeds or None)
         self._file_writer.add_summary(summary, context.global_step)
         if self._flush_immediately:
             self.flush()
@@ -898,6 +1046,140 @@ class ModelToTensorBoardTask(BaseTensorBoardTask):
         self._summary = tf.summary.merge(all_summaries)
 
 
+class ChunkedLmlEvaluator(object):
+    """
+    Evaluates the LML (or ELBO) of a model on its full dataset, split into sequential chunks such
+    that every data point is used exactly once. The result is the average of the chunks' LML
+    estimates weighted by chunk sizes, i.e. the exact ELBO of sparse variational models.
+
+    All chunks are fed through the compiled likelihood tensor of the model. Parts of its graph
+    that don't depend on the data, e.g. covariances of inducing points, their Cholesky factors
+    and the KL divergence, are evaluated once per call and fed into the evaluation of every chunk.
+    Chunks can be evaluated concurrently by a thread pool, which keeps the next chunks in flight
+    while the previous ones are being computed.
+    """
+
+    def __init__(self, model: Model, chunk_size: Optional[int]=100,
+                 num_threads: Optional[int]=1) -> None:
+        """
+        :param model: Compiled model with `X` and `Y` data holders.
+        :param chunk_size: Number of data points per chunk.
+        :param num_threads: Number of chunks evaluated concurrently.
+        """
+        if chunk_size < 1 or num_threads < 1:
+            raise ValueError('The chunk_size and num_threads parameters must be greater zero.')
+        if model.likelihood_tensor is None:
+            raise RuntimeError('The model must be compiled to evaluate its LML.')
+        with params_as_tensors_for(model):
+            self._data_tensors = [model.X, model.Y]
+        self._model = model
+        self._chunk_size = chunk_size
+        self._lml_tensor = model.likelihood_tensor
+        self._shared_tensors = _data_independent_inputs(self._lml_tensor, self._data_tensors)
+        self._executor = ThreadPoolExecutor(max_workers=num_threads) if num_threads > 1 else None
+
+    @property
+    def shared_tensors(self) -> List[tf.Tensor]:
+        """
+        Tensors evaluated once per call and shared by all chunks.
+        """
+        return self._shared_tensors
+
+    def num_chunks(self) -> int:
+        """
+        Number of chunks of the dataset.
+        """
+        return int(math.ceil(len(self._model.X._value) / self._chunk_size))  # round up
+
+    def __call__(self, session: Optional[tf.Session]=None, feed_dict: Optional[Dict]=None,
+                 wrapper: Optional[Callable[..., Iterator]]=None) -> float:
+        """
+        Evaluates the LML.
+        :param session: TensorFlow session, by default the session of the model.
+        :param feed_dict: Additional values to feed, e.g. snapshots of parameter values.
+        :param wrapper: Function wrapping the iterator of chunk results, e.g. a progress bar
+            such as `tqdm.tqdm`. It is called with the number of chunks as `total` keyword.
+        :return: The LML value.
+        """
+        session = session or self._model.enquire_session()
+        feed_dict = dict(feed_dict or {})
+        if self._shared_tensors:
+            shared_values = session.run(self._shared_tensors, feed_dict=feed_dict or None)
+            feed_dict.update(zip(self._shared_tensors, shared_values))
+
+        tf_x, tf_y = self._data_tensors
+        x, y = self._model.X._value, self._model.Y._value
+
+        def evaluate_chunk(start):
+            chunk_feed_dict = dict(feed_dict)
+            chunk_feed_dict[tf_x] = x[start:start + self._chunk_size]
+            chunk_feed_dict[tf_y] = y[start:start + self._chunk_size]
+            chunk_lml = session.run(self._lml_tensor, feed_dict=chunk_feed_dict)
+            return chunk_lml * len(chunk_feed_dict[tf_x])
+
+        starts = range(0, len(x), self._chunk_size)
+        if self._executor is None:
+            chunk_lmls = map(evaluate_chunk, starts)
+        else:
+            chunk_lmls = self._executor.map(evaluate_chunk, starts)
+        if wrapper is not None:
+            chunk_lmls = wrapper(chunk_lmls, total=len(starts))
+        return sum(chunk_lmls) / len(x)
+
+    def close(self) -> None:
+        """
+        Shuts down the thread pool, waiting for pending chunks.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def _data_independent_inputs(output: tf.Tensor, data_tensors: List[tf.Tensor]) -> List[tf.Tensor]:
+    """
+    Finds tensors of the graph of `output` that don't depend on the data tensors but are inputs
+    of ops that do. Feeding their values gives the same output without recomputing them.
+    Tensors that are cheap to obtain or can't be fed, such as constants, variables, random
+    numbers and tensors inside control flow constructs, are skipped.
+    """
+    data_ops = set(t.op for t in data_tensors)
+    depends = {}  # type: Dict[tf.Operation, bool]
+    stack = [output.op]
+    while stack:
+        op = stack[-1]
+        if op in depends:
+            stack.pop()
+            continue
+        parents = [t.op for t in op.inputs] + list(op.control_inputs)
+        unvisited = [parent for parent in parents if parent not in depends]
+        if unvisited and op not in data_ops:
+            stack.extend(unvisited)
+            continue
+        stack.pop()
+        depends[op] = op in data_ops or any(depends[parent] for parent in parents)
+
+    graph = output.graph
+    skipped_types = {'Const', 'Placeholder', 'PlaceholderWithDefault', 'VariableV2',
+                     'Variable', 'VarHandleOp'}
+    shared, seen = [], set()
+    for op in depends:
+        if not depends[op] or op in data_ops:
+            continue
+        for tensor in op.inputs:
+            if depends[tensor.op] or tensor.name in seen:
+                continue
+            seen.add(tensor.name)
+            if tensor.op.type in skipped_types or tensor.op.op_def.is_stateful:
+                continue
+            if tensor.dtype._is_ref_dtype or tensor.dtype in (tf.resource, tf.variant):
+                continue
+            if tensor.op._get_control_flow_context() is not None:
+                continue
+            if graph.is_feedable(tensor) and graph.is_fetchable(tensor.op):
+                shared.append(tensor)
+    return shared
+
+
 class LmlToTensorBoardTask(BaseTensorBoardTask):
     """
     Monitoring task that creates a TensorBoard with just one scalar value -
@@ -905,27 +1187,32 @@ class LmlToTensorBoardTask(BaseTensorBoardTask):
 
     The LML is averaged over a number of minimatches. The input dataset is split into the specified
     number of sequential minibatches such that every datapoint is used exactly once. The set of
-    minibatches doesn't change from one iteration to another.
+    minibatches doesn't change from one iteration to another. The minibatches are evaluated by a
+    `ChunkedLmlEvaluator`, which computes the parts of the model not depending on the data only
+    once and can evaluate several minibatches concurrently.
 
     The task can display the progress of calculating LML at each iteration (how many minibatches
     are left to compute). For that the `tqdm' progress bar should be installed (pip install tqdm).
     """
 
     def __init__(self, file_writer: LogdirWriter, model: Model, minibatch_size: Optional[int] = 100,
-                 display_progress: Optional[bool] = True) -> None:
+                 display_progress: Optional[bool] = True, num_threads: Optional[int] = 1) -> None:
         """
         :param model: Model tensor
         :param file_writer: Event file writer object.
         :param minibatch_size: Number of points per minibatch
         :param display_progress: if True the task displays the progress of calculating LML.
+        :param num_threads: Number of minibatches evaluated concurrently.
         """
 
         super().__init__(file_writer, model)
         self._minibatch_size = minibatch_size
+        self._num_threads = num_threads
+        self._evaluator = None  # type: Optional[ChunkedLmlEvaluator]
         self._full_lml = tf.placeholder(settings.float_type, shape=())
         self._summary = tf.summary.scalar(model.name + '/full_lml', self._full_lml)
 
-        self.wrapper = None  # type: Callable[[Iterator], Iterator]
+        self.wrapper = None  # type: Callable[..., Iterator]
         if display_progress:  # pragma: no cover
             try:
                 import tqdm
@@ -935,23 +1222,18 @@ class LmlToTensorBoardTask(BaseTensorBoardTask):
                 if logger.isEnabledFor(logging.WARNING):
                     logger.warning("LML monitor task: to display progress install `tqdm`.")
         if self.wrapper is None:
-            self.wrapper = lambda x: x
+            self.wrapper = lambda x, **_kwargs: x
 
     def run(self, context: MonitorContext, *args, **kwargs) -> None:
 
-        with params_as_tensors_for(self._model):
-            tf_x, tf_y = self._model.X, self._model.Y
-
-        lml = 0.0
-        num_batches =  int(math.ceil(len(self._model.X._value) / self._minibatch_size))  # round up
-        for mb in self.wrapper(range(num_batches)):
-            start = mb * self._minibatch_size
-            finish = (mb + 1) * self._minibatch_size
-            x_mb = self._model.X._value[start:finish, :]
-            y_mb = self._model.Y._value[start:finish, :]
-            mb_lml = self._model.compute_log_likelihood(feed_dict={tf_x: x_mb, tf_y: y_mb})
-            lml += mb_lml * len(x_mb)
-        lml = lml / len(self._model.X._value)
+        # The evaluator is created on the first run, when the model is compiled.
+        if self._evaluator is None or self._evaluator._lml_tensor is not \
+                self._model.likelihood_tensor:
+            if self._evaluator is not None:
+                self._evaluator.close()
+            self._evaluator = ChunkedLmlEvaluator(self._model, self._minibatch_size,
+                                                  self._num_threads)
+        lml = self._evaluator(context.session, context.feed_dict, self.wrapper)
 
         self._eval_summary(context, {self._full_lml: lml})
 
@@ -1050,8 +1332,12 @@ class ImageToTensorBoardTask(BaseTensorBoardTask):
 
         super().__init__(file_writer)
         self.func = func
-        self.placeholder = tf.placeholder(tf.float64, [1, None, None, None])
-        self._summary = tf.summary.image(func_name, self.placeholder)
+        # PNG encoded image. It is decoded in the graph, so that no ops are added when the task
+        # runs, which may happen in the background.
+        self.placeholder = tf.placeholder(tf.string, shape=())
+        # Add the image number as a new dimension
+        image = tf.expand_dims(tf.image.decode_png(self.placeholder), 0)
+        self._summary = tf.summary.image(func_name, image)
 
     def run(self, context: MonitorContext, *args, **kwargs) -> None:
 
@@ -1061,10 +1347,4 @@ class ImageToTensorBoardTask(BaseTensorBoardTask):
         fig.savefig(buf, format='png', bbox_inches='tight')
         plt.close(fig)
 
-        # Create TF image and load its content from the buffer.
-        buf.seek(0)
-        image = tf.image.decode_png(buf.getvalue())
-        # Add the image number as a new dimension
-        image = context.session.run(tf.expand_dims(image, 0))
-
-        self._eval_summary(context, {self.placeholder: image})
+        self._eval_summary(context, {self.placeholder: buf.getvalue()})
@@ -0,0 +1,269 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import multiprocessing
+import os
+from collections import namedtuple
+
+import numpy as np
+import tensorflow as tf
+
+from . import optimizer
+from .scipy_optimizer import ScipyOptimizer
+from ..core.compilable import Build
+from ..core.errors import GPflowError
+from ..models.model import Model
+
+
+MultiStartResult = namedtuple('MultiStartResult', [
+    'values',        # Trainable values of the best start, dictionary keyed by pathname.
+    'objective',     # Objective value of the best start.
+    'traces',        # Objective values after every round, list per start.
+    'start_values',  # Initial values of all starts.
+    'final_values',  # Values of all starts after their last round.
+])
+
+
+class MultiStartOptimizer(optimizer.Optimizer):
+    """
+    Multi-start optimizer runs an optimizer from a number of random initialisations
+    and returns the best one. The first start uses current values of the model,
+    other starts draw values of trainable parameters from their priors. Parameters
+    without priors keep their current values.
+
+    Unpromising starts are stopped early by successive halving: optimization runs in
+    `num_rounds` rounds, after each round only `keep_fraction` of the starts with
+    the lowest objective values proceed to the next round.
+
+    Starts run in the current session one after another, unless `model_fn` is given.
+    In that case they are distributed across a pool of `num_processes` processes. Each
+    process builds its own copy of the model with `model_fn` in a fresh TensorFlow
+    graph and optimizes starts sent to it. Parameter values are exchanged as
+    dictionaries keyed by parameter pathnames, so the `model_fn` must build models
+    with the same structure and names as the model passed to `minimize`.
+
+        :param num_starts: Number of starts, including the current state of the model.
+        :param optimizer_fn: Picklable callable without arguments returning GPflow
+            optimizer used for every start. ScipyOptimizer is used by default.
+        :param model_fn: Picklable callable without arguments which builds the model,
+            e.g. a module-level function. Required for running starts in processes.
+        :param num_processes: Number of worker processes. By default the number of
+            CPU cores is used, when `model_fn` is provided.
+        :param num_rounds: Number of successive halving rounds.
+        :param keep_fraction: Fraction of starts kept after each round.
+        :param seed: Seed for drawing initial values.
+    """
+
+    def __init__(self, num_starts=10, optimizer_fn=ScipyOptimizer, model_fn=None,
+                 num_processes=None, num_rounds=3, keep_fraction=0.5, seed=None):
+        if num_starts <= 0:
+            raise ValueError('The num_starts parameter must be greater zero.')
+        if num_rounds <= 0:
+            raise ValueError('The num_rounds parameter must be greater zero.')
+        if not 0. < keep_fraction <= 1.:
+            raise ValueError('The keep_fraction parameter must be in (0, 1] interval.')
+        self.num_starts = num_starts
+        self.optimizer_fn = optimizer_fn
+        self.model_fn = model_fn
+        self.num_processes = num_processes
+        self.num_rounds = num_rounds
+        self.keep_fraction = keep_fraction
+        self.seed = seed
+        self._model = None
+        self._result = None
+
+    @property
+    def model(self):
+        return self._model
+
+    @property
+    def result(self):
+        """Result of the last `minimize` call, `MultiStartResult` tuple."""
+        return self._result
+
+    def sample_starts(self, model):
+        """
+        Draws initial values for all starts.
+
+            :param model: GPflow model.
+            :return: List of dictionaries with values keyed by parameter pathnames.
+        """
+        state = np.random.get_state()
+        if self.seed is not None:
+            np.random.seed(self.seed)
+        try:
+            initial = model.read_trainables()
+            starts = [initial]
+            for _ in range(self.num_starts - 1):
+                values = dict(initial)
+                values.update(_sample_from_priors(model))
+                starts.append(values)
+            return starts
+        finally:
+            if self.seed is not None:
+                np.random.set_state(state)
+
+    def minimize(self, model, session=None, var_list=None, feed_dict=None,
+                 maxiter=1000, anchor=True, step_callback=None, **kwargs):
+        """
+        Minimizes objective function of the model from multiple starts and assigns
+        the best found values to the model.
+
+        :param model: GPflow model with objective tensor.
+        :param session: Session where optimization will be run, when processes are
+            not used.
+        :param var_list: Not supported.
+        :param feed_dict: Not supported, model's feeds are used.
+        :param maxiter: Maximum number of iterations per start, split evenly
+            between rounds.
+        :param anchor: Kept for the interface consistency, the best values are
+            always assigned to the model.
+        :param step_callback: A function called after each round with the round
+            number and the list of objective values of the active starts.
+        :type step_callback: Callable[[int, List[float]], None]
+        :param kwargs: Extra parameters passed to optimizer's `minimize` method.
+        :return: `MultiStartResult` tuple.
+        """
+        if model is None or not isinstance(model, Model):
+            raise ValueError('Unknown type passed for optimization.')
+        if maxiter <= 0:
+            raise ValueError('The maxiter parameter must be greater zero.')
+        if var_list or feed_dict:
+            raise ValueError('Multi-start optimizer does not support var_list and feed_dict.')
+        if model.is_built_coherence() is Build.NO:
+            raise GPflowError('Model is not built.')
+
+        self._model = model
+        starts = self.sample_starts(model)
+        current = list(starts)
+        traces = [[] for _ in starts]
+        active = list(range(len(starts)))
+        round_iters = int(math.ceil(maxiter / self.num_rounds))
+
+        with self._make_runner(model, session, kwargs) as run:
+            for rnd in range(self.num_rounds):
+                iters = min(round_iters, maxiter - rnd * round_iters)
+                if iters <= 0:
+                    break
+                results = run([(current[i], iters) for i in active])
+                for i, (values, objective) in zip(active, results):
+                    current[i] = values
+                    traces[i].append(objective)
+                if step_callback is not None:
+                    step_callback(rnd, [traces[i][-1] for i in active])
+                if rnd < self.num_rounds - 1:
+                    keep = max(1, int(math.ceil(len(active) * self.keep_fraction)))
+                    active = sorted(active, key=lambda i: _sort_key(traces[i][-1]))[:keep]
+
+        best = min(active, key=lambda i: _sort_key(traces[i][-1]))
+        model.assign(current[best], session=session)
+        self._result = MultiStartResult(values=current[best], objective=traces[best][-1],
+                                        traces=traces, start_values=starts,
+                                        final_values=current)
+        return self._result
+
+    def make_optimize_tensor(self, model, session=None, var_list=None, **kwargs):
+        raise NotImplementedError('Multi-start optimizer does not provide '
+                                  'make_optimize_tensor method.')
+
+    def _make_runner(self, model, session, minimize_kwargs):
+        if self.model_fn is None or self.num_processes == 1:
+            return _SerialRunner(model, session, self.optimizer_fn(), minimize_kwargs)
+        num_processes = self.num_processes or os.cpu_count()
+        return _ProcessRunner(num_processes, self.model_fn, self.optimizer_fn, minimize_kwargs)
+
+
+class _SerialRunner:
+    def __init__(self, model, session, optimizer, minimize_kwargs):
+        self._model = model
+        self._session = session
+        self._optimizer = optimizer
+        self._minimize_kwargs = minimize_kwargs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __call__(self, tasks):
+        return [_optimize_start(self._model, self._optimizer, values, maxiter,
+                                session=self._session, **self._minimize_kwargs)
+                for values, maxiter in tasks]
+
+
+class _ProcessRunner:
+    def __init__(self, num_processes, model_fn, optimizer_fn, minimize_kwargs):
+        self._num_processes = num_processes
+        self._initargs = (model_fn, optimizer_fn, minimize_kwargs)
+        self._pool = None
+
+    def __enter__(self):
+        # TensorFlow runtime is not fork-safe, workers are started from scratch.
+        context = multiprocessing.get_context('spawn')
+        self._pool = context.Pool(self._num_processes, initializer=_initialize_worker,
+                                  initargs=self._initargs)
+        return self
+
+    def __exit__(self, *exc):
+        self._pool.close()
+        self._pool.join()
+        self._pool = None
+        return False
+
+    def __call__(self, tasks):
+        return self._pool.map(_worker_optimize_start, tasks, chunksize=1)
+
+
+_WORKER_STATE = {}
+
+
+def _initialize_worker(model_fn, optimizer_fn, minimize_kwargs):
+    _WORKER_STATE['model'] = model_fn()
+    _WORKER_STATE['optimizer'] = optimizer_fn()
+    _WORKER_STATE['kwargs'] = minimize_kwargs
+
+
+def _worker_optimize_start(task):
+    values, maxiter = task
+    return _optimize_start(_WORKER_STATE['model'], _WORKER_STATE['optimizer'],
+                           values, maxiter, **_WORKER_STATE['kwargs'])
+
+
+def _optimize_start(model, opt, values, maxiter, session=None, **kwargs):
+    model.assign(values, session=session)
+    try:
+        opt.minimize(model, session=session, maxiter=maxiter, anchor=True, **kwargs)
+        session = model.enquire_session(session)
+        objective = float(session.run(model.objective, feed_dict=model.feeds or None))
+    except tf.errors.OpError:
+        # Starts drawn from wide priors may fail numerically, e.g. in Cholesky,
+        # such starts are ranked last.
+        objective = np.nan
+    return model.read_trainables(), objective
+
+
+def _sample_from_priors(model):
+    values = {}
+    for param in model.trainable_parameters:
+        if param.prior is None:
+            continue
+        shape = param.shape
+        values[param.pathname] = np.reshape(param.prior.sample(shape), shape)
+    return values
+
+
+def _sort_key(objective):
+    return np.inf if np.isnan(objective) else objective
@@ -18,17 +18,43 @@ import functools
 import tensorflow as tf
 
 from . import optimizer
-from .. import settings
+from .tensor_substitution import rebuild_model_tensors
+from .. import features, settings
 from ..actions import Optimization
-from ..models import Model
+from ..decors import params_as_tensors_for
+from ..likelihoods import Gaussian
+from ..models import Model, SVGP
+from ..multioutput.kernels import Mok
 
 
 class NatGradOptimizer(optimizer.Optimizer):
-    def __init__(self, gamma, **kwargs):
+    """
+    Natural gradient optimizer for pairs of variational parameters.
+
+        :param gamma: Step length.
+        :param conjugate_updates: When `True`, pairs `(model.q_mu, model.q_sqrt)` of
+            `SVGP` models with Gaussian likelihood and the default `XiNat`
+            transformation are updated in closed form from the (minibatch)
+            statistics of the data, without differentiating the objective. This
+            includes SVGP models with q_sqrt shared by all latent functions.
+            In natural parameters the natural gradient step is a convex combination
+            of current parameters and parameters of the optimal q(u), which for
+            gamma equal to one is reached in a single step. Other pairs use the
+            generic automatic differentiation path. The closed form update assumes
+            that the objective is the ELBO of the model, it ignores priors on
+            `q_mu` and `q_sqrt` and changes to `build_objective`. Defaults to `False`.
+
+    SVGP models with low-rank-plus-diagonal or shared covariances of q(u) are
+    only supported by closed form updates, which excludes `q_rank`.
+    """
+
+    def __init__(self, gamma, conjugate_updates=False, **kwargs):
         super().__init__(**kwargs)
         self.name = self.__class__.__name__
         self._gamma = gamma
+        self._conjugate_updates = conjugate_updates
         self._natgrad_op = None
+        self._num_steps = None
 
     @property
     def gamma(self):
@@ -39,7 +65,7 @@ class NatGradOptimizer(optimizer.Optimizer):
         return self._natgrad_op
 
     def minimize(self, model, var_list=None, session=None, feed_dict=None,
-                 maxiter=1000, anchor=True, step_callback=None, **kwargs):
+                 maxiter=1000, anchor=True, step_callback=None, steps_per_run=1, **kwargs):
         """
         Minimizes objective function of the model.
         Natural Gradient optimizer works with variational parameters only.
@@ -67,8 +93,12 @@ class NatGradOptimizer(optimizer.Optimizer):
                 parameter's values.
             :param step_callback: A callback function to execute at each optimization step.
                 The callback should accept variable argument list, where first argument is
-                optimization step number.
+                optimization step number. In multi-step mode the callback is executed once
+                per `steps_per_run` steps with the number of the last performed step and
+                the number of performed steps in the `num_steps` keyword argument.
             :type step_callback: Callable[[], None]
+            :param steps_per_run: Number of natural gradient steps performed by single
+                `session.run` call.
             :param kwargs: Extra parameters passed to session run's method.
         """
 
@@ -77,16 +107,24 @@ class NatGradOptimizer(optimizer.Optimizer):
 
         self._model = model
         session = model.enquire_session(session)
-        opt = self.make_optimize_action(model, session=session, var_list=var_list, **kwargs)
+        opt = self.make_optimize_action(model, session=session, var_list=var_list,
+                                        feed_dict=feed_dict, steps_per_run=steps_per_run,
+                                        **kwargs)
         with session.as_default():
-            for step in range(maxiter):
+            for start in range(0, maxiter, steps_per_run):
+                num_steps = min(steps_per_run, maxiter - start)
+                if num_steps != steps_per_run:
+                    # The last chunk runs remaining steps only.
+                    opt.with_steps_per_run(num_steps)
                 opt()
-                if step_callback is not None:
-                    step_callback(step)
+                if step_callback is not None and steps_per_run > 1:
+                    step_callback(start + num_steps - 1, num_steps=num_steps)
+                elif step_callback is not None:
+                    step_callback(start)
         if anchor:
             model.anchor(session)
 
-    def make_optimize_tensor(self, model, session=None, var_list=None):
+    def make_optimize_tensor(self, model, session=None, var_list=None, steps_per_run=1):
         """
         Make Tensorflow optimization tensor.
         This method builds natural gradients optimization tensor and initializes all
@@ -95,11 +133,19 @@ class NatGradOptimizer(optimizer.Optimizer):
             :param model: GPflow model.
             :param session: Tensorflow session.
             :param var_list: List of tuples of variational parameters.
+            :param steps_per_run: Number of natural gradient steps performed by single run
+                of the returned operation. When it is greater than one, the steps are wrapped
+                in a `tf.while_loop` and minibatches are advanced at every step.
             :return: Tensorflow natural gradient operation.
         """
+        if steps_per_run < 1:
+            raise ValueError('The steps_per_run parameter must be greater zero.')
+        self._num_steps = None
         session = model.enquire_session(session)
         with session.as_default(), tf.name_scope(self.name):
             # Create optimizer variables before initialization.
+            if steps_per_run > 1:
+                return self._build_multistep(model, steps_per_run, *var_list)
             return self._build_natgrad_step_ops(model, *var_list)
 
     def make_optimize_action(self, model, session=None, var_list=None, **kwargs):
@@ -130,14 +176,18 @@ class NatGradOptimizer(optimizer.Optimizer):
         if model is None or not isinstance(model, Model):
             raise ValueError('Unknown type passed for optimization.')
         feed_dict = kwargs.pop('feed_dict', None)
+        steps_per_run = kwargs.pop('steps_per_run', 1)
         feed_dict_update = self._gen_feed_dict(model, feed_dict)
         run_kwargs = {} if feed_dict_update is None else {'feed_dict': feed_dict_update}
-        optimizer_tensor = self.make_optimize_tensor(model, session=session, var_list=var_list)
+        optimizer_tensor = self.make_optimize_tensor(model, session=session, var_list=var_list,
+                                                     steps_per_run=steps_per_run)
         opt = Optimization()
         opt.with_optimizer(self)
         opt.with_model(model)
         opt.with_optimizer_tensor(optimizer_tensor)
         opt.with_run_kwargs(**run_kwargs)
+        if self._num_steps is not None:
+            opt.with_steps_tensor(self._num_steps)
         return opt
 
     @staticmethod
@@ -163,15 +213,79 @@ class NatGradOptimizer(optimizer.Optimizer):
         return tf.gradients(g, v, grad_ys=d_xs)
 
     def _build_natgrad_step_ops(self, model, *args):
+        updates = self._build_natgrad_updates(model, model.objective, args)
         ops = []
+        for arg, (mean_u, varsqrt_u) in zip(args, updates):
+            ops += [tf.assign(arg[0].unconstrained_tensor, mean_u),
+                    tf.assign(arg[1].unconstrained_tensor, varsqrt_u)]
+        return tf.group(*ops)
+
+    def _build_natgrad_updates(self, model, objective, args):
+        """
+        Builds new unconstrained values for all pairs of variational parameters.
+        Gradients of the objective for pairs without closed form update are computed
+        by a single `tf.gradients` call.
+        """
+        pairs = []
         for arg in args:
             q_mu, q_sqrt = arg[:2]
             xi_transform = arg[2] if len(arg) > 2 else XiNat()
-            ops.append(self._build_natgrad_step_op(model, q_mu, q_sqrt, xi_transform))
-        ops = list(sum(ops, ()))
-        return tf.group(*ops)
-
-    def _build_natgrad_step_op(self, model, q_mu_param, q_sqrt_param, xi_transform):
+            pairs.append((q_mu, q_sqrt, xi_transform))
+
+        conjugate = [self._conjugate_updates and _is_conjugate_pair(model, *pair)
+                     for pair in pairs]
+        for pair, conj in zip(pairs, conjugate):
+            if not conj and _is_structured_pair(model, *pair[:2]):
+                raise ValueError('Natural gradients of SVGP models with q_rank or q_shared '
+                                 'require conjugate_updates=True, a Gaussian likelihood '
+                                 'and q_shared.')
+        tensors = []
+        for (q_mu, q_sqrt, _), conj in zip(pairs, conjugate):
+            if not conj:
+                tensors += [q_mu.constrained_tensor, q_sqrt.constrained_tensor]
+        grads = iter(tf.gradients(objective, tensors)) if tensors else iter([])
+
+        updates = []
+        for (q_mu, q_sqrt, xi_transform), conj in zip(pairs, conjugate):
+            if conj:
+                updates.append(self._build_conjugate_update(model, q_mu, q_sqrt))
+            else:
+                dL = (next(grads), next(grads))
+                updates.append(self._build_natgrad_update(
+                    objective, q_mu, q_sqrt, xi_transform, dL=dL))
+        return updates
+
+    def _build_multistep(self, model, steps_per_run, *args):
+        """
+        Builds `tf.while_loop` operation which performs `steps_per_run` natural
+        gradient steps. The objective and variational parameters' tensors are rebuilt
+        inside the loop body, so that each step reads current values of variables
+        and draws a new minibatch.
+        """
+        self._num_steps = tf.placeholder_with_default(
+            tf.constant(steps_per_run, dtype=tf.int32), shape=[], name='num_steps')
+
+        def cond(i):
+            return i < self._num_steps
+
+        def body(i):
+            variables = [(arg[0].unconstrained_tensor, arg[1].unconstrained_tensor)
+                         for arg in args]
+            # Variational parameters are often not trainable, they are rebuilt anyway.
+            params = [param for arg in args for param in arg[:2]]
+            with rebuild_model_tensors(model, params):
+                objective = model.build_objective()
+                updates = self._build_natgrad_updates(model, objective, args)
+            assigns = []
+            for (q_mu_u, q_sqrt_u), (mean_u, varsqrt_u) in zip(variables, updates):
+                assigns += [tf.assign(q_mu_u, mean_u), tf.assign(q_sqrt_u, varsqrt_u)]
+            with tf.control_dependencies(assigns):
+                return i + 1
+
+        return tf.while_loop(cond, body, [tf.constant(0)], parallel_iterations=1,
+                             back_prop=False)
+
+    def _build_natgrad_update(self, objective, q_mu_param, q_sqrt_param, xi_transform, dL=None):
         """
         Implements equation 10 from
 
@@ -191,8 +305,9 @@ class NatGradOptimizer(optimizer.Optimizer):
 
         Note that if ξ = nat or [q_μ, q_sqrt] some of these calculations are the identity.
 
+        Returns new unconstrained values of `q_mu` and `q_sqrt`. Gradients of the
+        objective w.r.t. `q_mu` and `q_sqrt` can be passed in `dL`.
         """
-        objective = model.objective
         q_mu, q_sqrt = q_mu_param.constrained_tensor, q_sqrt_param.constrained_tensor
 
         # the three parameterizations as functions of [q_mu, q_sqrt]
@@ -205,7 +320,9 @@ class NatGradOptimizer(optimizer.Optimizer):
 
         ## three derivatives
         # 1) the oridinary gpflow gradient
-        dL_d_mean, dL_d_varsqrt = tf.gradients(objective, [q_mu, q_sqrt])
+        if dL is None:
+            dL = tf.gradients(objective, [q_mu, q_sqrt])
+        dL_d_mean, dL_d_varsqrt = dL
 
         # 2) the chain rule to get ∂L/∂η, where eta are the expectation parameters
         dL_detas = tf.gradients(_meanvarsqrt, etas, grad_ys=[dL_d_mean, dL_d_varsqrt])
@@ -225,17 +342,82 @@ class NatGradOptimizer(optimizer.Optimizer):
         # transform back to the model parameters [q_μ, q_sqrt]
         mean_new, varsqrt_new = xi_transform.xi_to_meanvarsqrt(*xis_new)
 
-        # these are the tensorflow variables to assign
-        q_mu_u = q_mu_param.unconstrained_tensor
-        q_sqrt_u = q_sqrt_param.unconstrained_tensor
-
         # so the transform to work for LowerTriangular
         mean_new.set_shape(q_mu_param.shape)
         varsqrt_new.set_shape(q_sqrt_param.shape)
 
-        q_mu_assign = tf.assign(q_mu_u, q_mu_param.transform.backward_tensor(mean_new))
-        q_sqrt_assign = tf.assign(q_sqrt_u, q_sqrt_param.transform.backward_tensor(varsqrt_new))
-        return q_mu_assign, q_sqrt_assign
+        return (q_mu_param.transform.backward_tensor(mean_new),
+                q_sqrt_param.transform.backward_tensor(varsqrt_new))
+
+    def _build_conjugate_update(self, model, q_mu_param, q_sqrt_param):
+        """
+        Closed form natural gradient step for SVGP with Gaussian likelihood.
+        The optimal q(u) given data has natural parameters
+
+            θ₁ = β Kuu⁻¹ Kuf (y - m(x)),  θ₂ = -½ (Kuu⁻¹ + β Kuu⁻¹ Kuf Kfu Kuu⁻¹),
+
+        with β = scale / σ², where the scale compensates the minibatch size. In the
+        whitened representation Kuu is replaced with identity and Kuf with L⁻¹Kuf,
+        where L is the Cholesky factor of Kuu. The step sets natural parameters to
+
+            θ_new = (1 - γ) θ + γ θ_optimal.
+
+        Returns new unconstrained values of `q_mu` and `q_sqrt`.
+        """
+        with params_as_tensors_for(model, model.likelihood):
+            X, Y = model.X, model.Y
+            err = Y - model.mean_function(X)
+            num_batch = tf.cast(tf.shape(X)[0], settings.float_type)
+            beta = tf.cast(model.num_data, settings.float_type) / num_batch / model.likelihood.variance
+
+        Kmm = features.Kuu(model.feature, model.kern, jitter=settings.numerics.jitter_level)
+        Kmn = features.Kuf(model.feature, model.kern, X)
+        Lm = tf.cholesky(Kmm)
+        A = tf.matrix_triangular_solve(Lm, Kmn, lower=True)
+        eye = tf.eye(tf.shape(Kmm)[0], dtype=settings.float_type)
+        precision = eye + beta * tf.matmul(A, A, transpose_b=True)
+        nat_1 = beta * tf.matmul(A, err)
+        if not model.whiten:
+            # Kuu⁻¹ = L⁻ᵀ L⁻¹ on both sides of the whitened precision.
+            Lm_inv = tf.matrix_triangular_solve(Lm, eye, lower=True)
+            precision = tf.matmul(Lm_inv, tf.matmul(precision, Lm_inv), transpose_a=True)
+            nat_1 = tf.matmul(Lm_inv, nat_1, transpose_a=True)
+
+        # All latent functions have the same precision, a shared q_sqrt keeps
+        # a single copy of it and the mean columns are stacked as 1 x M x L.
+        shared = model.q_shared
+        num_latent = 1 if shared else tf.shape(err)[1]
+        nat_1 = nat_1[None, :, :] if shared else nat_1
+        nat_2 = tf.tile(-0.5 * precision[None, :, :], [num_latent, 1, 1])
+        if self.gamma != 1:
+            q_mu, q_sqrt = q_mu_param.constrained_tensor, q_sqrt_param.constrained_tensor
+            q_mu = q_mu[None, :, :] if shared else q_mu
+            nat_1_old, nat_2_old = meanvarsqrt_to_natural(q_mu, q_sqrt, swap=not shared)
+            nat_1 = (1 - self.gamma) * nat_1_old + self.gamma * nat_1
+            nat_2 = (1 - self.gamma) * nat_2_old + self.gamma * nat_2
+
+        mean_new, varsqrt_new = natural_to_meanvarsqrt(nat_1, nat_2, swap=not shared)
+        mean_new = mean_new[0] if shared else mean_new
+        mean_new.set_shape(q_mu_param.shape)
+        varsqrt_new.set_shape(q_sqrt_param.shape)
+        return (q_mu_param.transform.backward_tensor(mean_new),
+                q_sqrt_param.transform.backward_tensor(varsqrt_new))
+
+
+def _is_conjugate_pair(model, q_mu_param, q_sqrt_param, xi_transform):
+    return (type(model) is SVGP and
+            isinstance(model.likelihood, Gaussian) and
+            isinstance(model.feature, features.InducingPoints) and
+            not isinstance(model.kern, Mok) and
+            not model.q_diag and model.q_rank is None and
+            type(xi_transform) is XiNat and
+            q_mu_param is model.q_mu and q_sqrt_param is model.q_sqrt)
+
+
+def _is_structured_pair(model, q_mu_param, q_sqrt_param):
+    return (isinstance(model, SVGP) and
+            (model.q_rank is not None or model.q_shared) and
+            (q_mu_param is model.q_mu or q_sqrt_param is model.q_sqrt))
 
 #
 # Xi transformations necessary for natural gradient optimizer.
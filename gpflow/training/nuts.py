@@ -0,0 +1,459 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from .optimizer import Optimizer
+from .tensor_substitution import pack_tensors, unpack_tensor, substitute_parameters
+
+
+class NUTS(Optimizer):
+    """
+    No-U-Turn sampler of Hoffman and Gelman (2014). The number of leapfrog steps is
+    chosen automatically by doubling trajectory until it starts turning back. The
+    step size is tuned with dual averaging and the mass matrix is estimated from
+    the samples drawn during burn-in, following the windowed adaptation scheme
+    of Stan: a short initial window tunes only the step size, then the mass
+    matrix is re-estimated at the end of each slow window of doubling length,
+    and a short final window tunes the step size for the final mass matrix.
+
+    Adapted step size and inverse mass matrix are kept in the sampler, so that
+    subsequent calls of `sample` with `burn=0` continue with the tuned values.
+    The graph of the log density is built once per model and session as well.
+
+    The tree building runs in Python, every leapfrog step evaluates the model's
+    objective and its gradient with one session run.
+
+        :param target_accept: Target mean acceptance statistic of dual averaging.
+        :param max_tree_depth: Maximum depth of the trajectory tree, the number of
+            leapfrog steps per sample is at most `2 ** max_tree_depth - 1`.
+        :param metric: Type of mass matrix, one of `identity`, `diag` or `dense`.
+        :param seed: Seed of the sampler's random number generator.
+    """
+
+    _metrics = ('identity', 'diag', 'dense')
+
+    def __init__(self, target_accept=0.8, max_tree_depth=10, metric='diag', seed=None):
+        if not 0. < target_accept < 1.:
+            raise ValueError('The target_accept parameter must be in (0, 1) interval.')
+        if max_tree_depth <= 0:
+            raise ValueError('The max_tree_depth parameter must be greater zero.')
+        if metric not in self._metrics:
+            raise ValueError('Unknown metric "{}", expected one of {}.'
+                             .format(metric, self._metrics))
+        self.target_accept = target_accept
+        self.max_tree_depth = max_tree_depth
+        self.metric = metric
+        self.step_size = None
+        self.inv_metric = None
+        self._rng = np.random.RandomState(seed)
+        self._stats = None
+        self._target = None
+
+    @property
+    def inv_metric(self):
+        """
+        Inverse mass matrix, vector of its diagonal for `identity` and `diag` metrics.
+        """
+        return self._inv_metric
+
+    @inv_metric.setter
+    def inv_metric(self, value):
+        self._inv_metric = value
+        # Momenta are drawn from N(0, M), whose Cholesky factor changes only with M.
+        self._momentum_chol = None
+        if value is not None and np.ndim(value) == 2:
+            self._momentum_chol = np.linalg.cholesky(np.linalg.inv(value))
+
+    @property
+    def stats(self):
+        """
+        Data frame with per sample statistics of the last `sample` call: mean
+        acceptance statistic, tree depth, number of leapfrog steps and whether
+        the trajectory diverged.
+        """
+        return self._stats
+
+    def sample(self, model, num_samples, burn=1000, thin=1, epsilon=None,
+               session=None, initialize=True, anchor=True, logprobs=True):
+        """
+        Samples from the distribution
+
+            pi(x) = exp(-E(x))/Z,
+
+        where `E(x)` is the objective of the gpflow model built by `build_objective`
+        method as a function of model's trainable parameters `x`.
+
+        The total number of iterations is given by:
+
+            burn + thin * num_samples
+
+        :param model: gpflow model with `build_objective` method implementation.
+        :param num_samples: number of samples to generate.
+        :param burn: number of adaptation iterations, whose samples are discarded.
+            When it is zero, step size and mass matrix from the previous call or
+            given `epsilon` and identity mass matrix are used.
+        :param thin: an integer which specifies the thinning interval.
+        :param epsilon: initial step size. By default it is found heuristically.
+        :param session: TensorFlow session. The default session or cached GPflow session
+            will be used if it is none.
+        :param initialize: indication either TensorFlow initialization is required or not.
+        :param anchor: assign the last sample to trainable parameters.
+        :param logprobs: indicates either logprob values shall be included in output or not.
+
+        :return: data frame with `num_samples` traces, where columns are full names of
+            trainable parameters except last column, which is `logprobs`.
+            Trainable parameters are represented as constrained values in output.
+
+        :raises: ValueError exception in case when wrong parameter ranges were passed.
+        """
+        if num_samples <= 0:
+            raise ValueError('The num_samples parameter must be greater zero.')
+        if thin <= 0:
+            raise ValueError('The thin parameter must be greater zero.')
+        if burn < 0:
+            raise ValueError('The burn parameter must be equal or greater zero.')
+        if epsilon is not None and epsilon <= 0:
+            raise ValueError('The epsilon parameter must be greater zero.')
+
+        session = model.enquire_session(session)
+        model.initialize(session=session, force=initialize)
+
+        params = list(model.trainable_parameters)
+        target = self._log_density(model, params, session)
+        x = target.initial_value()
+        logprob, grad = target(x)
+        if not np.isfinite(logprob) or not np.all(np.isfinite(grad)):
+            raise ValueError('Log density or its gradient is not finite at the initial state.')
+
+        size = x.size
+        if self.inv_metric is None or burn > 0 or np.shape(self.inv_metric)[0] != size:
+            self.inv_metric = _initial_inv_metric(self.metric, size)
+        if epsilon is not None:
+            self.step_size = epsilon
+        elif self.step_size is None or burn > 0:
+            self.step_size = self._find_reasonable_step_size(target, x, logprob, grad)
+
+        state = (x, logprob, grad)
+        if burn > 0:
+            state = self._adapt(target, state, burn)
+
+        xs, logprob_trace, stats = [], [], []
+        for _ in range(num_samples):
+            for _ in range(thin):
+                state, step_stats = self._transition(target, state, self.step_size)
+            xs.append(state[0])
+            logprob_trace.append(state[1])
+            stats.append(step_stats)
+
+        self._stats = pd.DataFrame(stats, columns=['accept_stat', 'tree_depth',
+                                                   'num_steps', 'diverged'])
+
+        names = [param.pathname for param in params]
+        constrained = target.constrained(np.stack(xs))
+        if anchor:
+            model.assign(dict(zip(names, [c[-1] for c in constrained])), session=session)
+
+        traces = dict(zip(names, map(list, constrained)))
+        if logprobs:
+            traces.update({'logprobs': np.array(logprob_trace)})
+        return pd.DataFrame(traces)
+
+    def make_optimize_tensor(self, model, session=None, var_list=None, **kwargs):
+        raise NotImplementedError('NUTS does not provide make_optimize_tensor method')
+
+    def minimize(self, model, **kwargs):
+        raise NotImplementedError('NUTS does not provide minimize method, use `sample` instead.')
+
+    def _log_density(self, model, params, session):
+        key = [model, session] + params
+        if self._target is None or len(self._target[0]) != len(key) or \
+                any(a is not b for a, b in zip(self._target[0], key)):
+            self._target = (key, _LogDensity(model, params, session))
+        return self._target[1]
+
+    def _adapt(self, target, state, burn):
+        schedule = _adaptation_windows(burn)
+        averaging = _DualAveraging(self.step_size, self.target_accept)
+        window = []
+        for i in range(burn):
+            state, stats = self._transition(target, state, averaging.step_size)
+            averaging.update(stats[0])
+            if schedule[i] is None:
+                continue
+            window.append(state[0])
+            if schedule[i]:
+                self.inv_metric = _estimate_inv_metric(self.metric, np.stack(window))
+                window = []
+                x, logprob, grad = state
+                step_size = self._find_reasonable_step_size(target, x, logprob, grad,
+                                                            averaging.step_size)
+                averaging = _DualAveraging(step_size, self.target_accept)
+        self.step_size = averaging.final_step_size
+        return state
+
+    def _find_reasonable_step_size(self, target, x, logprob, grad, step_size=1.0):
+        momentum = self._sample_momentum(x.size)
+        joint = logprob - self._kinetic(momentum)
+
+        def log_accept(eps):
+            _, r_new, lp_new, _ = self._leapfrog(target, x, momentum, grad, eps)
+            value = lp_new - self._kinetic(r_new) - joint
+            return value if np.isfinite(value) else -np.inf
+
+        direction = 1. if log_accept(step_size) > np.log(0.5) else -1.
+        for _ in range(100):
+            if direction * log_accept(step_size) <= direction * np.log(0.5):
+                break
+            step_size *= 2. ** direction
+        return step_size
+
+    def _transition(self, target, state, step_size):
+        x, logprob, grad = state
+        momentum = self._sample_momentum(x.size)
+        joint = logprob - self._kinetic(momentum)
+        logu = joint + np.log(self._rng.uniform())
+
+        left = right = _TreeEdge(x, momentum, grad)
+        sample = state
+        depth, n, proceed = 0, 1, True
+        accept_sum, accept_num = 0., 0
+        diverged = False
+        while proceed and depth < self.max_tree_depth:
+            direction = 1 if self._rng.uniform() < 0.5 else -1
+            edge = right if direction == 1 else left
+            tree = self._build_tree(target, edge, logu, direction, depth, step_size, joint)
+            if direction == 1:
+                right = tree.right
+            else:
+                left = tree.left
+            if tree.proceed and self._rng.uniform() < tree.n / n:
+                sample = tree.sample
+            n += tree.n
+            accept_sum += tree.accept_sum
+            accept_num += tree.accept_num
+            diverged = diverged or tree.diverged
+            proceed = tree.proceed and self._no_u_turn(left, right)
+            depth += 1
+
+        accept_stat = accept_sum / max(accept_num, 1)
+        return sample, (accept_stat, depth, accept_num, diverged)
+
+    def _build_tree(self, target, edge, logu, direction, depth, step_size, joint_init):
+        if depth == 0:
+            x, r, logprob, grad = self._leapfrog(target, edge.x, edge.r, edge.grad,
+                                                 direction * step_size)
+            joint = logprob - self._kinetic(r)
+            if not np.isfinite(joint):
+                joint = -np.inf
+            n = int(logu <= joint)
+            diverged = logu - _MAX_ENERGY_ERROR >= joint
+            accept = min(1., np.exp(joint - joint_init)) if np.isfinite(joint) else 0.
+            leaf = _TreeEdge(x, r, grad)
+            return _Tree(leaf, leaf, (x, logprob, grad), n, not diverged,
+                         accept, 1, diverged)
+
+        inner = self._build_tree(target, edge, logu, direction, depth - 1,
+                                 step_size, joint_init)
+        if not inner.proceed:
+            return inner
+        outer_edge = inner.right if direction == 1 else inner.left
+        outer = self._build_tree(target, outer_edge, logu, direction, depth - 1,
+                                 step_size, joint_init)
+        left, right = (inner.left, outer.right) if direction == 1 else (outer.left, inner.right)
+        n = inner.n + outer.n
+        sample = inner.sample
+        if n > 0 and self._rng.uniform() < outer.n / n:
+            sample = outer.sample
+        proceed = outer.proceed and self._no_u_turn(left, right)
+        return _Tree(left, right, sample, n, proceed,
+                     inner.accept_sum + outer.accept_sum,
+                     inner.accept_num + outer.accept_num,
+                     inner.diverged or outer.diverged)
+
+    def _leapfrog(self, target, x, r, grad, step_size):
+        r = r + 0.5 * step_size * grad
+        x = x + step_size * self._velocity(r)
+        logprob, grad = target(x)
+        r = r + 0.5 * step_size * grad
+        return x, r, logprob, grad
+
+    def _no_u_turn(self, left, right):
+        dx = right.x - left.x
+        return (np.dot(dx, self._velocity(left.r)) >= 0 and
+                np.dot(dx, self._velocity(right.r)) >= 0)
+
+    def _velocity(self, r):
+        if self.inv_metric.ndim == 2:
+            return self.inv_metric.dot(r)
+        return self.inv_metric * r
+
+    def _kinetic(self, r):
+        return 0.5 * np.dot(r, self._velocity(r))
+
+    def _sample_momentum(self, size):
+        z = self._rng.randn(size)
+        if self._momentum_chol is not None:
+            return self._momentum_chol.dot(z)
+        return z / np.sqrt(self.inv_metric)
+
+
+_MAX_ENERGY_ERROR = 1000.
+
+
+class _TreeEdge:
+    def __init__(self, x, r, grad):
+        self.x = x
+        self.r = r
+        self.grad = grad
+
+
+class _Tree:
+    def __init__(self, left, right, sample, n, proceed, accept_sum, accept_num, diverged):
+        self.left = left
+        self.right = right
+        self.sample = sample
+        self.n = n
+        self.proceed = proceed
+        self.accept_sum = accept_sum
+        self.accept_num = accept_num
+        self.diverged = diverged
+
+
+class _DualAveraging:
+    """
+    Dual averaging scheme of Nesterov (2009) adapted to step size tuning by
+    Hoffman and Gelman (2014).
+    """
+
+    def __init__(self, step_size, target_accept, gamma=0.05, t0=10., kappa=0.75):
+        self.mu = np.log(10. * step_size)
+        self.target_accept = target_accept
+        self.gamma = gamma
+        self.t0 = t0
+        self.kappa = kappa
+        self.error_sum = 0.
+        self.log_step_size = np.log(step_size)
+        self.log_step_size_avg = 0.
+        self.counter = 0
+
+    @property
+    def step_size(self):
+        return np.exp(self.log_step_size)
+
+    @property
+    def final_step_size(self):
+        return np.exp(self.log_step_size_avg) if self.counter > 0 else self.step_size
+
+    def update(self, accept_stat):
+        self.counter += 1
+        t = self.counter
+        self.error_sum += self.target_accept - accept_stat
+        self.log_step_size = self.mu - self.error_sum * np.sqrt(t) / (self.gamma * (t + self.t0))
+        weight = t ** -self.kappa
+        self.log_step_size_avg = weight * self.log_step_size + (1 - weight) * self.log_step_size_avg
+
+
+class _LogDensity:
+    """
+    Log density of the model and its gradient as functions of flattened
+    unconstrained values of trainable parameters.
+    """
+
+    def __init__(self, model, params, session):
+        self._session = session
+        self._model = model
+        self._variables = [param.unconstrained_tensor for param in params]
+        with tf.name_scope('nuts'):
+            initial = pack_tensors(self._variables)
+            self._x = tf.placeholder(initial.dtype, shape=initial.shape)
+            self._xs = tf.placeholder(initial.dtype, shape=[None] + initial.shape.as_list())
+            with substitute_parameters(params, unpack_tensor(self._x, params)):
+                logprob = tf.negative(tf.reshape(model.build_objective(), []))
+            self._logprob_grad = [logprob, tf.gradients(logprob, self._x)[0]]
+
+            def constrained(x):
+                with substitute_parameters(params, unpack_tensor(x, params)):
+                    return [param.constrained_tensor for param in params]
+
+            dtypes = [param.constrained_tensor.dtype for param in params]
+            self._constrained = tf.map_fn(constrained, self._xs, dtype=dtypes, back_prop=False)
+        self._initial = initial
+
+    def initial_value(self):
+        return self._session.run(self._initial)
+
+    def __call__(self, x):
+        feed_dict = dict(self._model.feeds or {})
+        feed_dict[self._x] = x
+        try:
+            logprob, grad = self._session.run(self._logprob_grad, feed_dict=feed_dict)
+        except tf.errors.InvalidArgumentError:
+            # E.g. failed Cholesky decomposition far in the tails.
+            return -np.inf, np.zeros_like(x)
+        if not np.isfinite(logprob) or not np.all(np.isfinite(grad)):
+            return -np.inf, np.zeros_like(x)
+        return logprob, grad
+
+    def constrained(self, xs):
+        feed_dict = dict(self._model.feeds or {})
+        feed_dict[self._xs] = xs
+        return self._session.run(self._constrained, feed_dict=feed_dict)
+
+
+def _initial_inv_metric(metric, size):
+    if metric == 'dense':
+        return np.eye(size)
+    return np.ones(size)
+
+
+def _estimate_inv_metric(metric, samples):
+    """
+    Regularised estimate of the posterior covariance, shrunk towards
+    a small multiple of identity as in Stan.
+    """
+    n, size = samples.shape
+    if metric == 'identity' or n < 2:
+        return _initial_inv_metric(metric, size)
+    shrinkage = 5. / (n + 5.)
+    if metric == 'dense':
+        cov = np.atleast_2d(np.cov(samples, rowvar=False))
+        return (1. - shrinkage) * cov + 1e-3 * shrinkage * np.eye(size)
+    return (1. - shrinkage) * np.var(samples, axis=0, ddof=1) + 1e-3 * shrinkage
+
+
+def _adaptation_windows(burn, init_buffer=75, term_buffer=50, base_window=25):
+    """
+    Returns list with element per burn-in iteration: `None` for iterations
+    which only adapt step size, `False` for iterations which collect samples
+    for the mass matrix and `True` for the last iteration of a slow window.
+    """
+    if init_buffer + term_buffer + base_window > burn:
+        init_buffer = int(0.15 * burn)
+        term_buffer = int(0.1 * burn)
+        base_window = burn - init_buffer - term_buffer
+    schedule = [None] * burn
+    start, window = init_buffer, base_window
+    end_slow = burn - term_buffer
+    while start < end_slow:
+        end = start + window
+        if end + 2 * window > end_slow:
+            end = end_slow
+        for i in range(start, end):
+            schedule[i] = False
+        schedule[end - 1] = True
+        start, window = end, 2 * window
+    return schedule
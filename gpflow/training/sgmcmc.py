@@ -0,0 +1,214 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Stochastic gradient MCMC samplers. Gradients of the log density are estimated
+from minibatches, every step of the sampler draws a new minibatch from model's
+`Minibatch` data holders. The model's likelihood must be rescaled to the full
+dataset, as in `SVGP` and `SGPMC` with `minibatch_size` set.
+"""
+
+import abc
+
+import pandas as pd
+import tensorflow as tf
+
+from .hmc import _split_columns, _while_loop
+from .optimizer import Optimizer
+from .tensor_substitution import (pack_tensors, unpack_tensor, substitute_parameters,
+                                  substitute_minibatches)
+from ..decors import name_scope
+from ..params import Minibatch
+
+
+class _StochasticGradientSampler(Optimizer):
+    def __init__(self, epsilon):
+        if epsilon <= 0:
+            raise ValueError('The epsilon parameter must be greater zero.')
+        self.epsilon = epsilon
+
+    def sample(self, model, num_samples, thin=1, burn=0,
+               session=None, initialize=True, anchor=True, logprobs=True):
+        """
+        Generates samples of model's trainable parameters. The whole chain runs
+        in one TensorFlow while loop.
+
+        The total number of iterations is given by:
+
+            burn + thin * num_samples
+
+        :param model: gpflow model with `build_objective` method implementation.
+        :param num_samples: number of samples to generate.
+        :param thin: an integer which specifies the thinning interval.
+        :param burn: an integer which specifies how many initial samples to discard.
+        :param session: TensorFlow session. The default session or cached GPflow session
+            will be used if it is none.
+        :param initialize: indication either TensorFlow initialization is required or not.
+        :param anchor: assign the last sample to trainable parameters.
+        :param logprobs: indicates either logprob values shall be included in output or not.
+            They are minibatch estimates of the log density, evaluated before the
+            last update of each sample.
+
+        :return: data frame with `num_samples` traces, where columns are full names of
+            trainable parameters except last column, which is `logprobs`.
+            Trainable parameters are represented as constrained values in output.
+
+        :raises: ValueError exception in case when wrong parameter ranges were passed.
+        """
+        if num_samples <= 0:
+            raise ValueError('The num_samples parameter must be greater zero.')
+        if thin <= 0:
+            raise ValueError('The thin parameter must be greater zero.')
+        if burn < 0:
+            raise ValueError('The burn parameter must be equal or greater zero.')
+
+        session = model.enquire_session(session)
+        model.initialize(session=session, force=initialize)
+
+        with tf.name_scope(self.__class__.__name__.lower()):
+            params = list(model.trainable_parameters)
+            variables = [p.unconstrained_tensor for p in params]
+            minibatches = [d for d in model.data_holders if isinstance(d, Minibatch)]
+
+            def logprob_grad(x):
+                tensors = unpack_tensor(x, params)
+                with substitute_parameters(params, tensors), substitute_minibatches(minibatches):
+                    logprob = tf.negative(tf.reshape(model.build_objective(), []))
+                return logprob, tf.gradients(logprob, x)[0]
+
+            x = pack_tensors(variables)
+            state = [x, tf.zeros([], dtype=x.dtype)] + self._init_state(x)
+
+            def iterate(num_steps, state):
+                def cond(i, *_state):
+                    return i < num_steps
+
+                def body(i, x, _logprob, *extra):
+                    logprob, grad = logprob_grad(x)
+                    x_new, extra_new = self._step(x, grad, list(extra))
+                    return [i + 1, x_new, logprob] + extra_new
+
+                return _while_loop(cond, body, [0] + state)[1:]
+
+            if burn > 0:
+                state = iterate(burn, state)
+
+            x_array = tf.TensorArray(x.dtype, size=num_samples)
+            logprob_array = tf.TensorArray(x.dtype, size=num_samples)
+
+            def cond(i, *_args):
+                return i < num_samples
+
+            def body(i, x_ta, logprob_ta, *state):
+                state = iterate(thin, list(state))
+                return [i + 1, x_ta.write(i, state[0]), logprob_ta.write(i, state[1])] + state
+
+            result = _while_loop(cond, body, [0, x_array, logprob_array] + state)
+            x_trace, logprob_trace = result[1].stack(), result[2].stack()
+            x_last = result[3]
+
+            unconstrained_trace = [tf.reshape(t, [-1] + p.unconstrained_tensor.shape.as_list())
+                                   for t, p in zip(_split_columns(x_trace, params), params)]
+            constrained_trace = [p.transform.forward_tensor(t)
+                                 for t, p in zip(unconstrained_trace, params)]
+            if anchor:
+                last = unpack_tensor(x_last, params)
+                assigns = [tf.assign(var, value) for var, value in zip(variables, last)]
+                with tf.control_dependencies(assigns):
+                    logprob_trace = tf.identity(logprob_trace)
+            output = constrained_trace + [logprob_trace]
+
+        raw_traces = session.run(output, feed_dict=model.feeds)
+
+        if anchor:
+            model.anchor(session)
+
+        names = [p.pathname for p in params]
+        traces = dict(zip(names, map(list, raw_traces[:-1])))
+        if logprobs:
+            traces.update({'logprobs': raw_traces[-1]})
+        return pd.DataFrame(traces)
+
+    def make_optimize_tensor(self, model, session=None, var_list=None, **kwargs):
+        raise NotImplementedError('{} does not provide make_optimize_tensor method'
+                                  .format(self.__class__.__name__))
+
+    def minimize(self, model, **kwargs):
+        raise NotImplementedError('{} does not provide minimize method, use `sample` instead.'
+                                  .format(self.__class__.__name__))
+
+    def _init_state(self, x):
+        return []
+
+    @abc.abstractmethod
+    def _step(self, x, grad, state):
+        """
+        Builds one update of the flat unconstrained state `x` from the stochastic
+        gradient of the log density. Returns the new state and the list of new
+        values of sampler's auxiliary variables, e.g. momentum.
+        """
+        raise NotImplementedError
+
+
+class SGLD(_StochasticGradientSampler):
+    """
+    Stochastic gradient Langevin dynamics of Welling and Teh (2011):
+
+        x <- x + epsilon / 2 * grad log p(x) + N(0, epsilon).
+
+    Metropolis correction is omitted, so the samples are biased for large step
+    sizes.
+
+        :param epsilon: Step size.
+    """
+
+    @name_scope('sgld_step')
+    def _step(self, x, grad, state):
+        epsilon = tf.cast(self.epsilon, x.dtype)
+        noise = tf.random_normal(tf.shape(x), dtype=x.dtype) * tf.sqrt(epsilon)
+        return x + 0.5 * epsilon * grad + noise, []
+
+
+class SGHMC(_StochasticGradientSampler):
+    """
+    Stochastic gradient Hamiltonian Monte Carlo of Chen, Fox and Guestrin (2014),
+    in the parametrisation with learning rate `epsilon` and friction `friction`:
+
+        v <- (1 - friction) * v + epsilon * grad log p(x) + N(0, 2 * friction * epsilon),
+        x <- x + v.
+
+    The noise of the gradient estimate is assumed to be dominated by friction.
+    Momentum `v` starts from zero at every `sample` call.
+
+        :param epsilon: Learning rate.
+        :param friction: Friction term in (0, 1].
+    """
+
+    def __init__(self, epsilon, friction=0.1):
+        super(SGHMC, self).__init__(epsilon)
+        if not 0. < friction <= 1.:
+            raise ValueError('The friction parameter must be in (0, 1] interval.')
+        self.friction = friction
+
+    def _init_state(self, x):
+        return [tf.zeros_like(x)]
+
+    @name_scope('sghmc_step')
+    def _step(self, x, grad, state):
+        momentum, = state
+        epsilon = tf.cast(self.epsilon, x.dtype)
+        friction = tf.cast(self.friction, x.dtype)
+        noise = tf.random_normal(tf.shape(x), dtype=x.dtype) * tf.sqrt(2. * friction * epsilon)
+        momentum = (1. - friction) * momentum + epsilon * grad + noise
+        return x + momentum, [momentum]
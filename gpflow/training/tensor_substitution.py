@@ -0,0 +1,121 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Utilities for rebuilding model tensors inside TensorFlow control flow.
+
+Parameters' constrained tensors and data holders' tensors are built once,
+outside of any loop. Inside the body of `tf.while_loop` such tensors are loop
+invariants and keep the value they had when the loop was entered. Optimizers
+and samplers that run many steps per `session.run` substitute them with
+tensors created inside the loop body while the objective is being rebuilt.
+"""
+
+import contextlib
+
+import numpy as np
+import tensorflow as tf
+
+from ..core.errors import GPflowError
+from ..params import Minibatch
+
+
+def pack_tensors(tensors):
+    """
+    Concatenates list of tensors into single flat vector.
+    """
+    return tf.concat([tf.reshape(t, [-1]) for t in tensors], axis=0)
+
+
+def unpack_tensor(flat, params):
+    """
+    Splits flat vector back into tensors with shapes of unconstrained parameters.
+    """
+    shapes = []
+    for param in params:
+        if not param.fixed_shape:
+            raise GPflowError('Parameter "{}" must have fixed shape.'.format(param.pathname))
+        shapes.append(param.unconstrained_tensor.shape.as_list())
+    sizes = [int(np.prod(shape)) for shape in shapes]
+    chunks = tf.split(flat, sizes)
+    return [tf.reshape(chunk, shape) for chunk, shape in zip(chunks, shapes)]
+
+
+@contextlib.contextmanager
+def substitute_parameters(params, tensors):
+    """
+    Context manager which temporarily replaces unconstrained tensors of
+    parameters by the given tensors, so that objective built inside the context
+    is a function of these tensors instead of parameters' variables.
+    Constrained tensors are rebuilt accordingly.
+
+        :param params: List of GPflow parameters.
+        :param tensors: List of unconstrained tensors, one per parameter.
+    """
+    saved = [(p._unconstrained_tensor, p._constrained_tensor) for p in params]
+    try:
+        for param, tensor in zip(params, tensors):
+            param._unconstrained_tensor = tensor
+            param._constrained_tensor = param._build_constrained(tensor)
+        yield
+    finally:
+        for param, (unconstrained, constrained) in zip(params, saved):
+            param._unconstrained_tensor = unconstrained
+            param._constrained_tensor = constrained
+
+
+@contextlib.contextmanager
+def substitute_minibatches(minibatches):
+    """
+    Context manager which temporarily replaces minibatch tensors with new
+    `get_next` calls of their dataset iterators. Every evaluation of a tensor
+    built inside the context advances the iterators.
+
+        :param minibatches: List of GPflow minibatch data holders.
+    """
+    saved = [mb._dataholder_tensor for mb in minibatches]
+    try:
+        for minibatch in minibatches:
+            minibatch._dataholder_tensor = minibatch._iterator_tensor.get_next()
+        yield
+    finally:
+        for minibatch, tensor in zip(minibatches, saved):
+            minibatch._dataholder_tensor = tensor
+
+
+@contextlib.contextmanager
+def rebuild_model_tensors(model, params=None):
+    """
+    Context manager which rebuilds tensors of trainable parameters from fresh
+    reads of their variables and advances model's minibatches. Objective built
+    inside the context can be evaluated at every iteration of a `tf.while_loop`.
+
+        :param model: GPflow model.
+        :param params: Additional parameters to rebuild regardless of their
+            trainable flag, e.g. parameters assigned inside the loop.
+    """
+    rebuilt = list(model.trainable_parameters)
+    for param in params or []:
+        if not any(param is p for p in rebuilt):
+            rebuilt.append(param)
+    reads = [_read_value(p.unconstrained_tensor) for p in rebuilt]
+    minibatches = [d for d in model.data_holders if isinstance(d, Minibatch)]
+    with substitute_parameters(rebuilt, reads), substitute_minibatches(minibatches):
+        yield
+
+
+def _read_value(tensor):
+    if isinstance(tensor, tf.Variable):
+        return tensor.read_value()
+    return tensor
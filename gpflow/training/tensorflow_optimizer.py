@@ -18,6 +18,7 @@ import tensorflow as tf
 
 from . import optimizer
 from .. import misc
+from .tensor_substitution import rebuild_model_tensors
 from ..actions import Optimization
 from ..models.model import Model
 
@@ -32,8 +33,9 @@ class _TensorFlowOptimizer(optimizer.Optimizer):
         super().__init__()
         self._optimizer = tf_optimizer(*args, **kwargs)
         self._minimize_operation = None
+        self._num_steps = None
     
-    def make_optimize_tensor(self, model, session=None, var_list=None, **kwargs):
+    def make_optimize_tensor(self, model, session=None, var_list=None, steps_per_run=1, **kwargs):
         """
         Make Tensorflow optimization tensor.
         This method builds optimization tensor and initializes all necessary variables
@@ -42,20 +44,29 @@ class _TensorFlowOptimizer(optimizer.Optimizer):
             :param model: GPflow model.
             :param session: Tensorflow session.
             :param var_list: List of variables for training.
+            :param steps_per_run: Number of optimization steps performed by single run of
+                the returned operation. When it is greater than one, the steps are wrapped
+                in a `tf.while_loop` and minibatches are advanced at every step.
             :param kwargs: Dictionary of extra parameters passed to Tensorflow
                 optimizer's minimize method.
             :return: Tensorflow optimization tensor or operation.
         """
+        if steps_per_run < 1:
+            raise ValueError('The steps_per_run parameter must be greater zero.')
+        self._num_steps = None
         session = model.enquire_session(session)
         objective = model.objective
         full_var_list = self._gen_var_list(model, var_list)
         # Create optimizer variables before initialization.
         with session.as_default():
-            minimize = self.optimizer.minimize(objective, var_list=full_var_list, **kwargs)
+            if steps_per_run > 1:
+                minimize = self._build_multistep(model, full_var_list, steps_per_run, **kwargs)
+            else:
+                minimize = self.optimizer.minimize(objective, var_list=full_var_list, **kwargs)
             model.initialize(session=session)
             self._initialize_optimizer(session)
             return minimize
-    
+
     def make_optimize_action(self, model, session=None, var_list=None, **kwargs):
         """
         Build Optimization action task with Tensorflow optimizer.
@@ -79,10 +90,13 @@ class _TensorFlowOptimizer(optimizer.Optimizer):
         opt.with_model(model)
         opt.with_optimizer_tensor(optimizer_tensor)
         opt.with_run_kwargs(**run_kwargs)
+        if self._num_steps is not None:
+            opt.with_steps_tensor(self._num_steps)
         return opt
     
     def minimize(self, model, session=None, var_list=None, feed_dict=None,
-                 maxiter=1000, initialize=False, anchor=True, step_callback=None, **kwargs):
+                 maxiter=1000, initialize=False, anchor=True, step_callback=None,
+                 steps_per_run=1, **kwargs):
         """
         Minimizes objective function of the model.
 
@@ -97,8 +111,12 @@ class _TensorFlowOptimizer(optimizer.Optimizer):
             particular session will be synchronized with internal parameter values.
         :param step_callback: A callback function to execute at each optimization step.
             The callback should accept variable argument list, where first argument is
-            optimization step number.
+            optimization step number. In multi-step mode the callback is executed once
+            per `steps_per_run` steps with the number of the last performed step and
+            the number of performed steps in the `num_steps` keyword argument.
         :type step_callback: Callable[[], None]
+        :param steps_per_run: Number of optimization steps performed by single
+            `session.run` call.
         :param kwargs: This is a dictionary of extra parameters for session run method.
         """
 
@@ -108,21 +126,60 @@ class _TensorFlowOptimizer(optimizer.Optimizer):
         opt = self.make_optimize_action(model,
             session=session,
             var_list=var_list,
-            feed_dict=feed_dict, **kwargs)
+            feed_dict=feed_dict,
+            steps_per_run=steps_per_run, **kwargs)
 
         self._model = opt.model
         self._minimize_operation = opt.optimizer_tensor
 
         session = model.enquire_session(session)
         with session.as_default():
-            for step in range(maxiter):
+            for start in range(0, maxiter, steps_per_run):
+                num_steps = min(steps_per_run, maxiter - start)
+                if num_steps != steps_per_run:
+                    # The last chunk runs remaining steps only.
+                    opt.with_steps_per_run(num_steps)
                 opt()
-                if step_callback is not None:
-                    step_callback(step)
+                if step_callback is not None and steps_per_run > 1:
+                    step_callback(start + num_steps - 1, num_steps=num_steps)
+                elif step_callback is not None:
+                    step_callback(start)
 
         if anchor:
             opt.model.anchor(session)
 
+    def _build_multistep(self, model, var_list, steps_per_run, global_step=None, **_kwargs):
+        """
+        Builds `tf.while_loop` operation which performs `steps_per_run` optimization
+        steps. The objective is rebuilt inside the loop body, so that each step
+        reads current values of variables and draws a new minibatch.
+        """
+        with tf.name_scope('{}_multistep'.format(self.__class__.__name__)):
+            # Slot variables of the optimizer must not be created inside the loop,
+            # where their initializers could not be run. The loop body finds them.
+            self.optimizer._create_slots(var_list)
+            self._num_steps = tf.placeholder_with_default(
+                tf.constant(steps_per_run, dtype=tf.int32), shape=[], name='num_steps')
+            params = list(model.trainable_parameters)
+            variables = [p.unconstrained_tensor for p in params]
+
+            def cond(i):
+                return i < self._num_steps
+
+            def body(i):
+                with rebuild_model_tensors(model):
+                    objective = model.build_objective()
+                    reads = {id(v): p.unconstrained_tensor for v, p in zip(variables, params)}
+                targets = [reads.get(id(v), v) for v in var_list]
+                grads = tf.gradients(objective, targets)
+                grads_and_vars = [(g, v) for g, v in zip(grads, var_list) if g is not None]
+                apply = self.optimizer.apply_gradients(grads_and_vars, global_step=global_step)
+                with tf.control_dependencies([apply]):
+                    return i + 1
+
+            return tf.while_loop(cond, body, [tf.constant(0)], parallel_iterations=1,
+                                 back_prop=False)
+
     def _initialize_optimizer(self, session: tf.Session):
         var_list = self.optimizer.variables()
         misc.initialize_variables(var_list, session=session, force=False)
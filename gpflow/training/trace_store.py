@@ -0,0 +1,118 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+import h5py
+import numpy as np
+import pandas as pd
+
+from ..core.errors import GPflowError
+
+
+class HDF5TraceStore:
+    """
+    Append-only columnar store of MCMC traces in HDF5 file. Every column of the
+    trace (parameter full name or `logprobs`) is kept in a separate chunked and
+    compressed dataset, whose first dimension is the sample index. The file is
+    opened only while a chunk is being written or read, so the store stays
+    consistent when sampling is interrupted between chunks.
+
+        :param pathname: Path to HDF5 file. It is created by the first `append`.
+        :param compression: Compression filter of datasets, `None` disables it.
+    """
+
+    _group = 'traces'
+
+    def __init__(self, pathname, compression='gzip'):
+        self.pathname = pathname
+        self.compression = compression
+
+    @property
+    def columns(self):
+        if not os.path.exists(self.pathname):
+            return []
+        with h5py.File(self.pathname, 'r') as h5file:
+            return self._columns(h5file)
+
+    def __len__(self):
+        if not os.path.exists(self.pathname):
+            return 0
+        with h5py.File(self.pathname, 'r') as h5file:
+            return int(h5file.attrs.get('num_samples', 0))
+
+    def append(self, frame):
+        """
+        Appends chunk of samples to the store.
+
+        :param frame: data frame in the format of `HMC.sample` output.
+        """
+        columns = list(frame.columns)
+        with h5py.File(self.pathname, 'a') as h5file:
+            stored = self._columns(h5file)
+            if stored and set(stored) != set(columns):
+                raise GPflowError('Trace columns {} do not match columns {} of the store.'
+                                  .format(columns, stored))
+            num_samples = int(h5file.attrs.get('num_samples', 0))
+            group = h5file.require_group(self._group)
+            for column in columns:
+                values = np.stack(frame[column].values)
+                if column not in group:
+                    group.create_dataset(column, shape=(0,) + values.shape[1:],
+                                         maxshape=(None,) + values.shape[1:],
+                                         dtype=values.dtype, chunks=True,
+                                         compression=self.compression)
+                dataset = group[column]
+                dataset.resize(num_samples + len(values), axis=0)
+                dataset[num_samples:] = values
+            h5file.attrs['columns'] = json.dumps(columns)
+            h5file.attrs['num_samples'] = num_samples + len(frame)
+
+    def read(self, columns=None, start=0, stop=None):
+        """
+        Reads range of samples from the store. Only requested slices of requested
+        columns are loaded in memory.
+
+        :param columns: list of column names, all columns are read by default.
+        :param start: index of the first sample.
+        :param stop: index after the last sample, by default the end of the store.
+        :return: data frame in the format of `HMC.sample` output.
+        :raises GPflowError: the file of the store does not exist.
+        """
+        if not os.path.exists(self.pathname):
+            raise GPflowError('Trace store "{}" does not exist.'.format(self.pathname))
+        with h5py.File(self.pathname, 'r') as h5file:
+            columns = self._columns(h5file) if columns is None else columns
+            num_samples = int(h5file.attrs.get('num_samples', 0))
+            stop = num_samples if stop is None else min(stop, num_samples)
+            traces = {}
+            for column in columns:
+                values = h5file[self._group][column][start:stop]
+                traces[column] = values if values.ndim == 1 else list(values)
+            return pd.DataFrame(traces, columns=columns)
+
+    def last_sample(self):
+        """
+        Returns dictionary of parameter values of the last stored sample.
+        """
+        if len(self) == 0:
+            raise GPflowError('Trace store "{}" is empty.'.format(self.pathname))
+        last = self.read(start=len(self) - 1)
+        return {name: last[name].iloc[0] for name in last.columns if name != 'logprobs'}
+
+    def _columns(self, h5file):
+        if 'columns' not in h5file.attrs:
+            return []
+        return json.loads(h5file.attrs['columns'])
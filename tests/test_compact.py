@@ -0,0 +1,111 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+import gpflow
+from gpflow.test_util import session_tf
+
+
+class Datum:
+    rng = np.random.RandomState(0)
+    X = rng.rand(40, 1)
+    Y = np.sin(6 * X) + 0.1 * rng.randn(40, 1)
+    Xtest = np.linspace(0, 1, 7)[:, None]
+    radius = 0.2
+
+
+def _wendland_reference(r, q, input_dim):
+    j = input_dim // 2 + q + 1
+    polys = [1.,
+             (j + 1) * r + 1,
+             ((j ** 2 + 4 * j + 3) * r ** 2 + (3 * j + 6) * r + 3) / 3.,
+             ((j ** 3 + 9 * j ** 2 + 23 * j + 15) * r ** 3 +
+              (6 * j ** 2 + 36 * j + 45) * r ** 2 + (15 * j + 45) * r + 15) / 15.]
+    return np.maximum(1. - r, 0.) ** (j + q) * polys[q]
+
+
+@pytest.mark.parametrize('q', [0, 1, 2, 3])
+def test_wendland_kernel(session_tf, q):
+    X = np.random.RandomState(1).rand(10, 3)
+    kern = gpflow.kernels.Wendland(3, variance=2., lengthscales=0.7, q=q)
+    r = np.sqrt(np.sum(np.square(X[:, None, :] - X[None, :, :]), -1)) / 0.7
+    K = kern.compute_K_symm(X)
+    assert_allclose(K, 2. * _wendland_reference(r, q, 3), atol=1e-10)
+    assert np.all(K[r >= 1.] == 0.)
+    assert np.any(K[r < 1.] > 0.)
+    with pytest.raises(ValueError):
+        gpflow.kernels.Wendland(3, q=4)
+
+
+def _kernel():
+    with gpflow.defer_build():
+        kern = gpflow.kernels.Wendland(1, lengthscales=0.15, q=1)
+        kern.lengthscales.transform = gpflow.transforms.Logistic(0., Datum.radius)
+    return kern
+
+
+def _models(**kwargs):
+    m = gpflow.models.CompactGPR(Datum.X, Datum.Y, _kernel(), Datum.radius,
+                                 mean_function=gpflow.mean_functions.Constant(0.2), **kwargs)
+    gpr = gpflow.models.GPR(Datum.X, Datum.Y, _kernel(),
+                            mean_function=gpflow.mean_functions.Constant(0.2))
+    for model in [m, gpr]:
+        model.likelihood.variance = 0.1
+    return m, gpr
+
+
+def test_compact_predict_vs_gpr(session_tf):
+    m, gpr = _models(cg_tolerance=1e-10)
+    assert m.nnz < Datum.X.shape[0] ** 2
+    for predict, predict_gpr in [(m.predict_f, gpr.predict_f),
+                                 (m.predict_f_full_cov, gpr.predict_f_full_cov),
+                                 (m.predict_y, gpr.predict_y)]:
+        mean, var = predict(Datum.Xtest)
+        mean_gpr, var_gpr = predict_gpr(Datum.Xtest)
+        assert_allclose(mean, mean_gpr, atol=1e-6)
+        assert_allclose(var, var_gpr, atol=1e-6)
+
+
+def test_compact_likelihood_estimate(session_tf):
+    m, gpr = _models(num_probes=100, num_lanczos=40, cg_tolerance=1e-10)
+    estimates = [m.compute_log_likelihood() for _ in range(10)]
+    assert_allclose(np.mean(estimates), gpr.compute_log_likelihood(), atol=1.)
+
+
+def test_compact_optimize(session_tf):
+    m, _ = _models()
+    lengthscale = m.kern.lengthscales.read_value()
+    gpflow.train.AdamOptimizer(0.01).minimize(m, maxiter=10)
+    assert m.kern.lengthscales.read_value() != lengthscale
+    assert m.kern.lengthscales.read_value() < Datum.radius
+
+
+def test_compact_fixed_probes(session_tf):
+    m, gpr = _models(num_probes=100, num_lanczos=40, cg_tolerance=1e-10, probe_seed=1)
+    lml = m.compute_log_likelihood()
+    assert lml == m.compute_log_likelihood()
+    assert_allclose(lml, gpr.compute_log_likelihood(), atol=1.)
+    gpflow.train.ScipyOptimizer().minimize(m, maxiter=20)
+    assert m.compute_log_likelihood() > lml
+    assert m.kern.lengthscales.read_value() < Datum.radius
+
+
+def test_compact_errors():
+    with pytest.raises(ValueError):
+        gpflow.models.CompactGPR(Datum.X, Datum.Y, _kernel(), radius=0.)
+    with pytest.raises(ValueError):
+        gpflow.models.CompactGPR(Datum.X, Datum.Y, _kernel(), Datum.radius, num_probes=0)
@@ -160,5 +160,42 @@ class WhitenTestGaussian(WhitenTest):
             assert_allclose(var_difference, 0, atol=4)
 
 
+class StructuredQSqrtTest(GPflowTestCase):
+    """
+    Structured square roots of q(u) covariances give the same conditionals as
+    equivalent lower triangular square roots.
+    """
+    def test_structured(self):
+        rng = np.random.RandomState(0)
+        M, N, R, k = 6, 5, 3, 2
+        Kmm = rng.randn(M, M)
+        Kmm = Kmm @ Kmm.T + np.eye(M)
+        Kmn = rng.randn(M, N)
+        Knn_full = rng.randn(N, N)
+        Knn_full = Knn_full @ Knn_full.T + 10 * np.eye(N)
+        f = rng.randn(M, R)
+        diag, factor = rng.rand(M, R) + 0.5, rng.randn(R, M, k)
+        dense_lowrank = np.linalg.cholesky(
+            np.stack([np.diag(diag[:, r] ** 2) + factor[r] @ factor[r].T for r in range(R)]))
+        shared = np.tril(rng.randn(M, M))
+        dense_shared = np.tile(shared[None, :, :], [R, 1, 1])
+        structures = [(gpflow.covariance_factors.LowRankPlusDiagonal(tf.identity(diag), tf.identity(factor)),
+                       dense_lowrank),
+                      (gpflow.covariance_factors.SharedFactor(tf.identity(shared)), dense_shared)]
+        with self.test_context() as sess:
+            for structured, dense in structures:
+                for white in [True, False]:
+                    for full_cov in [True, False]:
+                        Knn = Knn_full if full_cov else np.diag(Knn_full)
+                        args = [tf.identity(a) for a in (Kmn, Kmm, Knn, f)]
+                        expected = gpflow.conditionals.base_conditional(
+                            *args, full_cov=full_cov, q_sqrt=tf.identity(dense), white=white)
+                        result = gpflow.conditionals.base_conditional(
+                            *args, full_cov=full_cov, q_sqrt=structured, white=white)
+                        expected, result = sess.run([expected, result])
+                        assert_allclose(result[0], expected[0])
+                        assert_allclose(result[1], expected[1])
+
+
 if __name__ == '__main__':
     tf.test.main()
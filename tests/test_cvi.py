@@ -0,0 +1,107 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+import gpflow
+from gpflow.test_util import session_tf
+
+
+class Datum:
+    rng = np.random.RandomState(0)
+    X = rng.rand(20, 1)
+    Y = np.sin(6 * X) + 0.1 * rng.randn(20, 1)
+    Xtest = np.linspace(0, 1, 7)[:, None]
+
+
+def test_cvi_gaussian_vs_gpr(session_tf):
+    lik = gpflow.likelihoods.Gaussian()
+    lik.variance = 0.1
+    m = gpflow.models.VGP_CVI(Datum.X, Datum.Y, gpflow.kernels.RBF(1), lik,
+                              mean_function=gpflow.mean_functions.Constant(0.3))
+    gpr = gpflow.models.GPR(Datum.X, Datum.Y, gpflow.kernels.RBF(1),
+                            mean_function=gpflow.mean_functions.Constant(0.3))
+    gpr.likelihood.variance = 0.1
+
+    gpflow.train.CVIOptimizer(rho=1.).minimize(m, maxiter=1)
+
+    assert_allclose(m.site_precision.read_value(), 10. * np.ones((20, 1)))
+    assert_allclose(m.compute_log_likelihood(), gpr.compute_log_likelihood(), rtol=1e-6)
+    for predict, predict_gpr in [(m.predict_f, gpr.predict_f),
+                                 (m.predict_f_full_cov, gpr.predict_f_full_cov)]:
+        mean, var = predict(Datum.Xtest)
+        mean_gpr, var_gpr = predict_gpr(Datum.Xtest)
+        assert_allclose(mean, mean_gpr, atol=1e-6)
+        assert_allclose(var, var_gpr, atol=1e-6)
+
+
+def test_cvi_vs_vgp_bernoulli(session_tf):
+    Y = (Datum.Y > 0).astype(float)
+    m = gpflow.models.VGP_CVI(Datum.X, Y, gpflow.kernels.RBF(1), gpflow.likelihoods.Bernoulli())
+    vgp = gpflow.models.VGP(Datum.X, Y, gpflow.kernels.RBF(1), gpflow.likelihoods.Bernoulli())
+
+    gpflow.train.CVIOptimizer(rho=0.5).minimize(m, maxiter=50)
+    vgp.kern.set_trainable(False)
+    gpflow.train.ScipyOptimizer().minimize(vgp, maxiter=2000)
+
+    assert_allclose(m.compute_log_likelihood(), vgp.compute_log_likelihood(), rtol=1e-3)
+    mean, var = m.predict_f(Datum.Xtest)
+    mean_vgp, var_vgp = vgp.predict_f(Datum.Xtest)
+    assert_allclose(mean, mean_vgp, atol=1e-2)
+    assert_allclose(var, var_vgp, atol=1e-2)
+
+
+def test_cvi_with_hyperparameters(session_tf):
+    Y = (Datum.Y > 0).astype(float)
+    m = gpflow.models.VGP_CVI(Datum.X, Y, gpflow.kernels.RBF(1), gpflow.likelihoods.Bernoulli())
+    cvi = gpflow.train.CVIOptimizer(rho=0.5)
+    adam = gpflow.train.AdamOptimizer(0.01)
+    cvi_action = cvi.make_optimize_action(m)
+    adam_action = adam.make_optimize_action(m)
+    lml_before = m.compute_log_likelihood()
+    for _ in range(20):
+        cvi_action()
+        adam_action()
+    m.anchor(m.enquire_session())
+    assert m.compute_log_likelihood() > lml_before
+    assert set(p.pathname for p in m.trainable_parameters) == \
+        {m.kern.lengthscales.pathname, m.kern.variance.pathname}
+
+
+def test_cvi_student_t_clipped_precisions(session_tf):
+    # Outliers make site precisions of the Student-t likelihood negative.
+    Y = Datum.Y.copy()
+    Y[::5] += 5.
+    lik = gpflow.likelihoods.StudentT(df=3.)
+    lik.scale = 0.1
+    m = gpflow.models.VGP_CVI(Datum.X, Y, gpflow.kernels.RBF(1), lik)
+    gpflow.train.CVIOptimizer(rho=0.5).minimize(m, maxiter=20)
+
+    precision = m.site_precision.read_value()
+    assert np.all(np.isfinite(precision)) and np.all(np.isfinite(m.site_nat1.read_value()))
+    lower = m.site_precision.transform._lower
+    assert_allclose(precision.min(), lower + 1e-8, rtol=1e-4)
+    assert np.isfinite(m.compute_log_likelihood())
+
+
+def test_cvi_wrong_model(session_tf):
+    m = gpflow.models.GPR(Datum.X, Datum.Y, gpflow.kernels.RBF(1))
+    with pytest.raises(ValueError):
+        gpflow.train.CVIOptimizer().minimize(m, maxiter=1)
+    with pytest.raises(ValueError):
+        gpflow.train.CVIOptimizer(rho=0.)
+    with pytest.raises(ValueError):
+        gpflow.train.CVIOptimizer(min_precision=0.)
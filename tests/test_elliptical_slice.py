@@ -0,0 +1,82 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import tensorflow as tf
+from numpy.testing import assert_allclose, assert_almost_equal
+
+import gpflow
+from gpflow.test_util import GPflowTestCase
+
+
+class EllipticalSliceTest(GPflowTestCase):
+    def prepare(self, likelihood):
+        rng = np.random.RandomState(0)
+        X = rng.rand(10, 1)
+        Y = np.sin(6 * X) + 0.1 * rng.randn(10, 1)
+        m = gpflow.models.GPMC(X, Y, kern=gpflow.kernels.RBF(1, lengthscales=0.3),
+                               likelihood=likelihood)
+        return m, X, Y
+
+    def test_gaussian_posterior(self):
+        with self.test_context():
+            tf.set_random_seed(1)
+            m, X, Y = self.prepare(gpflow.likelihoods.Gaussian(variance=0.1))
+            sampler = gpflow.train.EllipticalSliceSampler()
+            samples = sampler.sample(m, num_samples=2000, thin=2, burn=100)
+            self.assertEqual(set(samples.columns), {m.V.pathname, 'logprobs'})
+
+            K = m.kern.compute_K_symm(X) + np.eye(10) * gpflow.settings.numerics.jitter_level
+            L = np.linalg.cholesky(K)
+            fs = np.array([L.dot(v) for v in samples[m.V.pathname]])
+
+            gpr = gpflow.models.GPR(X, Y, kern=gpflow.kernels.RBF(1, lengthscales=0.3))
+            gpr.likelihood.variance = 0.1
+            mean, _ = gpr.predict_f(X)
+            assert_allclose(fs.mean(0), mean, atol=0.1)
+            assert_allclose(m.V.read_value(), samples[m.V.pathname].iloc[-1])
+
+    def test_gibbs_with_hmc(self):
+        with self.test_context():
+            m, _X, _Y = self.prepare(gpflow.likelihoods.StudentT())
+            m.kern.lengthscales.prior = gpflow.priors.Gamma(1., 1.)
+            m.kern.variance.prior = gpflow.priors.Gamma(1., 1.)
+            sampler = gpflow.train.EllipticalSliceSampler()
+            samples = sampler.sample(m, num_samples=20, burn=5, epsilon=0.05, lmin=5, lmax=10)
+            names = {p.pathname for p in m.trainable_parameters}
+            self.assertEqual(set(samples.columns), names | {'logprobs'})
+            self.assertEqual(len(samples), 20)
+
+            lengthscales = np.array(samples[m.kern.lengthscales.pathname].tolist())
+            self.assertTrue(np.all(lengthscales > 0))
+            self.assertGreater(len(np.unique(lengthscales)), 1)
+
+            last = samples.iloc[-1]
+            for param in m.trainable_parameters:
+                assert_almost_equal(last[param.pathname], param.read_value())
+            llh = m.compute_log_likelihood() + m.compute_log_prior()
+            assert_allclose(last['logprobs'], llh)
+
+    def test_wrong_latent(self):
+        with self.test_context():
+            m, _X, _Y = self.prepare(gpflow.likelihoods.StudentT())
+            sampler = gpflow.train.EllipticalSliceSampler()
+            with self.assertRaises(ValueError):
+                sampler.sample(m, num_samples=10, latent=m.kern.variance)
+            with self.assertRaises(ValueError):
+                sampler.sample(m, num_samples=10, thin=0)
+
+
+if __name__ == '__main__':
+    tf.test.main()
@@ -19,7 +19,7 @@ import copy
 import pytest
 
 import gpflow
-from gpflow.expectations import expectation, quadrature_expectation
+from gpflow.expectations import expectation, quadrature_expectation, map_over_chunks
 from gpflow.probability_distributions import Gaussian, DiagonalGaussian, MarkovGaussian
 from gpflow import kernels, mean_functions, features
 from gpflow.test_util import session_tf
@@ -352,3 +352,50 @@ def test_eKzxKxz_rbf_cross_covariance(session_tf,
                                       distribution, kernel1, kernel2,
                                       feat1, feat2):
     _check((distribution(), (kernel1(), feat1()), (kernel2(), feat2())))
+
+
+@pytest.mark.parametrize("distribution", [gauss, gauss_diag])
+@pytest.mark.parametrize("kernel1,kernel2", [
+    (lin_kern, lin_kern), (rbf_kern, rbf_kern), (rbf_kern, rbf_kern_2),
+    (rbf_kern, lin_kern), (rbf_lin_sum_kern, rbf_lin_sum_kern),
+    (rbf_lin_sum_kern, rbf_lin_sum_kern2), (rbf_kern_act_dim_0, lin_kern_act_dim_1)])
+@pytest.mark.parametrize("chunk_size", [1, 2, 100])
+def test_eKzxKxz_reduce_n(session_tf, distribution, kernel1, kernel2, chunk_size, feature):
+    custom_config = gpflow.settings.get_settings()
+    custom_config.numerics.psi_chunk_size = chunk_size
+    with gpflow.settings.temp_settings(custom_config):
+        params = (distribution(), (kernel1(), feature), (kernel2(), feature))
+        reduced = expectation(*params, reduce_n=True)
+        summed = tf.reduce_sum(expectation(*params), 0)
+        reduced, summed = session_tf.run([reduced, summed])
+    assert reduced.shape == (Data.num_ind, Data.num_ind)
+    assert_allclose(reduced, summed, rtol=RTOL)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 100])
+def test_eKzxKxz_reduce_n_product(session_tf, chunk_size, feature):
+    kern = rbf_lin_prod_kern()
+    params = (gauss_diag(), (kern, feature), (kern, feature))
+    custom_config = gpflow.settings.get_settings()
+    custom_config.numerics.psi_chunk_size = chunk_size
+    with gpflow.settings.temp_settings(custom_config):
+        reduced = expectation(*params, reduce_n=True)
+    summed = tf.reduce_sum(expectation(*params), 0)
+    reduced, summed = session_tf.run([reduced, summed])
+    assert_allclose(reduced, summed, rtol=RTOL)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 100])
+def test_map_over_chunks(session_tf, chunk_size, feature):
+    p, kern = gauss(), rbf_kern()
+    eKxz, eKzxKxz = map_over_chunks(
+        p, lambda chunk: (expectation(chunk, (kern, feature)),
+                          expectation(chunk, (kern, feature), (kern, feature))),
+        chunk_size=chunk_size)
+    eKxz_sum = map_over_chunks(p, lambda chunk: tf.reduce_sum(expectation(chunk, (kern, feature)), 0),
+                               reduce_n=True, chunk_size=chunk_size)
+    expected = expectation(p, (kern, feature)), expectation(p, (kern, feature), (kern, feature))
+    eKxz, eKzxKxz, eKxz_sum, expected = session_tf.run([eKxz, eKzxKxz, eKxz_sum, expected])
+    assert_allclose(eKxz, expected[0], rtol=RTOL)
+    assert_allclose(eKzxKxz, expected[1], rtol=RTOL)
+    assert_allclose(eKxz_sum, expected[0].sum(0), rtol=RTOL)
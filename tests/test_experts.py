@@ -0,0 +1,102 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+import gpflow
+from gpflow.test_util import session_tf
+
+
+class Datum:
+    rng = np.random.RandomState(0)
+    X = rng.rand(23, 1)
+    Y = np.sin(6 * X) + 0.1 * rng.randn(23, 1)
+    Xtest = np.linspace(0, 1, 7)[:, None]
+    labels = rng.permutation(23) % 3
+
+
+def _gpr(X, Y):
+    gpr = gpflow.models.GPR(X, Y, gpflow.kernels.RBF(1),
+                            mean_function=gpflow.mean_functions.Constant(0.3))
+    gpr.likelihood.variance = 0.1
+    return gpr
+
+
+def _experts(num_experts, partition, combination='rbcm'):
+    m = gpflow.models.DistributedGPR(Datum.X, Datum.Y, gpflow.kernels.RBF(1), num_experts,
+                                     mean_function=gpflow.mean_functions.Constant(0.3),
+                                     combination=combination, partition=partition)
+    m.likelihood.variance = 0.1
+    return m
+
+
+def test_single_expert_vs_gpr(session_tf):
+    gpr = _gpr(Datum.X, Datum.Y)
+    for combination in ['poe', 'gpoe', 'bcm']:
+        m = _experts(1, 'random', combination)
+        assert_allclose(m.compute_log_likelihood(), gpr.compute_log_likelihood())
+        mean, var = m.predict_f(Datum.Xtest)
+        mean_gpr, var_gpr = gpr.predict_f(Datum.Xtest)
+        assert_allclose(mean, mean_gpr, atol=1e-6)
+        assert_allclose(var, var_gpr, atol=1e-6)
+
+
+@pytest.mark.parametrize('combination', ['poe', 'gpoe', 'bcm', 'rbcm'])
+def test_experts_vs_gpr_shards(session_tf, combination):
+    m = _experts(3, Datum.labels, combination)
+    gprs = [_gpr(Datum.X[Datum.labels == k], Datum.Y[Datum.labels == k]) for k in range(3)]
+    assert_allclose(m.compute_log_likelihood(),
+                    sum(gpr.compute_log_likelihood() for gpr in gprs))
+
+    predictions = [gpr.predict_f(Datum.Xtest) for gpr in gprs]
+    means = np.stack([mu for mu, _ in predictions])
+    variances = np.stack([var for _, var in predictions])
+    prior_var = 1.
+    if combination in ('poe', 'bcm'):
+        beta = np.ones_like(variances)
+    elif combination == 'gpoe':
+        beta = np.ones_like(variances) / 3.
+    else:
+        beta = 0.5 * (np.log(prior_var) - np.log(variances))
+    precision = np.sum(beta / variances, 0)
+    if combination in ('bcm', 'rbcm'):
+        precision += (1. - np.sum(beta, 0)) / prior_var
+    expected_var = 1. / precision
+    expected_mean = expected_var * np.sum(beta / variances * means, 0)
+
+    mean, var = m.predict_f(Datum.Xtest)
+    assert_allclose(mean, expected_mean, atol=1e-6)
+    assert_allclose(var, expected_var, atol=1e-6)
+    mean_y, var_y = m.predict_y(Datum.Xtest)
+    assert_allclose(var_y, expected_var + 0.1, atol=1e-6)
+
+
+def test_experts_optimize(session_tf):
+    m = _experts(4, 'sequential')
+    lml_before = m.compute_log_likelihood()
+    gpflow.train.ScipyOptimizer().minimize(m, maxiter=20)
+    assert m.compute_log_likelihood() > lml_before
+
+
+def test_experts_errors():
+    with pytest.raises(ValueError):
+        _experts(3, 'random', combination='moe')
+    with pytest.raises(ValueError):
+        _experts(0, 'random')
+    with pytest.raises(ValueError):
+        _experts(3, np.zeros(23, dtype=int))
+    with pytest.raises(ValueError):
+        _experts(3, 'kmeans')
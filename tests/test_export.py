@@ -0,0 +1,118 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+import gpflow
+from gpflow.export import export_predictor
+from gpflow.predictor import NumpyPredictor
+
+
+class Data:
+    rng = np.random.RandomState(0)
+    N, M, D, L = 30, 7, 2, 2
+    X = rng.randn(N, D)
+    Y = rng.randn(N, L)
+    Z = rng.randn(M, D)
+    Xnew = rng.randn(10, D)
+
+
+def kernel():
+    return gpflow.kernels.RBF(1, lengthscales=0.8, active_dims=[1]) * \
+        gpflow.kernels.Matern32(2, lengthscales=[1.2, 0.7]) + \
+        gpflow.kernels.Linear(1, variance=0.3, active_dims=slice(0, 1)) + \
+        gpflow.kernels.White(2, variance=0.01)
+
+
+def mean_function():
+    return gpflow.mean_functions.Linear(Data.rng.randn(Data.D, Data.L), Data.rng.randn(Data.L))
+
+
+def random_q(q_diag):
+    q_mu = Data.rng.randn(Data.M, Data.L)
+    if q_diag:
+        return q_mu, Data.rng.rand(Data.M, Data.L) + 0.1
+    q_sqrt = 0.3 * np.tril(Data.rng.randn(Data.L, Data.M, Data.M)) + 0.5 * np.eye(Data.M)[None, :, :]
+    return q_mu, q_sqrt
+
+
+@pytest.fixture
+def filename():
+    with tempfile.TemporaryDirectory() as directory:
+        yield os.path.join(directory, 'predictor.npz')
+
+
+def assert_same_predictions(model, filename):
+    export_predictor(model, filename)
+    predictor = NumpyPredictor(filename)
+    for full_cov in [False, True]:
+        mean, var = model.predict_f(Data.Xnew, full_cov=full_cov)
+        np_mean, np_var = predictor.predict_f(Data.Xnew, full_cov=full_cov)
+        assert np_var.shape == var.shape
+        assert_allclose(np_mean, mean, atol=1e-6)
+        assert_allclose(np_var, var, atol=1e-6)
+    for value, expected in zip(predictor.predict_y(Data.Xnew), model.predict_y(Data.Xnew)):
+        assert_allclose(value, expected, atol=1e-6)
+
+
+def test_gpr(session_tf, filename):
+    model = gpflow.models.GPR(Data.X, Data.Y, kernel(), mean_function=mean_function())
+    model.likelihood.variance = 0.1
+    assert_same_predictions(model, filename)
+
+
+def test_sgpr(session_tf, filename):
+    model = gpflow.models.SGPR(Data.X, Data.Y, kernel(), Z=Data.Z,
+                               mean_function=gpflow.mean_functions.Constant(np.ones(Data.L)))
+    model.likelihood.variance = 0.1
+    assert_same_predictions(model, filename)
+
+
+@pytest.mark.parametrize('whiten', [True, False])
+@pytest.mark.parametrize('q_diag', [True, False])
+def test_svgp(session_tf, filename, whiten, q_diag):
+    q_mu, q_sqrt = random_q(q_diag)
+    model = gpflow.models.SVGP(Data.X, Data.Y, kernel(), gpflow.likelihoods.Gaussian(), Z=Data.Z,
+                               mean_function=mean_function(), whiten=whiten, q_diag=q_diag,
+                               q_mu=q_mu, q_sqrt=q_sqrt)
+    assert_same_predictions(model, filename)
+
+
+def test_svgp_structured_covariances(session_tf, filename):
+    Y = (Data.Y > 0).astype(float)
+    for options in [dict(q_rank=2), dict(q_shared=True)]:
+        model = gpflow.models.SVGP(Data.X, Y, gpflow.kernels.Periodic(2), gpflow.likelihoods.Bernoulli(),
+                                   Z=Data.Z, q_mu=Data.rng.randn(Data.M, Data.L), **options)
+        assert_same_predictions(model, filename)
+
+
+def test_unsupported(session_tf, filename):
+    model = gpflow.models.SVGP(Data.X, Data.Y, gpflow.kernels.RBF(2), gpflow.likelihoods.StudentT(),
+                               Z=Data.Z)
+    export_predictor(model, filename)
+    predictor = NumpyPredictor(filename)
+    predictor.predict_f(Data.Xnew)
+    with pytest.raises(NotImplementedError):
+        predictor.predict_y(Data.Xnew)
+
+    with pytest.raises(NotImplementedError):
+        export_predictor(gpflow.models.GPR(Data.X, Data.Y, gpflow.kernels.ArcCosine(2)), filename)
+    with pytest.raises(NotImplementedError):
+        export_predictor(gpflow.models.VGP(Data.X, Data.Y, gpflow.kernels.RBF(2),
+                                           gpflow.likelihoods.Gaussian()), filename)
@@ -105,6 +105,117 @@ class TestBayesianGPLVM(GPflowTestCase):
             for i in range(self.D):
                 self.assertTrue(np.allclose(var_f[:, i], np.diag(var_fFull[:, :, i])))
 
+    def test_prediction_cache(self):
+        with self.test_context() as session:
+            Q = 2  # latent dimensions
+            X_mean = gpflow.models.PCA_reduce(self.Y, Q)
+            X_var = np.ones((self.N, Q))
+            Z = self.rng.randn(self.M, Q)
+            m = gpflow.models.BayesianGPLVM(X_mean=X_mean, X_var=X_var, Y=self.Y,
+                                            kern=kernels.RBF(Q), M=self.M, Z=Z, name='gplvm',
+                                            cache_predictions=True)
+            m_uncached = gpflow.models.BayesianGPLVM(X_mean=X_mean, X_var=X_var, Y=self.Y,
+                                                     kern=kernels.RBF(Q), M=self.M, Z=Z, name='gplvm')
+            self.assertIsNone(m_uncached.prediction_cache)
+            Xtest = self.rng.randn(10, Q)
+
+            def check():
+                for cached, uncached in zip(m.predict_f(Xtest), m_uncached.predict_f(Xtest)):
+                    np.testing.assert_allclose(cached, uncached, rtol=1e-8)
+                for cached, uncached in zip(m.predict_f_full_cov(Xtest), m_uncached.predict_f_full_cov(Xtest)):
+                    np.testing.assert_allclose(cached, uncached, rtol=1e-8)
+
+            check()
+            fingerprint = session.run(m.prediction_cache.fingerprint)
+            self.assertFalse(np.any(np.isnan(fingerprint)))
+            check()  # predictions read from the cache
+
+            gpflow.train.ScipyOptimizer().minimize(m, maxiter=2)
+            m.kern.variance = 2.
+            self.assertEqual(set(m.read_values()), set(m_uncached.read_values()))
+            m_uncached.assign(m.read_values())
+            check()
+            self.assertFalse(np.array_equal(fingerprint, session.run(m.prediction_cache.fingerprint)))
+
+
+class TestStochasticBayesianGPLVM(GPflowTestCase):
+    def setUp(self):
+        # data
+        self.N = 20  # number of data points
+        self.D = 5  # data dimension
+        self.Q = 2  # latent dimensions
+        self.M = 10  # inducing points
+        self.rng = np.random.RandomState(1)
+        self.Y = self.rng.randn(self.N, self.D)
+        self.X_mean = gpflow.models.PCA_reduce(self.Y, self.Q)
+        self.X_var = 0.1 + self.rng.rand(self.N, self.Q)
+        self.Z = self.rng.randn(self.M, self.Q)
+
+    def test_optimal_q_matches_collapsed_bound(self):
+        with self.test_context() as session:
+            m_collapsed = gpflow.models.BayesianGPLVM(
+                X_mean=self.X_mean, X_var=self.X_var, Y=self.Y,
+                kern=kernels.RBF(self.Q, ARD=True), M=self.M, Z=self.Z)
+            for whiten in [True, False]:
+                m = gpflow.models.StochasticBayesianGPLVM(
+                    self.Y, kernels.RBF(self.Q, ARD=True), self.Z,
+                    X_mean=self.X_mean, X_var=self.X_var, whiten=whiten)
+
+                # optimal q(u) of the collapsed bound
+                pX = gpflow.probability_distributions.DiagonalGaussian(
+                    tf.constant(self.X_mean), tf.constant(self.X_var))
+                feat = gpflow.features.InducingPoints(self.Z)
+                kern = kernels.RBF(self.Q, ARD=True)
+                psi1, psi2 = session.run([
+                    gpflow.expectations.expectation(pX, (kern, feat)),
+                    gpflow.expectations.expectation(pX, (kern, feat), (kern, feat), reduce_n=True)])
+                Kuu = kern.compute_K_symm(self.Z) + gpflow.settings.jitter * np.eye(self.M)
+                S = Kuu @ np.linalg.solve(Kuu + psi2, Kuu)
+                mu = Kuu @ np.linalg.solve(Kuu + psi2, psi1.T @ self.Y)
+                if whiten:
+                    L = np.linalg.cholesky(Kuu)
+                    mu = np.linalg.solve(L, mu)
+                    S = np.linalg.solve(L, np.linalg.solve(L, S).T)
+                m.q_mu = mu
+                m.q_sqrt = np.tile(np.linalg.cholesky(S)[None], [self.D, 1, 1])
+
+                np.testing.assert_allclose(m.compute_log_likelihood(),
+                                           m_collapsed.compute_log_likelihood(), rtol=1e-6)
+
+    def test_minibatch_optimise(self):
+        with self.test_context():
+            m = gpflow.models.StochasticBayesianGPLVM(
+                self.Y, kernels.RBF(self.Q), self.Z, minibatch_size=5, name='gplvm')
+            full = gpflow.models.StochasticBayesianGPLVM(
+                self.Y, kernels.RBF(self.Q), self.Z, name='gplvm')
+            estimates = [m.compute_log_likelihood() for _ in range(400)]
+            np.testing.assert_allclose(np.mean(estimates), full.compute_log_likelihood(), rtol=0.05)
+
+            linit = full.compute_log_likelihood()
+            gpflow.train.AdamOptimizer(0.01).minimize(m, maxiter=20)
+            full.assign(m.read_values())
+            self.assertTrue(full.compute_log_likelihood() > linit)
+
+    def test_encoder(self):
+        with self.test_context():
+            encoder = gpflow.models.GaussianEncoder(self.D, self.Q, hidden_sizes=[8])
+            m = gpflow.models.StochasticBayesianGPLVM(
+                self.Y, kernels.RBF(self.Q), self.Z, encoder=encoder)
+            linit = m.compute_log_likelihood()
+            gpflow.train.AdamOptimizer(0.01).minimize(m, maxiter=20)
+            self.assertTrue(m.compute_log_likelihood() > linit)
+
+            X_mean, X_var = m.predict_x(self.Y[:3])
+            self.assertEqual(X_mean.shape, (3, self.Q))
+            self.assertTrue(np.all(X_var > 0))
+
+            mu_f, var_f = m.predict_f(X_mean)
+            self.assertEqual(mu_f.shape, (3, self.D))
+
+            with self.assertRaises(ValueError):
+                gpflow.models.StochasticBayesianGPLVM(
+                    self.Y, kernels.RBF(self.Q), self.Z, X_mean=self.X_mean, encoder=encoder)
+
 
 if __name__ == "__main__":
     tf.test.main()
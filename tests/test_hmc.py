@@ -12,9 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import tensorflow as tf
-
+import os
+import tempfile
 
+import tensorflow as tf
 
 import numpy as np
 from numpy.testing import assert_almost_equal, assert_allclose
@@ -150,6 +151,134 @@ class SampleModelTest(GPflowTestCase):
             assert_allclose(llh, - (xs**2).sum(1), atol=1e-6)
 
 
+class SampleChainsTest(GPflowTestCase):
+    def setUp(self):
+        tf.set_random_seed(1)
+
+    def test_chains(self):
+        with self.test_context():
+            m = Quadratic()
+            hmc = gpflow.train.HMC()
+            num_samples, num_chains = 200, 4
+            samples, diagnostics = hmc.sample_chains(m, num_samples=num_samples,
+                                                     num_chains=num_chains, epsilon=0.05,
+                                                     lmin=10, lmax=20, thin=2, burn=20,
+                                                     init_scale=1.0)
+            self.assertEqual(samples.shape, (num_samples * num_chains, 3))
+            self.assertEqual(set(samples.columns), {m.x.pathname, 'logprobs', 'chain'})
+            assert_allclose(np.bincount(samples['chain']), [num_samples] * num_chains)
+
+            xs = np.array(samples[m.x.pathname].tolist())
+            assert_almost_equal(xs.mean(0), np.zeros(2), decimal=1)
+            assert_allclose(samples['logprobs'], - (xs**2).sum(1), atol=1e-6)
+
+            rhat = diagnostics.loc[m.x.pathname, 'rhat']
+            ess = diagnostics.loc[m.x.pathname, 'ess']
+            self.assertEqual(rhat.shape, (2,))
+            self.assertTrue(np.all(rhat < 1.1))
+            self.assertTrue(np.all(ess > 100))
+
+            last = xs[num_samples - 1]
+            assert_allclose(m.x.read_value(), last)
+
+    def test_wrong_arguments(self):
+        with self.test_context():
+            m = Quadratic()
+            hmc = gpflow.train.HMC()
+            with self.assertRaises(ValueError):
+                hmc.sample_chains(m, num_samples=10, num_chains=0, epsilon=0.05)
+            with self.assertRaises(ValueError):
+                hmc.sample_chains(m, num_samples=10, num_chains=2, epsilon=0.05, thin=0,
+                                  init_scale=1.0)
+            for init_scale in [None, 0.0, -1.0]:
+                with self.assertRaises(ValueError):
+                    hmc.sample_chains(m, num_samples=10, num_chains=2, epsilon=0.05,
+                                      init_scale=init_scale)
+
+
+def test_diagnostics():
+    rng = np.random.RandomState(0)
+    independent = rng.randn(1000, 4, 3)
+    assert_allclose(gpflow.training.hmc.potential_scale_reduction(independent), 1., atol=0.01)
+    assert_allclose(gpflow.training.hmc.effective_sample_size(independent), 4000, rtol=0.1)
+
+    shifted = independent + np.arange(4)[:, None]
+    assert np.all(gpflow.training.hmc.potential_scale_reduction(shifted) > 1.2)
+
+    autocorrelated = np.zeros((1000, 4))
+    for t in range(1, 1000):
+        autocorrelated[t] = 0.9 * autocorrelated[t - 1] + rng.randn(4)
+    ess = gpflow.training.hmc.effective_sample_size(autocorrelated)
+    assert ess < 400
+
+
+class SampleStreamTest(GPflowTestCase):
+    def setUp(self):
+        tf.set_random_seed(1)
+
+    def test_callback(self):
+        with self.test_context():
+            m = Quadratic()
+            hmc = gpflow.train.HMC()
+            chunks = []
+            total = hmc.sample_stream(m, num_samples=25, chunk_size=10,
+                                      epsilon=0.05, lmin=10, lmax=20,
+                                      callback=lambda chunk, start: chunks.append((start, chunk)))
+            self.assertEqual(total, 25)
+            self.assertEqual([start for start, _ in chunks], [0, 10, 20])
+            self.assertEqual([len(chunk) for _, chunk in chunks], [10, 10, 5])
+            last = chunks[-1][1][m.x.pathname].iloc[-1]
+            assert_allclose(m.x.read_value(), last)
+
+    def test_store_resume(self):
+        with self.test_context(), tempfile.TemporaryDirectory() as tmp_dir:
+            pathname = os.path.join(tmp_dir, 'traces.h5')
+            m = Quadratic()
+            hmc = gpflow.train.HMC()
+            total = hmc.sample_stream(m, num_samples=12, chunk_size=5, epsilon=0.05,
+                                      lmin=10, lmax=20, store=pathname)
+            self.assertEqual(total, 12)
+            store = gpflow.train.HDF5TraceStore(pathname)
+            last = store.last_sample()[m.x.pathname]
+
+            m.x = np.zeros(2)
+            total = hmc.sample_stream(m, num_samples=8, chunk_size=5, epsilon=1e-10,
+                                      store=store, resume=True)
+            self.assertEqual(total, 20)
+            self.assertEqual(len(store), 20)
+            self.assertEqual(set(store.columns), {m.x.pathname, 'logprobs'})
+
+            traces = store.read(start=10, stop=15)
+            self.assertEqual(traces.shape, (5, 2))
+            xs = np.array(traces[m.x.pathname].tolist())
+            assert_allclose(traces['logprobs'], - (xs**2).sum(1), atol=1e-6)
+
+            resumed = np.array(store.read(start=12)[m.x.pathname].tolist())
+            assert_allclose(resumed, np.tile(last, (8, 1)), atol=1e-6)
+
+    def test_store_missing_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pathname = os.path.join(tmp_dir, 'traces.h5')
+            store = gpflow.train.HDF5TraceStore(pathname)
+            self.assertEqual(len(store), 0)
+            self.assertEqual(store.columns, [])
+            with self.assertRaises(gpflow.GPflowError):
+                store.read()
+            with self.assertRaises(gpflow.GPflowError):
+                store.last_sample()
+            self.assertFalse(os.path.exists(pathname))
+
+    def test_wrong_arguments(self):
+        with self.test_context():
+            m = Quadratic()
+            hmc = gpflow.train.HMC()
+            with self.assertRaises(ValueError):
+                hmc.sample_stream(m, num_samples=10, epsilon=0.05)
+            with self.assertRaises(ValueError):
+                hmc.sample_stream(m, num_samples=10, epsilon=0.05, chunk_size=0,
+                                  callback=lambda *args: None)
+
+
 class CheckTrainingVariableState(GPflowTestCase):
     def model(self):
         X, Y = np.random.randn(2, 10, 1)
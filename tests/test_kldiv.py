@@ -122,6 +122,29 @@ def test_sumkl_equals_batchkl(session_tf, shared_k, diag, mu,
     kl_sum =tf.reduce_sum(kl_sum)
     assert_almost_equal(kl_sum.eval(), kl_batch.eval())
 
+
+@pytest.mark.parametrize('prior', ['white', 'shared_k', 'batch_k'])
+def test_structured_vs_dense(session_tf, prior, mu, K, K_batch):
+    """
+    Low-rank-plus-diagonal and shared square roots give the same KL divergence
+    as equivalent lower triangular square roots.
+    """
+    rng = np.random.RandomState(1)
+    diag, factor = rng.rand(Datum.M, Datum.N) + 0.5, rng.randn(Datum.N, Datum.M, 2)
+    S = np.stack([np.diag(diag[:, n] ** 2) + factor[n] @ factor[n].T for n in range(Datum.N)])
+    shared = np.tril(rng.randn(Datum.M, Datum.M)) + 2 * np.eye(Datum.M)
+    Kp = {'white': None, 'shared_k': K, 'batch_k': K_batch}[prior]
+
+    lowrank = gpflow.covariance_factors.LowRankPlusDiagonal(tf.identity(diag), tf.identity(factor))
+    kl_lowrank = gauss_kl(mu, lowrank, Kp)
+    kl_lowrank_dense = gauss_kl(mu, tf.identity(np.linalg.cholesky(S)), Kp)
+    np.testing.assert_allclose(kl_lowrank.eval(), kl_lowrank_dense.eval())
+
+    kl_shared = gauss_kl(mu, gpflow.covariance_factors.SharedFactor(tf.identity(shared)), Kp)
+    kl_shared_dense = gauss_kl(mu, tf.identity(np.tile(shared[None], [Datum.N, 1, 1])), Kp)
+    np.testing.assert_allclose(kl_shared.eval(), kl_shared_dense.eval())
+
+
 def tf_kl_1d(q_mu, q_sigma, p_var=1.0):
     p_var = tf.ones_like(q_sigma) if p_var is None else p_var
     q_var = tf.square(q_sigma)
@@ -0,0 +1,109 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+import tensorflow as tf
+from numpy.testing import assert_allclose
+from scipy.stats import norm
+
+import gpflow
+from gpflow.test_util import session_tf
+
+
+class Datum:
+    rng = np.random.RandomState(0)
+    X = rng.rand(20, 1)
+    Y = np.sin(6 * X) + 0.1 * rng.randn(20, 1)
+    Xtest = np.linspace(0, 1, 7)[:, None]
+
+
+def test_laplace_gaussian_vs_gpr(session_tf):
+    lik = gpflow.likelihoods.Gaussian()
+    lik.variance = 0.1
+    m = gpflow.models.GPLaplace(Datum.X, Datum.Y, gpflow.kernels.RBF(1), lik,
+                                mean_function=gpflow.mean_functions.Constant(0.3))
+    gpr = gpflow.models.GPR(Datum.X, Datum.Y, gpflow.kernels.RBF(1),
+                            mean_function=gpflow.mean_functions.Constant(0.3))
+    gpr.likelihood.variance = 0.1
+
+    assert_allclose(m.compute_log_likelihood(), gpr.compute_log_likelihood(), rtol=1e-6)
+    for predict, predict_gpr in [(m.predict_f, gpr.predict_f),
+                                 (m.predict_f_full_cov, gpr.predict_f_full_cov),
+                                 (m.predict_y, gpr.predict_y)]:
+        mean, var = predict(Datum.Xtest)
+        mean_gpr, var_gpr = predict_gpr(Datum.Xtest)
+        assert_allclose(mean, mean_gpr, atol=1e-6)
+        assert_allclose(var, var_gpr, atol=1e-6)
+
+
+def _bernoulli_grad(F, Y):
+    jitter = 1e-3  # as in gpflow.likelihoods.inv_probit
+    p = norm.cdf(F) * (1. - 2. * jitter) + jitter
+    p_y = np.where(Y == 1., p, 1. - p)
+    return (2. * Y - 1.) * (1. - 2. * jitter) * norm.pdf(F) / p_y
+
+
+def _poisson_grad(F, Y):
+    return Y - np.exp(F)
+
+
+@pytest.mark.parametrize('likelihood, Y, logp_grad', [
+    (gpflow.likelihoods.Bernoulli(), (Datum.Y > 0).astype(float), _bernoulli_grad),
+    (gpflow.likelihoods.Poisson(), np.floor(np.exp(2. * Datum.Y)), _poisson_grad),
+])
+def test_laplace_mode(session_tf, likelihood, Y, logp_grad):
+    m = gpflow.models.GPLaplace(Datum.X, Y, gpflow.kernels.RBF(1), likelihood)
+    m.compute_log_likelihood()
+    # At the mode F = K grad log p(Y | F).
+    F = m.F_mode.read_value()
+    K = m.kern.compute_K_symm(Datum.X) + np.eye(20) * gpflow.settings.numerics.jitter_level
+    assert_allclose(F, K @ logp_grad(F, Y), atol=1e-5)
+
+    mean, var = m.predict_f(Datum.Xtest)
+    assert mean.shape == (7, 1) and var.shape == (7, 1)
+    assert np.all(var > 0.)
+    mean_y, var_y = m.predict_y(Datum.Xtest)
+    assert mean_y.shape == (7, 1) and np.all(var_y > 0.)
+
+
+def test_laplace_optimize(session_tf):
+    Y = (Datum.Y > 0).astype(float)
+    m = gpflow.models.GPLaplace(Datum.X, Y, gpflow.kernels.RBF(1), gpflow.likelihoods.Bernoulli())
+    lml_before = m.compute_log_likelihood()
+    gpflow.train.ScipyOptimizer().minimize(m, maxiter=50)
+    assert m.compute_log_likelihood() > lml_before
+    assert 'GPLaplace/F_mode' not in [p.pathname for p in m.trainable_parameters]
+    # A warm-started model needs no further Newton iterations.
+    mode = m.F_mode.read_value()
+    m.compute_log_likelihood()
+    assert_allclose(m.F_mode.read_value(), mode, atol=1e-5)
+
+
+def test_laplace_gradient(session_tf):
+    Y = np.floor(np.exp(2. * Datum.Y))
+    m = gpflow.models.GPLaplace(Datum.X, Y, gpflow.kernels.RBF(1, lengthscales=0.3),
+                                gpflow.likelihoods.Poisson(),
+                                newton_iterations=100, newton_tolerance=1e-12)
+    lengthscales = m.kern.lengthscales
+    grad = tf.gradients(m.likelihood_tensor, lengthscales.constrained_tensor)[0]
+    grad = session_tf.run(grad)
+
+    def log_likelihood(value):
+        m.kern.lengthscales = value
+        return m.compute_log_likelihood()
+
+    eps = 1e-5
+    grad_fd = (log_likelihood(0.3 + eps) - log_likelihood(0.3 - eps)) / (2 * eps)
+    assert_allclose(grad, grad_fd, rtol=1e-4)
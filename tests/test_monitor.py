@@ -16,6 +16,7 @@ from unittest import TestCase
 import mock
 from typing import Optional, Dict, Callable
 from collections import namedtuple
+from concurrent.futures import Executor, Future
 import tempfile
 import pathlib
 
@@ -41,6 +42,29 @@ class _DummyMonitorTask(mon.MonitorTask):
         self.call_count += 1
 
 
+class _DeferredExecutor(Executor):
+    """
+    Executor that runs submitted calls only when asked to, which makes background runs of tasks
+    deterministic in tests.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.calls.append((future, fn, args, kwargs))
+        return future
+
+    def run_all(self):
+        for future, fn, args, kwargs in self.calls:
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as error:
+                future.set_exception(error)
+        self.calls = []
+
+
 class DummyLinearModel(gpflow.models.Model):
 
     def __init__(self, x: np.ndarray, y: np.ndarray,
@@ -84,6 +108,20 @@ class TestMonitor(TestCase):
         self.assertEqual(monitor._context.total_time, 5.0)
         self.assertEqual(monitor._context.optimisation_time, 4.5)
 
+    def test_multistep_iteration_number(self):
+        """
+        Tests that the iteration number follows the steps performed by multi-step optimisers.
+        """
+        with session_context(tf.Graph()):
+            iterations = []
+            task = mon.CallbackTask(lambda context, *args: iterations.append(context.iteration_no))
+            d = create_leaner_model_data(20)
+            model = DummyLinearModel(d.x, d.y, d.w, d.b, d.var)
+            with mon.Monitor([task]) as monitor:
+                optimiser = gpflow.train.AdamOptimizer(0.01)
+                optimiser.minimize(model, maxiter=10, steps_per_run=4, step_callback=monitor)
+            self.assertEqual(iterations, [4, 8, 10, 10])
+
 
 class TestMonitorTask(TestCase):
 
@@ -128,6 +166,41 @@ class TestMonitorTask(TestCase):
         self.assertEqual(monitor_task1.call_count, 0)
         self.assertEqual(monitor_task2.call_count, 1)
 
+    def test_async_execution(self):
+        """
+        Tests that a task running in the background gets snapshots of the context, runs once per
+        call, and that the number of pending runs is limited.
+        """
+        executor = _DeferredExecutor()
+        global_steps = []
+        monitor_task = mon.CallbackTask(lambda context: global_steps.append(context.global_step))\
+            .with_async_execution(executor, max_pending=2)
+        monitor_context = mon.MonitorContext()
+        for monitor_context.iteration_no in range(3):
+            monitor_task(monitor_context)
+            self.assertLessEqual(len(executor.calls), 2)
+            if len(executor.calls) == 2:
+                executor.run_all()
+        self.assertEqual(global_steps, [0, 1])
+        executor.run_all()
+        monitor_task.wait()
+        self.assertEqual(global_steps, [0, 1, 2])
+        self.assertGreater(monitor_task.background_time, 0.0)
+
+    def test_async_error(self):
+        """
+        Tests that errors of background runs are raised in the optimisation loop.
+        """
+        def callback(context):
+            raise ValueError()
+
+        executor = _DeferredExecutor()
+        monitor_task = mon.CallbackTask(callback).with_async_execution(executor)
+        monitor_task(mon.MonitorContext())
+        executor.run_all()
+        with self.assertRaises(ValueError):
+            monitor_task.wait()
+
 
 class TestGenericCondition(TestCase):
 
@@ -400,6 +473,35 @@ class TestModelToTensorBoardTask(TestCase):
             self.assertAlmostEqual(summary['dummy1'].simple_value, 6.0)
             self.assertIn('DummyLinearModel/w', summary.keys())
 
+    def test_async_tensorboard_snapshot(self):
+        """
+        Tests that the task running in the background writes parameter values of the iteration
+        it was fired at.
+        """
+        with session_context(tf.Graph()), tempfile.TemporaryDirectory() as tmp_event_dir:
+            model = create_linear_model()
+            session = model.enquire_session()
+            b = float(model.b.value)
+            executor = _DeferredExecutor()
+            writer = mon.LogdirWriter(tmp_event_dir)
+            try:
+                monitor_task = mon.ModelToTensorBoardTask(writer, model)\
+                    .with_flush_immediately(True)\
+                    .with_async_execution(executor)
+                monitor_context = mon.MonitorContext()
+                monitor_context.session = session
+                monitor_task(monitor_context)
+                model.b = b + 1.0
+                executor.run_all()
+                monitor_task.wait()
+
+                event_file = str(next(pathlib.Path(tmp_event_dir).iterdir().__iter__()))
+                summary = {v.tag: v for e in tf.train.summary_iterator(event_file)
+                           for v in e.summary.value}
+            finally:
+                writer.close()
+            self.assertAlmostEqual(summary['DummyLinearModel/b'].simple_value, b)
+
 
 class TestLmlToTensorBoardTask(TestCase):
 
@@ -441,6 +543,33 @@ class TestLmlToTensorBoardTask(TestCase):
             self.assertAlmostEqual(summary['DummyLinearModel/full_lml'].simple_value, avg_lml,
                                    places=5)
 
+    def test_chunked_lml_evaluator(self):
+        """
+        Tests that the chunked evaluation of the SVGP bound equals the full-data bound, and that
+        the inducing point computations are shared by the chunks.
+        """
+        with session_context(tf.Graph()):
+            model_data = create_leaner_model_data(50)
+            z = np.linspace(0, 1, 5)[:, None]
+            model = gpflow.models.SVGP(model_data.x[:, :1], model_data.y, gpflow.kernels.RBF(1),
+                                       gpflow.likelihoods.Gaussian(), Z=z)
+            full_lml = model.compute_log_likelihood()
+            for num_threads in [1, 3]:
+                evaluator = mon.ChunkedLmlEvaluator(model, chunk_size=7, num_threads=num_threads)
+                self.assertEqual(evaluator.num_chunks(), 8)
+                totals = []
+
+                def wrapper(chunk_lmls, total):
+                    totals.append(total)
+                    return chunk_lmls
+
+                np.testing.assert_allclose(evaluator(wrapper=wrapper), full_lml)
+                self.assertEqual(totals, [8])
+                evaluator.close()
+                np.testing.assert_allclose(evaluator(), full_lml)
+            shared_types = [t.op.type for t in evaluator.shared_tensors]
+            self.assertIn('Cholesky', shared_types)
+
 
 class TestScalarFuncToTensorBoardTask(TestCase):
 
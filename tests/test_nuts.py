@@ -0,0 +1,113 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+import tensorflow as tf
+from numpy.testing import assert_allclose, assert_almost_equal
+
+import gpflow
+from gpflow.test_util import GPflowTestCase
+from gpflow.training.nuts import _adaptation_windows
+
+
+class ScaledGaussian(gpflow.models.Model):
+    def __init__(self, scales):
+        super(ScaledGaussian, self).__init__()
+        self.scales = np.asarray(scales, dtype=gpflow.settings.float_type)
+        self.x = gpflow.Param(np.ones(len(scales)), dtype=gpflow.settings.float_type)
+
+    @gpflow.params_as_tensors
+    def _build_likelihood(self):
+        return -0.5 * tf.reduce_sum(tf.square(self.x / self.scales))
+
+
+class NUTSTest(GPflowTestCase):
+    def test_moments(self):
+        for metric in ['identity', 'diag', 'dense']:
+            with self.test_context():
+                scales = np.array([0.1, 1.0, 10.0])
+                m = ScaledGaussian(scales)
+                nuts = gpflow.train.NUTS(metric=metric, seed=1)
+                samples = nuts.sample(m, num_samples=1000, burn=500)
+                self.assertEqual(samples.shape, (1000, 2))
+
+                xs = np.array(samples[m.x.pathname].tolist())
+                assert_allclose(xs.mean(0) / scales, np.zeros(3), atol=0.25)
+                assert_allclose(xs.std(0) / scales, np.ones(3), rtol=0.25)
+                assert_allclose(samples['logprobs'], -0.5 * ((xs / scales) ** 2).sum(1))
+                assert_allclose(m.x.read_value(), xs[-1])
+
+                stats = nuts.stats
+                self.assertEqual(len(stats), 1000)
+                self.assertTrue(0.6 < stats['accept_stat'].mean() < 0.95)
+                if metric != 'identity':
+                    inv_metric = nuts.inv_metric
+                    variances = np.diag(inv_metric) if metric == 'dense' else inv_metric
+                    assert_allclose(np.log(variances), np.log(scales ** 2), atol=0.7)
+
+    def test_continue_without_burn(self):
+        with self.test_context():
+            m = ScaledGaussian([1.0, 2.0])
+            nuts = gpflow.train.NUTS(seed=2)
+            nuts.sample(m, num_samples=10, burn=100)
+            step_size, inv_metric = nuts.step_size, nuts.inv_metric.copy()
+            graph = m.enquire_session().graph
+            num_ops = len([op for op in graph.get_operations() if op.name.startswith('nuts')])
+            samples = nuts.sample(m, num_samples=10, burn=0, logprobs=False)
+            self.assertEqual(samples.shape, (10, 1))
+            self.assertEqual(num_ops, len([op for op in graph.get_operations()
+                                           if op.name.startswith('nuts')]))
+            self.assertEqual(nuts.step_size, step_size)
+            assert_allclose(nuts.inv_metric, inv_metric)
+
+    def test_gpmc(self):
+        with self.test_context():
+            rng = np.random.RandomState(0)
+            X, Y = rng.randn(2, 10, 1)
+            m = gpflow.models.GPMC(X, Y, kern=gpflow.kernels.Matern32(1),
+                                   likelihood=gpflow.likelihoods.StudentT())
+            m.kern.lengthscales.prior = gpflow.priors.Gamma(1., 1.)
+            m.kern.variance.prior = gpflow.priors.Gamma(1., 1.)
+            nuts = gpflow.train.NUTS(seed=3)
+            samples = nuts.sample(m, num_samples=5, burn=20)
+            names = {p.pathname for p in m.trainable_parameters}
+            self.assertEqual(set(samples.columns), names | {'logprobs'})
+            last = samples.iloc[-1]
+            for param in m.trainable_parameters:
+                assert_almost_equal(last[param.pathname], param.read_value())
+
+    def test_wrong_arguments(self):
+        with self.assertRaises(ValueError):
+            gpflow.train.NUTS(metric='full')
+        with self.assertRaises(ValueError):
+            gpflow.train.NUTS(target_accept=1.0)
+        with self.test_context():
+            m = ScaledGaussian([1.0])
+            with self.assertRaises(ValueError):
+                gpflow.train.NUTS().sample(m, num_samples=10, thin=0)
+
+
+@pytest.mark.parametrize('burn', [1, 10, 100, 1000])
+def test_adaptation_windows(burn):
+    schedule = _adaptation_windows(burn)
+    assert len(schedule) == burn
+    assert any(schedule)
+    slow = [i for i, s in enumerate(schedule) if s is not None]
+    assert slow == list(range(slow[0], slow[-1] + 1))
+    assert schedule[slow[-1]] is True
+
+
+if __name__ == '__main__':
+    tf.test.main()
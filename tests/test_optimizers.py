@@ -364,6 +364,95 @@ def test_SVGP_vs_SGPR(session_tf):
                     m_svgp.compute_log_likelihood(), atol=1e-5)
 
 
+@pytest.mark.parametrize('whiten', [True, False])
+@pytest.mark.parametrize('gamma', [1., 0.3])
+def test_SVGP_conjugate_vs_generic_natgrad(session_tf, whiten, gamma):
+    rng = np.random.RandomState(1)
+    N, M, D, L = 20, 5, 2, 2
+    X = rng.randn(N, D)
+    Z = rng.randn(M, D)
+    Y = rng.randn(N, L)
+    q_sqrt = np.tile(np.eye(M)[None, :, :] * 0.5, [L, 1, 1])
+
+    def make_model():
+        lik = gpflow.likelihoods.Gaussian()
+        lik.variance = 0.1
+        m = gpflow.models.SVGP(X, Y, gpflow.kernels.RBF(D), lik, Z=Z, whiten=whiten,
+                               mean_function=gpflow.mean_functions.Constant(0.5),
+                               q_mu=rng.randn(M, L), q_sqrt=q_sqrt, num_data=2 * N)
+        m.set_trainable(False)
+        m.q_mu.set_trainable(True)
+        m.q_sqrt.set_trainable(True)
+        return m
+
+    m_conj, m_gen = make_model(), make_model()
+    m_gen.assign(m_conj.read_values())
+    NatGradOptimizer(gamma, conjugate_updates=True).minimize(
+        m_conj, [[m_conj.q_mu, m_conj.q_sqrt]], maxiter=1)
+    NatGradOptimizer(gamma).minimize(m_gen, [[m_gen.q_mu, m_gen.q_sqrt]], maxiter=1)
+
+    assert_allclose(m_conj.q_mu.read_value(), m_gen.q_mu.read_value(), atol=1e-6)
+    assert_allclose(m_conj.q_sqrt.read_value(), m_gen.q_sqrt.read_value(), atol=1e-6)
+
+
+
+@pytest.mark.parametrize('gamma', [1., 0.3])
+def test_SVGP_shared_q_sqrt_conjugate_natgrad(session_tf, gamma):
+    rng = np.random.RandomState(2)
+    N, M, D, L = 20, 5, 2, 3
+    X, Z, Y = rng.randn(N, D), rng.randn(M, D), rng.randn(N, L)
+    q_mu = rng.randn(M, L)
+
+    def make_model(**kwargs):
+        lik = gpflow.likelihoods.Gaussian()
+        lik.variance = 0.1
+        m = gpflow.models.SVGP(X, Y, gpflow.kernels.RBF(D), lik, Z=Z, q_mu=q_mu, **kwargs)
+        m.set_trainable(False)
+        m.q_mu.set_trainable(True)
+        m.q_sqrt.set_trainable(True)
+        return m
+
+    m_full = make_model(q_sqrt=np.tile(np.eye(M)[None, :, :] * 0.5, [L, 1, 1]))
+    m_shared = make_model(q_sqrt=np.eye(M) * 0.5, q_shared=True)
+    assert m_shared.q_sqrt.read_value().shape == (1, M, M)
+    assert_allclose(m_full.compute_log_likelihood(), m_shared.compute_log_likelihood())
+
+    for m in [m_full, m_shared]:
+        NatGradOptimizer(gamma, conjugate_updates=True).minimize(m, [[m.q_mu, m.q_sqrt]], maxiter=1)
+
+    assert_allclose(m_shared.q_mu.read_value(), m_full.q_mu.read_value(), atol=1e-6)
+    for q_sqrt in m_full.q_sqrt.read_value():
+        assert_allclose(m_shared.q_sqrt.read_value()[0], q_sqrt, atol=1e-6)
+    assert_allclose(m_full.compute_log_likelihood(), m_shared.compute_log_likelihood())
+
+
+def test_SVGP_structured_q_sqrt_errors(session_tf):
+    rng = np.random.RandomState(3)
+    N, M, D, L = 20, 6, 2, 2
+    X, Z, Y = rng.randn(N, D), rng.randn(M, D), rng.randn(N, L)
+    m = gpflow.models.SVGP(X, Y, gpflow.kernels.RBF(D), gpflow.likelihoods.Gaussian(), Z=Z, q_rank=2)
+    assert m.q_sqrt.read_value().shape == (L, M, 2)
+    assert m.q_sqrt_diag.read_value().shape == (M, L)
+    with pytest.raises(ValueError):
+        NatGradOptimizer(0.1, conjugate_updates=True).minimize(m, [[m.q_mu, m.q_sqrt]], maxiter=1)
+    m = gpflow.models.SVGP(X, Y, gpflow.kernels.RBF(D), gpflow.likelihoods.Gaussian(), Z=Z,
+                           q_shared=True)
+    with pytest.raises(ValueError):
+        NatGradOptimizer(0.1).minimize(m, [[m.q_mu, m.q_sqrt]], maxiter=1)
+
+    with pytest.raises(ValueError):
+        gpflow.models.SVGP(X, Y, gpflow.kernels.RBF(D), gpflow.likelihoods.Gaussian(), Z=Z,
+                           q_rank=2, q_diag=True)
+    kern = gpflow.multioutput.SharedIndependentMok(gpflow.kernels.RBF(D), L)
+    feat = gpflow.multioutput.SharedIndependentMof(gpflow.features.InducingPoints(Z))
+    for options in [dict(q_rank=2), dict(q_shared=True)]:
+        with pytest.raises(ValueError):
+            gpflow.models.SVGP(X, Y, kern, gpflow.likelihoods.Gaussian(), Z=Z, **options)
+        with pytest.raises(ValueError):
+            gpflow.models.SVGP(X, Y, gpflow.kernels.RBF(D), gpflow.likelihoods.Gaussian(),
+                               feat=feat, **options)
+
+
 class CombinationOptimizer(Optimizer):
     """
     A class that applies one step of each of multiple optimizers in a loop.
@@ -499,3 +588,166 @@ def test_hypers_SVGP_vs_SGPR_tensors(session_tf, svgp, sgpr):
     sgpr_likelihood = sgpr.compute_log_likelihood()
     svgp_likelihood = svgp.compute_log_likelihood()
     assert_allclose(sgpr_likelihood, svgp_likelihood, atol=1e-5)
+
+
+@pytest.mark.parametrize('method', ['L-BFGS', 'BFGS', 'CG'])
+def test_ingraph_optimizer_vs_scipy(session_tf, method):
+    rng = np.random.RandomState(0)
+    X = rng.randn(20, 1)
+    Y = np.sin(X) + 0.1 * rng.randn(*X.shape)
+    m_scipy = gpflow.models.GPR(X, Y, gpflow.kernels.RBF(1))
+    m_graph = gpflow.models.GPR(X, Y, gpflow.kernels.RBF(1))
+    gpflow.train.ScipyOptimizer().minimize(m_scipy)
+    gpflow.train.InGraphOptimizer(method=method).minimize(m_graph, maxiter=500)
+    assert_allclose(m_scipy.compute_log_likelihood(),
+                    m_graph.compute_log_likelihood(), rtol=1e-4)
+
+
+def test_ingraph_optimizer_maxiter(session_tf):
+    X = np.random.randn(10, 1)
+    Y = np.sin(X)
+    m = gpflow.models.GPR(X, Y, gpflow.kernels.RBF(1))
+    values = m.read_trainables()
+    opt = gpflow.train.InGraphOptimizer()
+    opt.minimize(m, maxiter=0)
+    for name, value in m.read_trainables().items():
+        assert_allclose(value, values[name])
+    iterations = []
+    opt.minimize(m, maxiter=3, step_callback=iterations.append)
+    assert iterations[0] <= 3
+
+
+def test_ingraph_optimizer_wrong_arguments(session_tf):
+    with pytest.raises(ValueError):
+        gpflow.train.InGraphOptimizer(method='Newton')
+    m = Demo()
+    extra = tf.Variable(1.0, dtype=gpflow.settings.float_type)
+    with pytest.raises(ValueError):
+        gpflow.train.InGraphOptimizer().minimize(m, var_list=[extra])
+
+
+def test_multistep_vs_singlestep(session_tf):
+    rng = np.random.RandomState(0)
+    X = rng.randn(10, 1)
+    Y = np.sin(X)
+    m1 = gpflow.models.GPR(X, Y, gpflow.kernels.RBF(1))
+    m2 = gpflow.models.GPR(X, Y, gpflow.kernels.RBF(1))
+    callback_steps = []
+    gpflow.train.AdamOptimizer(0.01).minimize(m1, maxiter=10)
+    gpflow.train.AdamOptimizer(0.01).minimize(
+        m2, maxiter=10, steps_per_run=3,
+        step_callback=lambda step, num_steps: callback_steps.append((step, num_steps)))
+    assert callback_steps == [(2, 3), (5, 3), (8, 3), (9, 1)]
+    assert_allclose(m1.compute_log_likelihood(), m2.compute_log_likelihood())
+
+
+def test_multistep_natgrad_VGP_vs_GPR(session_tf):
+    N, D = 3, 2
+    X = np.random.randn(N, D)
+    Y = np.random.randn(N, 1)
+    kern = gpflow.kernels.RBF(D)
+    lik = gpflow.likelihoods.Gaussian()
+    lik.variance = 0.1
+
+    m_vgp = gpflow.models.VGP(X, Y, kern, lik)
+    m_gpr = gpflow.models.GPR(X, Y, kern)
+    m_gpr.likelihood.variance = 0.1
+
+    m_vgp.set_trainable(False)
+    m_vgp.q_mu.set_trainable(True)
+    m_vgp.q_sqrt.set_trainable(True)
+    NatGradOptimizer(1.).minimize(m_vgp, [(m_vgp.q_mu, m_vgp.q_sqrt)], maxiter=2,
+                                  steps_per_run=2)
+
+    assert_allclose(m_gpr.compute_log_likelihood(),
+                    m_vgp.compute_log_likelihood(), atol=1e-4)
+
+
+def test_multistep_natgrad_non_trainable(session_tf):
+    rng = np.random.RandomState(1)
+    X = rng.randn(5, 2)
+    Y = rng.randn(5, 1)
+    num_steps = 3
+
+    def make_model():
+        lik = gpflow.likelihoods.Gaussian()
+        lik.variance = 0.1
+        m = gpflow.models.VGP(X, Y, gpflow.kernels.RBF(2), lik)
+        m.q_mu.set_trainable(False)
+        m.q_sqrt.set_trainable(False)
+        return m
+
+    m_single, m_multi = make_model(), make_model()
+    single_step = NatGradOptimizer(0.5).make_optimize_tensor(
+        m_single, var_list=[(m_single.q_mu, m_single.q_sqrt)])
+    for _ in range(num_steps):
+        session_tf.run(single_step)
+    multi_step = NatGradOptimizer(0.5).make_optimize_tensor(
+        m_multi, var_list=[(m_multi.q_mu, m_multi.q_sqrt)], steps_per_run=num_steps)
+    session_tf.run(multi_step)
+
+    for single, multi in [(m_single.q_mu, m_multi.q_mu), (m_single.q_sqrt, m_multi.q_sqrt)]:
+        assert_allclose(multi.read_value(session_tf), single.read_value(session_tf), atol=1e-8)
+
+
+def test_multistep_loop_minibatch(session_tf):
+    rng = np.random.RandomState(0)
+    X = rng.randn(100, 1)
+    Y = np.sin(X) + 0.1 * rng.randn(*X.shape)
+    m = gpflow.models.SVGP(X, Y, gpflow.kernels.RBF(1), gpflow.likelihoods.Gaussian(),
+                           Z=X[:5].copy(), minibatch_size=10)
+    lengthscales = m.kern.lengthscales.read_value()
+    iterations = []
+    action = gpflow.train.AdamOptimizer(0.01).make_optimize_action(m, steps_per_run=4)
+    loop = Loop.multistep([action, lambda ctx: iterations.append(ctx.iteration)],
+                          steps_per_run=4, stop=10)
+    loop()
+    assert iterations == [0, 4, 8]
+    assert action.steps_per_run == 2
+    m.anchor(session_tf)
+    assert not np.allclose(lengthscales, m.kern.lengthscales.read_value())
+
+
+def multistart_model():
+    # Module level, so that worker processes of MultiStartOptimizer can unpickle it.
+    rng = np.random.RandomState(0)
+    X = rng.randn(20, 1)
+    Y = np.sin(3 * X) + 0.1 * rng.randn(*X.shape)
+    m = gpflow.models.GPR(X, Y, gpflow.kernels.RBF(1))
+    m.kern.lengthscales.prior = gpflow.priors.Gamma(1., 1.)
+    m.kern.variance.prior = gpflow.priors.Gamma(1., 1.)
+    m.compile()
+    return m
+
+
+def test_multistart_optimizer(session_tf):
+    m = multistart_model()
+
+    rounds = []
+    opt = gpflow.train.MultiStartOptimizer(num_starts=6, num_rounds=2, keep_fraction=0.5, seed=1)
+    result = opt.minimize(m, maxiter=50, step_callback=lambda r, objs: rounds.append(len(objs)))
+
+    assert rounds == [6, 3]
+    assert len(result.traces) == 6
+    assert sum(len(trace) == 2 for trace in result.traces) == 3
+    finals = [trace[-1] for trace in result.traces if not np.isnan(trace[-1])]
+    assert result.objective <= min(finals) + 1e-10
+    for name, value in result.values.items():
+        assert_allclose(m.read_trainables()[name], value)
+    objective = -m.compute_log_likelihood() - m.compute_log_prior()
+    assert_allclose(objective, result.objective, rtol=1e-6)
+
+
+def test_multistart_optimizer_processes(session_tf):
+    def minimize(**kwargs):
+        m = multistart_model()
+        opt = gpflow.train.MultiStartOptimizer(num_starts=4, num_rounds=2, seed=1, **kwargs)
+        return opt.minimize(m, maxiter=20)
+
+    serial = minimize()
+    parallel = minimize(model_fn=multistart_model, num_processes=2)
+    assert_allclose(parallel.objective, serial.objective, rtol=1e-6)
+    for name, value in serial.values.items():
+        assert_allclose(parallel.values[name], value, rtol=1e-6)
+    for parallel_trace, serial_trace in zip(parallel.traces, serial.traces):
+        assert_allclose(parallel_trace, serial_trace, rtol=1e-6)
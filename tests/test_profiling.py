@@ -14,9 +14,11 @@
 
 import glob
 import os
+import threading
 
 import numpy as np
 import tensorflow as tf
+from tensorflow.core.framework import step_stats_pb2
 
 import gpflow
 from gpflow.test_util import GPflowTestCase
@@ -98,5 +100,95 @@ class TestProfiling(GPflowTestCase):
         if os.path.exists(s.profiling.output_directory):
             os.rmdir(s.profiling.output_directory)
 
+    def test_sampling(self):
+        directory = os.path.join(tf.test.get_temp_dir(), 'sampling')
+        name = 'test_sampling'
+        for async_trace_writing in [False, True]:
+            graph = tf.Graph()
+            with graph.as_default():
+                x = tf.reduce_sum(tf.cholesky(tf.eye(10, dtype=gpflow.settings.float_type)))
+            session = gpflow.session_manager.TracerSession(
+                output_file_name=name, output_directory=directory, each_time=True,
+                trace_every=3, async_trace_writing=async_trace_writing, graph=graph)
+            for _ in range(10):
+                self.assertEqual(session.run(x), 10.)
+            session.flush()
+            self.assertEqual(session.num_runs, 10)
+            self.assertEqual(session.num_traced_runs, 4)
+            self.assertEqual(session.statistics.num_runs, 4)
+            filenames = glob.glob(os.path.join(directory, name + '*.json'))
+            self.assertEqual(len(filenames), 4)
+            session.close()
+            for filename in filenames:
+                os.remove(filename)
+        os.rmdir(directory)
+
+        with self.assertRaises(ValueError):
+            gpflow.session_manager.TracerSession(trace_every=0)
+        with self.assertRaises(ValueError):
+            gpflow.session_manager.TracerSession(trace_fraction=1.5)
+
+
+class TestCostProfiler(GPflowTestCase):
+    def test_component(self):
+        profiler = gpflow.profiler.CostProfiler()
+        self.assertEqual(profiler.component('SVGP/likelihood/conditional/Kuu/K_1/sub'), 'K')
+        self.assertEqual(profiler.component('SVGP/likelihood/conditional/Cholesky'), 'conditional')
+        self.assertEqual(profiler.component('SVGP/kern/variance/transform/Softplus'), 'transform')
+        self.assertEqual(profiler.component('SVGP/likelihood/K'), 'other')
+        profiler = gpflow.profiler.CostProfiler(components=['likelihood'])
+        self.assertEqual(profiler.component('SVGP/likelihood/conditional/Cholesky'), 'likelihood')
+
+    def test_svgp(self):
+        with self.test_context() as session:
+            rng = np.random.RandomState(0)
+            X = rng.rand(100, 1)
+            Y = (X > 0.5).astype(float)
+            m = gpflow.models.SVGP(X, Y, gpflow.kernels.RBF(1), gpflow.likelihoods.Bernoulli(),
+                                   Z=X[:10].copy())
+            profiler = gpflow.profiler.CostProfiler()
+            for _ in range(3):
+                profiler.run(session, m.likelihood_tensor)
+            self.assertEqual(profiler.num_runs, 3)
+
+            summary = profiler.summary()
+            times = {name: millis for name, millis, _share, _mb, _ops in summary}
+            for component in ['K', 'conditional', 'variational_expectations', 'gauss_kl']:
+                self.assertIn(component, times)
+            self.assertEqual([row[1] for row in summary], sorted(times.values(), reverse=True))
+            np.testing.assert_allclose(sum(row[2] for row in summary), 1.)
+            self.assertIn('Cholesky', [row[0] for row in profiler.summary(by='op')])
+
+            table = profiler.table(top=3)
+            self.assertEqual(len(table.split('\n')), 6)
+            with self.assertRaises(ValueError):
+                profiler.summary(by='scope')
+
+            profiler.reset()
+            self.assertEqual(profiler.num_runs, 0)
+            self.assertEqual(profiler.summary(), [])
+
+
+    def test_concurrent_statistics(self):
+        # Every run adds ops of new types, while statistics are read on another thread.
+        def step_stats(i):
+            stats = step_stats_pb2.StepStats()
+            device = stats.dev_stats.add(device='/job:localhost/cpu:0')
+            for j in range(50):
+                device.node_stats.add(node_name='K/op_{}'.format(j), all_end_rel_micros=1,
+                                      timeline_label='op = Op{}x{}(a)'.format(i, j))
+            return stats
+
+        profiler = gpflow.profiler.CostProfiler()
+        num_runs = 200
+        writer = threading.Thread(
+            target=lambda: [profiler.add_step_stats(step_stats(i)) for i in range(num_runs)])
+        writer.start()
+        while writer.is_alive():
+            profiler.summary(by='op')
+        writer.join()
+        self.assertEqual(profiler.num_runs, num_runs)
+        self.assertEqual(len(profiler.summary(by='op')), num_runs * 50)
+
 if __name__ == "__main__":
     tf.test.main()
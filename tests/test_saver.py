@@ -16,6 +16,7 @@ import copy
 import os
 import tempfile
 
+import h5py
 import numpy as np
 import pytest
 import tensorflow as tf
@@ -184,6 +185,80 @@ def test_loading_into_specific_session(session_tf, filename, model):
     assert_allclose(predict_origin, predict_loaded)
 
 
+def test_saving_large_arrays_separately(session_tf):
+    x = np.random.rand(1000, 2)
+    y = np.random.rand(1000, 1)
+    model = gp.models.SGPR(x, y, gp.kernels.RBF(2), Z=x[:20].copy())
+    x_new = Data.x_new()
+    predict_origin = model.predict_f(x_new)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for compression in ['lzf', None]:
+            filename = os.path.join(directory, 'model_{}.h5'.format(compression))
+            context = gp.SaverContext(compression=compression)
+            gp.Saver().save(filename, model, context=context)
+            with h5py.File(filename, 'r') as h5file:
+                assert len(h5file['arrays']) == 2  # X and Y, Z is smaller than 1024 elements
+                assert all(dataset.compression == compression
+                           for dataset in h5file['arrays'].values())
+
+            with session_context():
+                loaded = gp.Saver().load(filename, context=gp.SaverContext(mmap=True))
+                assert_allclose(predict_origin, loaded.predict_f(x_new))
+                assert isinstance(loaded.X.read_value(), np.memmap) == (compression is None)
+
+        with session_context():
+            context = gp.SaverContext(load_data_holders=False)
+            loaded = gp.Saver().load(filename, context=context)
+            assert loaded.X.read_value().shape == (0, 2)
+            assert_allclose(loaded.feature.Z.read_value(), model.feature.Z.read_value())
+            loaded.X = x
+            loaded.Y = y
+            assert_allclose(predict_origin, loaded.predict_f(x_new))
+
+
+def test_snapshot_roundtrip(session_tf, filename, model):
+    model.kern.lengthscales = 0.3
+    model.likelihood.variance = 0.2
+    gp.saver.save_snapshot(filename, model)
+
+    other = Data.model()
+    other.kern.lengthscales = 2.0
+    gp.saver.load_snapshot(filename, other)
+    assert_allclose(other.kern.lengthscales.read_value(session_tf), 0.3)
+    assert_allclose(other.kern.lengthscales.read_value(), 0.3)
+    assert_allclose(other.likelihood.variance.read_value(session_tf), 0.2)
+
+    with gp.defer_build():
+        deferred = Data.model()
+    gp.saver.load_snapshot(filename, deferred)
+    deferred.compile()
+    assert_allclose(deferred.kern.lengthscales.read_value(session_tf), 0.3)
+
+
+def test_snapshot_bank(session_tf, filename):
+    models = [Data.model() for _ in range(5)]
+    for i, m in enumerate(models):
+        m.kern.variance = i + 1.
+    gp.saver.save_snapshot(filename, models)
+
+    target = Data.model()
+    for mmap in [True, False]:
+        with gp.saver.SnapshotBank(filename, mmap=mmap) as bank:
+            assert len(bank) == 5
+            assert bank.fingerprint == gp.saver.fingerprint(target)
+            for i in [3, 1]:
+                bank.assign(target, i)
+                assert_allclose(target.kern.variance.read_value(session_tf), i + 1.)
+                assert_allclose(bank[i], gp.saver.read_snapshot(target))
+
+    with pytest.raises(ValueError):
+        gp.saver.load_snapshot(filename, target)
+    with pytest.raises(ValueError):
+        gp.saver.load_snapshot(filename, gp.models.GPR(Data.x_new(), np.random.rand(10, 1),
+                                                       gp.kernels.RBF(2, ARD=True)), index=0)
+
+
 # ========
 # Helpers.
 # ========
@@ -0,0 +1,92 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+import tensorflow as tf
+from numpy.testing import assert_allclose, assert_almost_equal
+
+import gpflow
+from gpflow.test_util import session_tf
+
+
+class Quadratic(gpflow.models.Model):
+    def __init__(self):
+        super(Quadratic, self).__init__()
+        self.x = gpflow.Param(np.ones(2), dtype=gpflow.settings.float_type)
+
+    @gpflow.params_as_tensors
+    def _build_likelihood(self):
+        return -tf.reduce_sum(tf.square(self.x))
+
+
+@pytest.mark.parametrize('sampler', [gpflow.train.SGLD(epsilon=0.05),
+                                     gpflow.train.SGHMC(epsilon=0.01, friction=0.2)])
+def test_quadratic_moments(session_tf, sampler):
+    m = Quadratic()
+    samples = sampler.sample(m, num_samples=2000, thin=5, burn=200)
+    assert samples.shape == (2000, 2)
+    xs = np.array(samples[m.x.pathname].tolist())
+    assert_almost_equal(xs.mean(0), np.zeros(2), decimal=1)
+    assert_allclose(xs.var(0), 0.5 * np.ones(2), rtol=0.3)
+    assert_allclose(m.x.read_value(), xs[-1])
+
+
+def sgpmc_data():
+    rng = np.random.RandomState(0)
+    X = rng.rand(100, 1)
+    Y = np.sin(6 * X) + 0.1 * rng.randn(100, 1)
+    Z = np.linspace(0, 1, 5)[:, None]
+    return X, Y, Z
+
+
+def test_sgpmc_minibatch_rescaling(session_tf):
+    X, Y, Z = sgpmc_data()
+    full = gpflow.models.SGPMC(X, Y, gpflow.kernels.RBF(1), gpflow.likelihoods.Gaussian(), Z=Z)
+    batched = gpflow.models.SGPMC(X, Y, gpflow.kernels.RBF(1), gpflow.likelihoods.Gaussian(), Z=Z,
+                                  minibatch_size=100)
+    assert_allclose(full.compute_log_likelihood(), batched.compute_log_likelihood())
+
+    batched = gpflow.models.SGPMC(X, Y, gpflow.kernels.RBF(1), gpflow.likelihoods.Gaussian(), Z=Z,
+                                  minibatch_size=10)
+    estimates = [batched.compute_log_likelihood() for _ in range(200)]
+    assert_allclose(np.mean(estimates), full.compute_log_likelihood(), rtol=0.1)
+
+
+def test_sgld_sgpmc(session_tf):
+    X, Y, Z = sgpmc_data()
+    m = gpflow.models.SGPMC(X, Y, gpflow.kernels.RBF(1), gpflow.likelihoods.Gaussian(), Z=Z,
+                            minibatch_size=10)
+    m.kern.lengthscales.prior = gpflow.priors.Gamma(1., 1.)
+    m.kern.variance.prior = gpflow.priors.Gamma(1., 1.)
+    sampler = gpflow.train.SGLD(epsilon=1e-4)
+    samples = sampler.sample(m, num_samples=50, thin=2, burn=10)
+    names = {p.pathname for p in m.trainable_parameters}
+    assert set(samples.columns) == names | {'logprobs'}
+    assert len(samples) == 50
+    assert np.all(np.isfinite(samples['logprobs']))
+    last = samples.iloc[-1]
+    for param in m.trainable_parameters:
+        assert_almost_equal(last[param.pathname], param.read_value())
+
+
+def test_wrong_arguments():
+    with pytest.raises(ValueError):
+        gpflow.train.SGLD(epsilon=0.)
+    with pytest.raises(ValueError):
+        gpflow.train.SGHMC(epsilon=0.1, friction=0.)
+
+
+if __name__ == '__main__':
+    tf.test.main()
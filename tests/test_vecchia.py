@@ -0,0 +1,92 @@
+# Copyright 2018 the GPflow authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+import gpflow
+from gpflow.test_util import session_tf
+from gpflow.models.vecchia import _ordered_neighbours
+
+
+class Datum:
+    rng = np.random.RandomState(0)
+    X = rng.rand(30, 2)
+    Y = np.sin(6 * X[:, :1]) * np.cos(3 * X[:, 1:]) + 0.1 * rng.randn(30, 1)
+    Xtest = rng.rand(7, 2)
+
+
+def _gpr():
+    gpr = gpflow.models.GPR(Datum.X, Datum.Y, gpflow.kernels.Matern32(2),
+                            mean_function=gpflow.mean_functions.Constant(0.2))
+    gpr.likelihood.variance = 0.1
+    return gpr
+
+
+def _vecchia(**kwargs):
+    m = gpflow.models.VecchiaGPR(Datum.X, Datum.Y, gpflow.kernels.Matern32(2),
+                                 mean_function=gpflow.mean_functions.Constant(0.2), **kwargs)
+    m.likelihood.variance = 0.1
+    return m
+
+
+def test_ordered_neighbours():
+    rng = np.random.RandomState(1)
+    X = rng.rand(200, 2)
+    neighbours = _ordered_neighbours(X, 7)
+    for i in range(X.shape[0]):
+        dist = np.sum(np.square(X[:i] - X[i]), 1)
+        expected = np.argsort(dist)[:7]
+        assert_allclose(neighbours[i, :len(expected)], expected)
+        assert np.all(neighbours[i, len(expected):] == -1)
+
+
+@pytest.mark.parametrize('ordering', ['random', 'coordinate', 'none'])
+def test_vecchia_exact_with_all_neighbours(session_tf, ordering):
+    m = _vecchia(num_neighbours=Datum.X.shape[0], ordering=ordering)
+    gpr = _gpr()
+    assert_allclose(m.compute_log_likelihood(), gpr.compute_log_likelihood())
+    for predict, predict_gpr in [(m.predict_f, gpr.predict_f), (m.predict_y, gpr.predict_y)]:
+        mean, var = predict(Datum.Xtest)
+        mean_gpr, var_gpr = predict_gpr(Datum.Xtest)
+        assert_allclose(mean, mean_gpr, atol=1e-6)
+        assert_allclose(var, var_gpr, atol=1e-6)
+
+
+def test_vecchia_approximation(session_tf):
+    m = _vecchia(num_neighbours=10)
+    assert m.neighbours.read_value().shape == (30, 10)
+    assert_allclose(m.X.read_value(), Datum.X[m.ordering])
+    assert_allclose(m.compute_log_likelihood(), _gpr().compute_log_likelihood(), rtol=0.05)
+    with pytest.raises(NotImplementedError):
+        m.predict_f_full_cov(Datum.Xtest)
+
+
+def test_vecchia_minibatch(session_tf):
+    ordering = np.random.RandomState(2).permutation(Datum.X.shape[0])
+    m = _vecchia(num_neighbours=5, ordering=ordering)
+    m_mb = _vecchia(num_neighbours=5, ordering=ordering, minibatch_size=Datum.X.shape[0])
+    assert_allclose(m.compute_log_likelihood(), m_mb.compute_log_likelihood())
+    gpflow.train.AdamOptimizer(0.01).minimize(_vecchia(num_neighbours=5, minibatch_size=10),
+                                              maxiter=5)
+
+
+def test_vecchia_errors():
+    with pytest.raises(ValueError):
+        _vecchia(num_neighbours=0)
+    with pytest.raises(ValueError):
+        _vecchia(ordering='maximin')
+    with pytest.raises(ValueError):
+        _vecchia(ordering=np.zeros(Datum.X.shape[0], dtype=int))